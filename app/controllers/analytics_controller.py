@@ -0,0 +1,189 @@
+import json
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.repositories.analytics_repository import AnalyticsRepository, GRANULARITIES
+from app.models.schemas import (
+    AnalyticsBucket, AnalyticsResponse, QuantileSummary, ShapeDistribution, DistributionsResponse
+)
+from app.services.sketches import ShapeSketches, TDigest, sketch_registry
+
+# Rango consultado por defecto para cada intervalo
+DEFAULT_WINDOWS = {
+    "minute": timedelta(hours=6),
+    "hour": timedelta(days=7),
+    "day": timedelta(days=365),
+}
+
+class AnalyticsController:
+    """Controlador para la analítica temporal de cálculos"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.repository = AnalyticsRepository(db)
+
+    def get_time_series(self, granularity: str, start: Optional[datetime] = None,
+                        end: Optional[datetime] = None, shape_type: Optional[str] = None,
+                        live: bool = False) -> AnalyticsResponse:
+        """Serie temporal de número, ritmo, total y media de área/volumen por forma"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Intervalo no soportado: {granularity}")
+        end = end or datetime.now(timezone.utc)
+        start = start or end - DEFAULT_WINDOWS[granularity]
+        if start >= end:
+            raise ValueError("El inicio del rango debe ser anterior al final")
+
+        if live:
+            rows = self.repository.get_live_buckets(granularity, start, end, shape_type)
+            refreshed_at = None
+        else:
+            rows = self.repository.get_rollups(granularity, start, end, shape_type)
+            watermark = self.repository.get_watermark()
+            refreshed_at = watermark.refreshed_at if watermark else None
+
+        seconds = GRANULARITIES[granularity]
+        buckets = [
+            AnalyticsBucket(
+                bucket_start=row.bucket_start,
+                shape_type=row.shape_type,
+                calculation_count=row.calculation_count,
+                rate_per_second=row.calculation_count / seconds,
+                total_area=row.area_sum,
+                mean_area=row.area_sum / row.area_count if row.area_count else None,
+                total_volume=row.volume_sum,
+                mean_volume=row.volume_sum / row.volume_count if row.volume_count else None
+            )
+            for row in rows
+        ]
+        return AnalyticsResponse(
+            granularity=granularity,
+            source="live" if live else "rollup",
+            start=start,
+            end=end,
+            refreshed_at=refreshed_at,
+            buckets=buckets
+        )
+
+    def refresh_rollups(self) -> int:
+        """Incorporar los cálculos nuevos a los agregados"""
+        if self.db.get_bind().dialect.name != "postgresql":
+            raise ValueError("Los agregados de analítica necesitan PostgreSQL")
+        return self.repository.refresh_rollups(batch_size=settings.ROLLUP_BATCH_SIZE)
+
+def refresh_rollups_job() -> int:
+    """Tarea periódica: refrescar los agregados con una sesión propia"""
+    db = SessionLocal()
+    try:
+        return AnalyticsController(db).refresh_rollups()
+    finally:
+        db.close()
+
+class DistributionController:
+    """Controlador para los cuantiles y conteos de distintos por forma"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.repository = AnalyticsRepository(db)
+
+    def _load(self, shape_type: Optional[str] = None) -> Dict[str, ShapeSketches]:
+        stored = self.repository.get_sketch_payloads(shape_type)
+        sketches = {
+            shape: ShapeSketches.from_payloads(
+                {metric: payload for metric, payload in payloads.items() if payload != "{}"},
+                settings.SKETCH_COMPRESSION, settings.SKETCH_HLL_PRECISION
+            )
+            for shape, payloads in stored.items()
+        }
+        # Incluir lo observado en este proceso que aún no se ha persistido
+        for shape, pending in sketch_registry.snapshot().items():
+            if shape_type is not None and shape != shape_type:
+                continue
+            if shape in sketches:
+                sketches[shape].merge(pending)
+            else:
+                sketches[shape] = pending
+        return sketches
+
+    @staticmethod
+    def _summary(digest: TDigest) -> Optional[QuantileSummary]:
+        if not digest.count:
+            return None
+        return QuantileSummary(
+            count=int(digest.count),
+            min=digest.min,
+            max=digest.max,
+            p50=digest.quantile(0.5),
+            p95=digest.quantile(0.95),
+            p99=digest.quantile(0.99)
+        )
+
+    def get_distributions(self, shape_type: Optional[str] = None) -> DistributionsResponse:
+        """Cuantiles de área/volumen y dimensiones distintas; no depende del tamaño de la tabla"""
+        shapes = [
+            ShapeDistribution(
+                shape_type=shape,
+                area=self._summary(sketches.area),
+                volume=self._summary(sketches.volume),
+                distinct_dimensions=round(sketches.dimensions.cardinality())
+            )
+            for shape, sketches in sorted(self._load(shape_type).items())
+        ]
+        return DistributionsResponse(
+            # El error en rango del t-digest (máximo en la mediana) es del orden de 1/δ
+            quantile_rank_error=1 / settings.SKETCH_COMPRESSION,
+            distinct_relative_error=1.04 / math.sqrt(1 << settings.SKETCH_HLL_PRECISION),
+            shapes=shapes
+        )
+
+    def persist(self) -> None:
+        """Combinar los resúmenes pendientes de este proceso con los persistidos"""
+        pending = sketch_registry.drain()
+        if not pending:
+            return
+        try:
+            self.repository.merge_sketches(
+                pending, settings.SKETCH_COMPRESSION, settings.SKETCH_HLL_PRECISION
+            )
+        except Exception:
+            self.db.rollback()
+            sketch_registry.restore(pending)
+            raise
+
+    def rebuild(self) -> int:
+        """Reconstruir los resúmenes recorriendo todos los cálculos guardados.
+
+        Operación de mantenimiento: solo descarta lo pendiente de este proceso,
+        así que lo que otros workers tengan sin persistir se sumaría dos veces.
+        Se rechaza salvo que ``SKETCH_REBUILD_ENABLED`` esté activo, lo que
+        solo debe hacerse con un único worker en marcha.
+        """
+        if not settings.SKETCH_REBUILD_ENABLED:
+            raise ValueError(
+                "La reconstrucción requiere SKETCH_REBUILD_ENABLED=true y un único worker en marcha"
+            )
+        sketches: Dict[str, ShapeSketches] = {}
+        processed = 0
+        for shape, dimensions, area, volume in self.repository.iter_calculation_values():
+            shape_sketches = sketches.get(shape)
+            if shape_sketches is None:
+                shape_sketches = sketches[shape] = sketch_registry.new_sketches()
+            shape_sketches.observe(json.loads(dimensions), area, volume)
+            processed += 1
+
+        sketch_registry.drain()
+        self.repository.delete_sketches()
+        self.repository.merge_sketches(
+            sketches, settings.SKETCH_COMPRESSION, settings.SKETCH_HLL_PRECISION, replace=True
+        )
+        return processed
+
+def persist_sketches_job() -> None:
+    """Tarea periódica: persistir los resúmenes de este proceso"""
+    db = SessionLocal()
+    try:
+        DistributionController(db).persist()
+    finally:
+        db.close()
@@ -0,0 +1,234 @@
+import json
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.services.geometry_service import GeometryService
+from app.repositories.assembly_repository import AssemblyRepository
+from app.models.assembly import Assembly, AssemblyNode
+from app.models.schemas import (
+    AssemblyCreate, AssemblyPart, AssemblyNodeCreate, AssemblyNodeUpdate,
+    AssemblyNodeResponse, AssemblyResponse
+)
+
+# Signo con el que el volumen de un nodo contribuye al de su grupo
+OPERATION_SIGN = {"union": 1.0, "subtract": -1.0}
+
+class AssemblyController:
+    """Controlador de ensamblajes con totales incrementales.
+
+    Cada nodo guarda el total de su subárbol. El área total es la suma de las
+    superficies de todas las primitivas, una cota superior de la superficie
+    del sólido resultante. El volumen suma las uniones y resta las
+    sustracciones; es exacto si las uniones no se solapan y cada sustracción
+    queda dentro del material. Al editar una pieza solo se actualiza el
+    camino hasta la raíz.
+    """
+
+    def __init__(self, db: Session, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self.repository = AssemblyRepository(db)
+        self.service = GeometryService()
+
+    @staticmethod
+    def _contribution(node: AssemblyNode) -> Tuple[float, float]:
+        """Área y volumen con los que un nodo contribuye a su grupo"""
+        return node.total_area, OPERATION_SIGN[node.operation] * node.total_volume
+
+    def _evaluate(self, shape_type: str, dimensions: dict) -> Tuple[float, float, dict]:
+        result = self.service.calculate_shape(shape_type, dimensions, "both")
+        return result.area or 0.0, result.volume or 0.0, result.dimensions
+
+    def _build(self, part: AssemblyPart, assembly_id: int, parent: AssemblyNode,
+               nodes: List[AssemblyNode]) -> AssemblyNode:
+        """Crear los nodos de una pieza y su subárbol calculando sus totales"""
+        node = AssemblyNode(assembly_id=assembly_id, parent=parent, name=part.name, operation=part.operation)
+        nodes.append(node)
+        if part.shape_type is not None:
+            area, volume, dimensions = self._evaluate(part.shape_type, part.dimensions)
+            node.shape_type = part.shape_type
+            node.dimensions = json.dumps(dimensions)
+            node.area, node.volume = area, volume
+            node.total_area, node.total_volume = area, volume
+        else:
+            node.area = node.volume = 0.0
+            node.total_area = node.total_volume = 0.0
+            for child_part in part.children:
+                child = self._build(child_part, assembly_id, node, nodes)
+                child_area, child_volume = self._contribution(child)
+                node.total_area += child_area
+                node.total_volume += child_volume
+        return node
+
+    def _propagate(self, parent_id: int, area_delta: float, volume_delta: float) -> None:
+        """Aplicar la variación de la contribución de un nodo a su grupo y a los ancestros"""
+        deltas: Dict[int, Tuple[float, float]] = {}
+        for node_id, operation in self.repository.get_ancestors(parent_id):
+            deltas[node_id] = (area_delta, volume_delta)
+            volume_delta *= OPERATION_SIGN[operation]
+        self.repository.add_to_totals(deltas)
+
+    @staticmethod
+    def _response(assembly: Assembly, root: AssemblyNode,
+                  nodes: Optional[List[AssemblyNode]] = None) -> AssemblyResponse:
+        return AssemblyResponse(
+            id=assembly.id,
+            name=assembly.name,
+            area=root.total_area,
+            volume=root.total_volume,
+            created_at=assembly.created_at,
+            updated_at=assembly.updated_at,
+            nodes=[AssemblyNodeResponse.from_orm(node) for node in nodes] if nodes is not None else None
+        )
+
+    def create_assembly(self, request: AssemblyCreate) -> AssemblyResponse:
+        """Crear un ensamblaje con todas sus piezas en una transacción"""
+        try:
+            assembly, root = self.repository.create_assembly(self.user_id, request.name)
+            nodes: List[AssemblyNode] = []
+            for part in request.parts:
+                child = self._build(part, assembly.id, root, nodes)
+                child_area, child_volume = self._contribution(child)
+                root.total_area += child_area
+                root.total_volume += child_volume
+            self.repository.add_nodes(nodes)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.db.refresh(assembly)
+        return self._response(assembly, root)
+
+    def get_assembly(self, assembly_id: int, include_nodes: bool = False) -> Optional[AssemblyResponse]:
+        """Obtener un ensamblaje con sus totales y, opcionalmente, todos sus nodos"""
+        assembly = self.repository.get_assembly(self.user_id, assembly_id)
+        if assembly is None:
+            return None
+        root = self.repository.get_root(assembly_id)
+        nodes = self.repository.get_nodes(assembly_id) if include_nodes else None
+        return self._response(assembly, root, nodes)
+
+    def get_assemblies(self, skip: int = 0, limit: int = 100) -> List[AssemblyResponse]:
+        """Listar ensamblajes con sus totales"""
+        return [self._response(assembly, root)
+                for assembly, root in self.repository.get_assemblies(self.user_id, skip=skip, limit=limit)]
+
+    def add_node(self, assembly_id: int, request: AssemblyNodeCreate) -> Optional[AssemblyNodeResponse]:
+        """Añadir una pieza (o un subárbol) a un grupo"""
+        try:
+            assembly = self.repository.get_assembly(self.user_id, assembly_id, for_update=True)
+            if assembly is None:
+                return None
+            if request.parent_id is None:
+                parent = self.repository.get_root(assembly_id)
+            else:
+                parent = self.repository.get_node(assembly_id, request.parent_id)
+            if parent is None:
+                return None
+            if parent.shape_type is not None:
+                raise ValueError("Solo se pueden añadir piezas a un grupo")
+
+            nodes: List[AssemblyNode] = []
+            node = self._build(request, assembly_id, parent, nodes)
+            self.repository.add_nodes(nodes)
+            self._propagate(parent.id, *self._contribution(node))
+            self.repository.touch(assembly)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.db.refresh(node)
+        return AssemblyNodeResponse.from_orm(node)
+
+    def update_node(self, assembly_id: int, node_id: int,
+                    request: AssemblyNodeUpdate) -> Optional[AssemblyNodeResponse]:
+        """Modificar una pieza y actualizar solo el camino hasta la raíz"""
+        try:
+            assembly = self.repository.get_assembly(self.user_id, assembly_id, for_update=True)
+            node = self.repository.get_node(assembly_id, node_id) if assembly else None
+            if node is None:
+                return None
+            if node.parent_id is None and request.operation is not None:
+                raise ValueError("La raíz del ensamblaje no tiene operación")
+
+            old_area, old_volume = self._contribution(node)
+            if request.dimensions is not None:
+                if node.shape_type is None:
+                    raise ValueError("Los grupos no tienen dimensiones")
+                area, volume, dimensions = self._evaluate(node.shape_type, request.dimensions)
+                node.dimensions = json.dumps(dimensions)
+                node.area, node.volume = area, volume
+                node.total_area, node.total_volume = area, volume
+            if request.operation is not None:
+                node.operation = request.operation
+            if request.name is not None:
+                node.name = request.name
+
+            if node.parent_id is not None:
+                new_area, new_volume = self._contribution(node)
+                self._propagate(node.parent_id, new_area - old_area, new_volume - old_volume)
+            self.repository.touch(assembly)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.db.refresh(node)
+        return AssemblyNodeResponse.from_orm(node)
+
+    def delete_node(self, assembly_id: int, node_id: int) -> bool:
+        """Eliminar una pieza con todo su subárbol"""
+        try:
+            assembly = self.repository.get_assembly(self.user_id, assembly_id, for_update=True)
+            node = self.repository.get_node(assembly_id, node_id) if assembly else None
+            if node is None:
+                return False
+            if node.parent_id is None:
+                raise ValueError("No se puede eliminar la raíz del ensamblaje")
+
+            area, volume = self._contribution(node)
+            parent_id = node.parent_id
+            self.repository.delete_nodes(self.repository.get_subtree_ids(node_id))
+            self._propagate(parent_id, -area, -volume)
+            self.repository.touch(assembly)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return True
+
+    def delete_assembly(self, assembly_id: int) -> bool:
+        """Eliminar un ensamblaje y todos sus nodos"""
+        assembly = self.repository.get_assembly(self.user_id, assembly_id)
+        if assembly is None:
+            return False
+        self.repository.delete_assembly(assembly)
+        return True
+
+    def recompute(self, assembly_id: int) -> int:
+        """Recalcular desde cero todos los totales de un ensamblaje.
+
+        Recorre el árbol completo; sirve para reparar totales y como
+        referencia frente a la actualización incremental.
+        """
+        assembly = self.repository.get_assembly(self.user_id, assembly_id, for_update=True)
+        nodes = self.repository.get_nodes(assembly_id) if assembly else []
+        children: Dict[Optional[int], List[AssemblyNode]] = {}
+        for node in nodes:
+            children.setdefault(node.parent_id, []).append(node)
+
+        # Recorrido en postorden sin recursión
+        stack = [(root, False) for root in children.get(None, [])]
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children.get(node.id, []))
+                continue
+            total_area, total_volume = node.area, node.volume
+            for child in children.get(node.id, []):
+                child_area, child_volume = self._contribution(child)
+                total_area += child_area
+                total_volume += child_volume
+            if (total_area, total_volume) != (node.total_area, node.total_volume):
+                node.total_area, node.total_volume = total_area, total_volume
+        self.db.commit()
+        return len(nodes)
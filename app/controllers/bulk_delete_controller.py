@@ -0,0 +1,142 @@
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.core.cache import invalidate_calculations
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.jobs import BulkDeleteJob
+from app.models.schemas import BulkDeleteRequest, BulkDeleteJobResponse
+from app.repositories.calculation_repository import CalculationRepository
+from app.repositories.job_repository import JobRepository
+
+logger = logging.getLogger(__name__)
+
+class BulkDeleteController:
+    """Controlador para borrados masivos por lotes.
+
+    Cada lote es un DELETE de como mucho ``BULK_DELETE_CHUNK_SIZE`` filas en
+    su propia transacción, junto con la actualización del progreso; así no se
+    mantienen bloqueos largos ni se acumula WAL de una sola transacción, y un
+    fallo deja borrado lo ya confirmado. Solo se borran cálculos del usuario
+    ``user_id``.
+    """
+
+    def __init__(self, db: Session, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self.repository = CalculationRepository(db)
+        self.jobs = JobRepository(db)
+
+    def create_job(self, request: BulkDeleteRequest) -> BulkDeleteJob:
+        """Validar y registrar un borrado masivo"""
+        if request.ids is not None and len(request.ids) > settings.BULK_DELETE_MAX_IDS:
+            raise ValueError(f"Se admiten como máximo {settings.BULK_DELETE_MAX_IDS} IDs por petición")
+        if request.dimensions and self.db.get_bind().dialect.name != "postgresql":
+            raise ValueError("Los filtros por dimensiones necesitan PostgreSQL")
+        criteria = request.dict(exclude={"background"}, exclude_none=True)
+        if not criteria.get("dimensions"):
+            criteria.pop("dimensions", None)
+        return self.jobs.create_bulk_delete_job(self.user_id, json.dumps(criteria, default=str))
+
+    def get_job(self, job_id: int) -> Optional[BulkDeleteJobResponse]:
+        """Obtener el estado y el progreso de un borrado masivo"""
+        job = self.jobs.get_bulk_delete_job(self.user_id, job_id)
+        if job:
+            return BulkDeleteJobResponse.from_orm(job)
+        return None
+
+    def resume_job(self, job_id: int) -> Optional[BulkDeleteJob]:
+        """Preparar un borrado fallido o abandonado para continuar tras el último lote confirmado.
+
+        Un trabajo en ``pending`` o ``running`` solo se considera abandonado
+        (p. ej. murió el worker) si lleva ``BULK_DELETE_STALE_AFTER`` segundos
+        sin avanzar; así no se ejecuta dos veces a la vez.
+        """
+        job = self.jobs.get_bulk_delete_job(self.user_id, job_id, for_update=True)
+        if job is None:
+            return None
+        if job.status == "completed":
+            self.db.rollback()
+            raise ValueError("El borrado ya está completado")
+        if job.status in ("pending", "running"):
+            last_progress = job.updated_at or job.started_at or job.created_at
+            if last_progress.tzinfo is None:
+                last_progress = last_progress.replace(tzinfo=timezone.utc)
+            idle = (datetime.now(timezone.utc) - last_progress).total_seconds()
+            if idle < settings.BULK_DELETE_STALE_AFTER:
+                self.db.rollback()
+                raise ValueError(
+                    f"El borrado sigue en curso; se puede reanudar tras {settings.BULK_DELETE_STALE_AFTER:g} s sin progreso"
+                )
+        job.status = "pending"
+        job.error = None
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def _record_chunk(self, job: BulkDeleteJob, deleted: List[int], last_id: int) -> None:
+        job.deleted_count += len(deleted)
+        job.chunk_count += 1
+        job.last_deleted_id = last_id
+        self.db.commit()
+        invalidate_calculations(deleted)
+        if settings.BULK_DELETE_CHUNK_PAUSE > 0:
+            time.sleep(settings.BULK_DELETE_CHUNK_PAUSE)
+
+    def run(self, job_id: int) -> Optional[BulkDeleteJobResponse]:
+        """Ejecutar un borrado masivo lote a lote hasta completarlo"""
+        job = self.jobs.get_bulk_delete_job(self.user_id, job_id)
+        if job is None:
+            return None
+        job.status = "running"
+        job.started_at = func.now()
+        self.db.commit()
+
+        chunk_size = settings.BULK_DELETE_CHUNK_SIZE
+        try:
+            request = BulkDeleteRequest(**json.loads(job.criteria))
+            if request.ids is not None:
+                # Se retoma tras el último lote confirmado
+                ids = sorted(i for i in set(request.ids) if i > job.last_deleted_id)
+                for start in range(0, len(ids), chunk_size):
+                    chunk = ids[start:start + chunk_size]
+                    deleted = self.repository.delete_calculations_by_ids(self.user_id, chunk)
+                    self._record_chunk(job, deleted, chunk[-1])
+            else:
+                filters = self.repository.calculation_filters(
+                    self.user_id,
+                    shape_type=request.shape_type,
+                    created_after=request.created_after,
+                    created_before=request.created_before,
+                    dimensions=request.dimensions
+                )
+                while True:
+                    deleted = self.repository.delete_calculations_chunk(filters, job.last_deleted_id, chunk_size)
+                    if not deleted:
+                        self.db.rollback()
+                        break
+                    self._record_chunk(job, deleted, max(deleted))
+                    if len(deleted) < chunk_size:
+                        break
+            job.status = "completed"
+        except Exception as e:
+            self.db.rollback()
+            logger.exception("Error en el borrado masivo %s", job_id)
+            job.status = "failed"
+            job.error = str(e)
+        job.finished_at = func.now()
+        self.db.commit()
+        self.db.refresh(job)
+        return BulkDeleteJobResponse.from_orm(job)
+
+def run_bulk_delete_job(user_id: int, job_id: int) -> None:
+    """Tarea en segundo plano: ejecutar un borrado masivo con una sesión propia"""
+    db = SessionLocal()
+    try:
+        BulkDeleteController(db, user_id).run(job_id)
+    finally:
+        db.close()
@@ -1,17 +1,27 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.services.geometry_service import GeometryService
+from app.services.sketches import sketch_registry
+from app.core.cache import NOT_FOUND, get_calculation_cache, invalidate_calculations
 from app.repositories.calculation_repository import CalculationRepository
 from app.models.schemas import (
-    GeometricCalculationRequest, GeometricCalculationResponse, CalculationResult
+    GeometricCalculationRequest, GeometricCalculationResponse, CalculationResult,
+    CalculationBatchResponse, PolygonBatchRequest, PolygonBatchResponse
 )
 from app.models.geometric_shape import GeometricCalculation
 
+# Formas que siempre aparecen en las estadísticas, aunque el usuario no tenga cálculos
+STATISTICS_SHAPES = ["cube", "sphere", "cylinder", "square", "circle", "polygon", "polyline", "mesh"]
+
 class GeometryController:
-    """Controlador para manejar la lógica de negocio de cálculos geométricos"""
+    """Controlador para manejar la lógica de negocio de cálculos geométricos.
+
+    Opera siempre sobre los cálculos del usuario ``user_id``.
+    """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, user_id: int):
         self.db = db
+        self.user_id = user_id
         self.repository = CalculationRepository(db)
         self.service = GeometryService()
     
@@ -30,6 +40,7 @@ class GeometryController:
         
         # Guardar en la base de datos
         db_calculation = self.repository.create_calculation(
+            user_id=self.user_id,
             shape_type=result.shape_type,
             dimensions=result.dimensions,
             area=result.area,
@@ -37,6 +48,31 @@ class GeometryController:
             calculation_type=result.calculation_type
         )
         
+        # Un worker pudo cachear el ID como inexistente antes de crearlo
+        invalidate_calculations([db_calculation.id])
+        
+        # Alimentar los resúmenes de distribuciones
+        sketch_registry.observe(result.shape_type, result.dimensions, result.area, result.volume)
+        
+        return GeometricCalculationResponse.from_orm(db_calculation)
+    
+    def calculate_mesh(self, path: str, file_format: str, calculation_type: str,
+                       filename: Optional[str] = None, save: bool = True):
+        """Calcular una malla de triángulos y, opcionalmente, guardarla"""
+        result = self.service.calculate_mesh(path, file_format, calculation_type, filename)
+        if not save:
+            return result
+        
+        db_calculation = self.repository.create_calculation(
+            user_id=self.user_id,
+            shape_type=result.shape_type,
+            dimensions=result.dimensions,
+            area=result.area,
+            volume=result.volume,
+            calculation_type=result.calculation_type
+        )
+        invalidate_calculations([db_calculation.id])
+        sketch_registry.observe(result.shape_type, result.dimensions, result.area, result.volume)
         return GeometricCalculationResponse.from_orm(db_calculation)
     
     def calculate_only(self, request: GeometricCalculationRequest) -> CalculationResult:
@@ -49,41 +85,105 @@ class GeometryController:
             calculation_type=request.calculation_type
         )
     
+    def calculate_polygons(self, request: PolygonBatchRequest) -> PolygonBatchResponse:
+        """Calcular un lote de polígonos y, opcionalmente, guardarlos en una transacción"""
+        results = self.service.calculate_polygons(request.geometries, request.calculation_type)
+        ids = None
+        if request.save:
+            ids = self.repository.create_calculations_bulk(self.user_id, results)
+            invalidate_calculations(ids)
+            for result in results:
+                sketch_registry.observe(result.shape_type, result.dimensions, result.area, result.volume)
+        return PolygonBatchResponse(ids=ids, results=results)
+    
+    @staticmethod
+    def polygon_batch_columns(response: PolygonBatchResponse) -> Dict[str, List[Any]]:
+        """Organizar un lote de polígonos por columnas para respuestas binarias"""
+        results = response.results
+        columns = {}
+        if response.ids is not None:
+            columns["id"] = response.ids
+        columns["area"] = [result.area for result in results]
+        columns["perimeter"] = [result.perimeter for result in results]
+        columns["centroid_x"] = [result.centroid[0] if result.centroid else None for result in results]
+        columns["centroid_y"] = [result.centroid[1] if result.centroid else None for result in results]
+        columns["vertices"] = [result.dimensions["vertices"] for result in results]
+        return columns
+    
+    def _owned(self, cached: Any) -> Optional[GeometricCalculationResponse]:
+        # La caché guarda (propietario, respuesta): un cálculo ajeno se trata como inexistente
+        if cached is NOT_FOUND:
+            return None
+        owner_id, response = cached
+        return response if owner_id == self.user_id else None
+    
     def get_calculation_by_id(self, calculation_id: int) -> Optional[GeometricCalculationResponse]:
-        """Obtener un cálculo por ID"""
-        calculation = self.repository.get_calculation_by_id(calculation_id)
-        if calculation:
-            return GeometricCalculationResponse.from_orm(calculation)
-        return None
+        """Obtener un cálculo del usuario por ID (a través de la caché de lectura)"""
+        cache = get_calculation_cache()
+        cached = cache.get(calculation_id)
+        if cached is None:
+            generation = cache.generation
+            calculation = self.repository.get_calculation_by_id(calculation_id)
+            if calculation:
+                cached = (calculation.user_id, GeometricCalculationResponse.from_orm(calculation))
+            else:
+                cached = NOT_FOUND
+            cache.set(calculation_id, cached, generation)
+        return self._owned(cached)
+    
+    def get_calculations_by_ids(self, calculation_ids: List[int]) -> CalculationBatchResponse:
+        """Obtener varios cálculos; los que no están en caché se leen con una sola consulta"""
+        cache = get_calculation_cache()
+        requested = list(dict.fromkeys(calculation_ids))
+        found = cache.get_many(requested)
+        
+        pending = [calculation_id for calculation_id in requested if calculation_id not in found]
+        if pending:
+            generation = cache.generation
+            for calculation in self.repository.get_calculations_by_ids(pending):
+                found[calculation.id] = (calculation.user_id, GeometricCalculationResponse.from_orm(calculation))
+            for calculation_id in pending:
+                cache.set(calculation_id, found.setdefault(calculation_id, NOT_FOUND), generation)
+        
+        owned = {calculation_id: self._owned(found[calculation_id]) for calculation_id in requested}
+        return CalculationBatchResponse(
+            calculations=[owned[i] for i in requested if owned[i] is not None],
+            missing_ids=[i for i in requested if owned[i] is None]
+        )
     
     def get_all_calculations(self, skip: int = 0, limit: int = 100) -> List[GeometricCalculationResponse]:
-        """Obtener todos los cálculos"""
-        calculations = self.repository.get_all_calculations(skip=skip, limit=limit)
+        """Obtener los cálculos del usuario"""
+        calculations = self.repository.get_all_calculations(self.user_id, skip=skip, limit=limit)
         return [GeometricCalculationResponse.from_orm(calc) for calc in calculations]
     
     def get_calculations_by_shape_type(self, shape_type: str, 
                                      skip: int = 0, limit: int = 100) -> List[GeometricCalculationResponse]:
-        """Obtener cálculos por tipo de forma"""
+        """Obtener los cálculos del usuario por tipo de forma"""
         calculations = self.repository.get_calculations_by_shape_type(
-            shape_type=shape_type, skip=skip, limit=limit
+            self.user_id, shape_type=shape_type, skip=skip, limit=limit
         )
         return [GeometricCalculationResponse.from_orm(calc) for calc in calculations]
     
+    def get_calculation_columns(self, skip: int = 0, limit: int = 100,
+                                shape_type: Optional[str] = None) -> Dict[str, List[Any]]:
+        """Obtener cálculos organizados por columnas para respuestas binarias"""
+        return self.repository.get_calculation_columns(
+            self.user_id, skip=skip, limit=limit, shape_type=shape_type
+        )
+    
     def delete_calculation(self, calculation_id: int) -> bool:
-        """Eliminar un cálculo"""
-        return self.repository.delete_calculation(calculation_id)
+        """Eliminar un cálculo del usuario e invalidarlo en la caché de todos los workers"""
+        deleted = self.repository.delete_calculation(self.user_id, calculation_id)
+        if deleted:
+            invalidate_calculations([calculation_id])
+        return deleted
     
     def get_statistics(self) -> dict:
-        """Obtener estadísticas de los cálculos"""
-        total_calculations = self.repository.get_calculations_count()
-        
-        # Contar por tipo de forma
-        shape_counts = {}
-        for shape_type in ["cube", "sphere", "cylinder", "square", "circle"]:
-            calculations = self.repository.get_calculations_by_shape_type(shape_type)
-            shape_counts[shape_type] = len(calculations)
+        """Obtener estadísticas de los cálculos del usuario"""
+        shape_counts = dict.fromkeys(STATISTICS_SHAPES, 0)
+        shape_counts.update(self.repository.get_counts_by_shape(self.user_id))
         
         return {
-            "total_calculations": total_calculations,
+            "total_calculations": sum(shape_counts.values()),
             "calculations_by_shape": shape_counts
         } 
\ No newline at end of file
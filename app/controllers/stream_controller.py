@@ -0,0 +1,172 @@
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.rate_limit import get_rate_limit_store, get_rule
+from app.core.cache import invalidate_calculations
+from app.db.database import SessionLocal
+from app.models.schemas import CalculationResult
+from app.models.user import User
+from app.repositories.calculation_repository import CalculationRepository
+from app.services.geometry_service import GeometryService
+from app.services.sketches import sketch_registry
+
+
+class StreamController:
+    """Canal de cálculos geométricos sobre una conexión WebSocket ya autenticada.
+
+    Mensajes del cliente::
+
+        {"id": "a1", "shape_type": "cube", "dimensions": {"side": 2},
+         "calculation_type": "both", "persist": false}
+
+    Respuestas del servidor, etiquetadas con el ``id`` del cliente::
+
+        {"type": "result", "id": "a1", "result": {...}}
+        {"type": "error", "id": "a1", "detail": "..."}
+        {"type": "persisted", "items": [{"id": "a1", "calculation_id": 42}]}
+
+    Los mensajes con ``persist`` se guardan en lotes de ``batch_size`` o cada
+    ``flush_interval`` segundos. Cada mensaje ocupa un hueco hasta que se
+    responde (y, si se persiste, hasta que se guarda); con todos los huecos
+    ocupados se deja de leer del socket, lo que frena al cliente. Por eso un
+    lote no puede superar ``max_in_flight`` mensajes.
+
+    Cada mensaje consume además un token de la cubeta ``stream`` del usuario
+    (``RATE_LIMIT_RULES``); sin tokens se espera a la recarga antes de leer
+    el siguiente.
+    """
+
+    def __init__(self, websocket: WebSocket, user: User,
+                 max_in_flight: int = settings.STREAM_MAX_IN_FLIGHT,
+                 batch_size: int = settings.STREAM_BATCH_SIZE,
+                 flush_interval: float = settings.STREAM_FLUSH_INTERVAL):
+        self.websocket = websocket
+        self.user = user
+        self.service = GeometryService()
+        self.batch_size = max(1, min(batch_size, max_in_flight))
+        self._rule = get_rule("stream")
+        self.flush_interval = flush_interval
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending: List[Tuple[Any, CalculationResult]] = []
+        self._flush_lock = asyncio.Lock()
+        self._closed = False
+
+    async def run(self) -> None:
+        """Procesar mensajes hasta que el cliente cierre la conexión"""
+        flusher = asyncio.create_task(self._flush_periodically())
+        try:
+            while True:
+                await self._slots.acquire()
+                await self._throttle()
+                try:
+                    message = await self.websocket.receive_json()
+                except WebSocketDisconnect:
+                    self._slots.release()
+                    break
+                except ValueError:
+                    self._slots.release()
+                    await self._send({"type": "error", "id": None, "detail": "Mensaje JSON inválido"})
+                    continue
+                await self._handle(message)
+        finally:
+            self._closed = True
+            flusher.cancel()
+            await self._flush()
+
+    async def _throttle(self) -> None:
+        """Esperar a que la cubeta del usuario admita otro mensaje"""
+        if self._rule is None or not settings.RATE_LIMIT_ENABLED:
+            return
+        store = get_rate_limit_store()
+        while True:
+            wait = store.consume(f"{self.user.id}:stream", self._rule)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _handle(self, message: Any) -> None:
+        if not isinstance(message, dict):
+            self._slots.release()
+            await self._send({"type": "error", "id": None, "detail": "El mensaje debe ser un objeto"})
+            return
+
+        message_id = message.get("id")
+        try:
+            result = self.service.calculate_shape(
+                shape_type=message.get("shape_type"),
+                dimensions=message.get("dimensions") or {},
+                calculation_type=message.get("calculation_type", "both")
+            )
+        except (ValueError, TypeError) as e:
+            self._slots.release()
+            await self._send({"type": "error", "id": message_id, "detail": str(e)})
+            return
+
+        await self._send({"type": "result", "id": message_id, "result": result.dict()})
+
+        if not message.get("persist"):
+            self._slots.release()
+            return
+
+        # El hueco se libera cuando el lote queda guardado
+        self._pending.append((message_id, result))
+        if len(self._pending) >= self.batch_size:
+            await self._flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    async def _flush(self) -> None:
+        """Guardar en una sola transacción los resultados pendientes"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                calculation_ids = await run_in_threadpool(
+                    self._save_batch, [result for _, result in batch]
+                )
+            except Exception as e:
+                await self._send({
+                    "type": "error",
+                    "ids": [message_id for message_id, _ in batch],
+                    "detail": f"Error guardando cálculos: {str(e)}"
+                })
+            else:
+                await self._send({
+                    "type": "persisted",
+                    "items": [
+                        {"id": message_id, "calculation_id": calculation_id}
+                        for (message_id, _), calculation_id in zip(batch, calculation_ids)
+                    ]
+                })
+            finally:
+                for _ in batch:
+                    self._slots.release()
+
+    def _save_batch(self, results: List[CalculationResult]) -> List[int]:
+        # Sesión corta por lote: la conexión WebSocket no retiene conexiones del pool
+        db = SessionLocal()
+        try:
+            ids = CalculationRepository(db).create_calculations_bulk(self.user.id, results)
+        finally:
+            db.close()
+        invalidate_calculations(ids)
+        for result in results:
+            sketch_registry.observe(result.shape_type, result.dimensions, result.area, result.volume)
+        return ids
+
+    async def _send(self, payload: Dict[str, Any]) -> None:
+        if self._closed:
+            return
+        try:
+            await self.websocket.send_json(payload)
+        except (WebSocketDisconnect, RuntimeError):
+            # El cliente ya se fue; los resultados guardados siguen en la base de datos
+            self._closed = True
@@ -0,0 +1,71 @@
+import io
+import math
+from typing import Iterator, List
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.negotiation import pa
+from app.models.schemas import SweepRequest, SweepResponse, SweepReductionResult
+from app.services.sweep_service import SweepGrid, reduce_grid
+
+class SweepController:
+    """Controlador para barridos de parámetros sobre rejillas de dimensiones"""
+
+    def __init__(self, request: SweepRequest):
+        self.request = request
+        # Con reducciones la rejilla no sale del servidor y admite más puntos
+        max_points = settings.SWEEP_MAX_REDUCE_POINTS if request.reductions else settings.SWEEP_MAX_POINTS
+        self.grid = SweepGrid(request.shape_type, request.dimensions, max_points)
+        self.chunk_size = settings.SWEEP_CHUNK_POINTS
+
+    def _columns(self) -> List[str]:
+        columns = list(self.grid.names)
+        if self.request.calculation_type in ["area", "both"]:
+            columns.append("area")
+        if self.request.calculation_type in ["volume", "both"] and self.grid.has_volume:
+            columns.append("volume")
+        return columns
+
+    def _chunk_columns(self) -> Iterator[List[list]]:
+        names = self._columns()
+        for _, dimensions, area, volume in self.grid.chunks(self.chunk_size):
+            values = {"area": area, "volume": volume, **dimensions}
+            yield [values[name] for name in names]
+
+    def reduce(self) -> SweepResponse:
+        """Evaluar la rejilla completa devolviendo solo las reducciones pedidas"""
+        results = reduce_grid(self.grid, self.request.reductions, self.chunk_size)
+        return SweepResponse(
+            shape_type=self.grid.shape_type,
+            points=self.grid.size,
+            reductions=[SweepReductionResult(**result) for result in results]
+        )
+
+    def iter_ndjson(self) -> Iterator[bytes]:
+        """Una línea JSON por punto, en el orden de la rejilla.
+
+        Los resultados que desbordan (inf) o no son números se escriben como null.
+        """
+        # repr de un float finito de Python es un número JSON válido
+        template = "{" + ", ".join(f'"{name}": %s' for name in self._columns()) + "}\n"
+        for columns in self._chunk_columns():
+            values = [
+                map(repr, column.tolist()) if np.isfinite(column).all()
+                else [repr(value) if math.isfinite(value) else "null" for value in column.tolist()]
+                for column in columns
+            ]
+            yield "".join(template % row for row in zip(*values)).encode()
+
+    def iter_arrow(self) -> Iterator[bytes]:
+        """Stream IPC de Arrow con un lote por bloque de la rejilla"""
+        names = self._columns()
+        schema = pa.schema([(name, pa.float64()) for name in names])
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            for columns in self._chunk_columns():
+                writer.write_batch(pa.RecordBatch.from_arrays([pa.array(column) for column in columns], schema=schema))
+                yield sink.getvalue()
+                sink.seek(0)
+                sink.truncate()
+        yield sink.getvalue()
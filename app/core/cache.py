@@ -0,0 +1,212 @@
+"""
+Caché de lectura para cálculos individuales.
+
+Un cálculo guardado no cambia hasta que se elimina, así que las lecturas por
+ID se sirven desde una caché LRU acotada en memoria del worker, con
+caducidad. Los IDs inexistentes (404) también se cachean, durante menos
+tiempo. Cada entrada guarda el propietario del cálculo, que se comprueba en
+cada lectura. Al crear o eliminar cálculos se invalidan sus entradas en este
+proceso y, si hay ``REDIS_URL``, se publica la invalidación para el resto de
+workers. Si Redis no está disponible al arrancar, la caché sigue siendo solo
+local con una caducidad corta (``CALCULATION_CACHE_FALLBACK_TTL``).
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from app.core.config import settings
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependencia opcional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Entrada de caché negativa: se sabe que el ID no existe
+NOT_FOUND = object()
+
+INVALIDATION_CHANNEL = "calculation-cache:invalidate"
+
+
+class LRUCache:
+    """Caché LRU con caducidad, entradas negativas y protección frente a carreras.
+
+    Antes de consultar la base de datos se toma ``generation``; ``set`` con
+    esa marca se descarta si entretanto se invalidó esa misma clave, para no
+    volver a guardar un valor leído antes de un cambio. Cada invalidación deja
+    una marca por clave durante ``TOMBSTONE_TTL`` segundos; al retirarla, las
+    lecturas empezadas antes ya no pueden guardar nada.
+    """
+
+    TOMBSTONE_TTL = 30.0
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Clave -> (generación, instante) de su última invalidación
+        self._tombstones: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Las lecturas anteriores a esta generación no pueden guardar ninguna clave
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable, now: float) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Valor cacheado, ``NOT_FOUND`` si se sabe que no existe, o None si no está en caché"""
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Entradas presentes (incluidas las negativas) de varias claves"""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                value = self._lookup(key, now)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[key] = value
+        return found
+
+    def set(self, key: Hashable, value: Any, generation: int) -> None:
+        ttl = self.negative_ttl if value is NOT_FOUND else self.ttl
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            tombstone = self._tombstones.get(key)
+            if generation < self._floor or tombstone is not None and tombstone[0] > generation:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+                self._tombstones.pop(key, None)
+                self._tombstones[key] = (self.generation, now)
+            self._prune_tombstones(now)
+
+    def _prune_tombstones(self, now: float) -> None:
+        # Se retiran las más antiguas (o el exceso) subiendo el suelo hasta su generación
+        while self._tombstones:
+            key, (generation, invalidated_at) = next(iter(self._tombstones.items()))
+            if now - invalidated_at < self.TOMBSTONE_TTL and len(self._tombstones) <= max(self.max_entries, 1):
+                break
+            del self._tombstones[key]
+            self._floor = max(self._floor, generation)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._floor = self.generation
+            self._tombstones.clear()
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class RedisInvalidationBus:
+    """Difunde invalidaciones entre workers con pub/sub de Redis"""
+
+    def __init__(self, url: str, cache: LRUCache, channel: str = INVALIDATION_CHANNEL):
+        if redis is None:
+            raise RuntimeError("REDIS_URL configurado pero el paquete 'redis' no está instalado")
+        self.cache = cache
+        self.channel = channel
+        self.client = redis.Redis.from_url(url)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        # La suscripción queda hecha antes de que el worker cachee nada
+        self.pubsub.subscribe(**{channel: self._handle})
+        self.thread = self.pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=self._on_error
+        )
+
+    def _handle(self, message: dict) -> None:
+        try:
+            keys = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        self.cache.invalidate(keys)
+
+    def _on_error(self, error: Exception, pubsub, thread) -> None:
+        # Sin el canal no llegarían invalidaciones: se vacía la caché y se reintenta
+        logger.warning("Error en el canal de invalidación de caché: %s", error)
+        self.cache.clear()
+        time.sleep(1.0)
+
+    def publish(self, keys: List[Hashable]) -> None:
+        self.client.publish(self.channel, json.dumps(keys))
+
+
+_cache: Optional[LRUCache] = None
+_bus: Optional[RedisInvalidationBus] = None
+_cache_lock = threading.Lock()
+
+
+def get_calculation_cache() -> LRUCache:
+    """Obtener la caché de este worker (se crea al primer uso, ya tras el fork)"""
+    global _cache, _bus
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = LRUCache(
+                    settings.CALCULATION_CACHE_SIZE,
+                    settings.CALCULATION_CACHE_TTL,
+                    settings.CALCULATION_CACHE_NEGATIVE_TTL
+                )
+                if settings.REDIS_URL and settings.CALCULATION_CACHE_SIZE > 0:
+                    try:
+                        _bus = RedisInvalidationBus(settings.REDIS_URL, cache)
+                    except Exception:
+                        # Sin canal los demás workers no avisan de sus cambios: caducar pronto
+                        logger.exception("Sin canal de invalidación de caché; solo invalidación local")
+                        cache.ttl = min(cache.ttl, settings.CALCULATION_CACHE_FALLBACK_TTL)
+                        cache.negative_ttl = min(cache.negative_ttl, settings.CALCULATION_CACHE_FALLBACK_TTL)
+                _cache = cache
+    return _cache
+
+
+def invalidate_calculations(calculation_ids: List[int]) -> None:
+    """Invalidar cálculos en este worker y, si hay Redis, en todos los demás"""
+    if not calculation_ids:
+        return
+    get_calculation_cache().invalidate(calculation_ids)
+    if _bus is not None:
+        try:
+            _bus.publish(list(calculation_ids))
+        except Exception:
+            # El cambio ya está confirmado; los demás workers caducarán por TTL
+            logger.exception("No se pudo publicar la invalidación de %d cálculos", len(calculation_ids))
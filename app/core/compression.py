@@ -0,0 +1,479 @@
+"""
+Compresión de respuestas HTTP negociada con ``Accept-Encoding``.
+
+Se admiten ``gzip`` y, si están instalados los paquetes ``brotli`` y
+``zstandard``, ``br`` y ``zstd``. Entre las codificaciones que acepta el
+cliente se elige la de mayor ``q`` y, a igualdad, la primera de la lista
+configurada. Sin cabecera o sin ninguna aceptable la respuesta sale tal cual.
+
+Solo se comprimen tipos de contenido que lo aprovechan (texto, JSON, NDJSON,
+MessagePack, Arrow) y respuestas de al menos ``min_size`` bytes:
+
+- con el cuerpo completo se conoce el tamaño y se comprime de una vez (si no
+  reduce el tamaño se envía sin comprimir);
+- en streaming se retienen como mucho ``min_size`` bytes para decidir y, a
+  partir de ahí, cada bloque se comprime y se vacía al momento, de modo que
+  el cliente recibe los datos a medida que se generan.
+
+El umbral y el nivel de cada codificación se pueden ajustar por prefijo de
+ruta. Por ruta se acumulan bytes antes y después, tiempo de CPU y motivos por
+los que no se comprimió, para elegir umbrales y niveles con datos reales.
+"""
+
+import os
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+# Niveles admitidos por codificación
+LEVEL_RANGES = {"gzip": (1, 9), "br": (0, 11), "zstd": (1, 22)}
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/msgpack",
+    "application/vnd.apache.arrow.stream",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+# Bloques mayores se comprimen en el threadpool para no bloquear el bucle de eventos
+THREAD_MIN_CHUNK = 256 * 1024
+
+# Límites superiores (en bytes sin comprimir) de los tramos de tamaño de las estadísticas
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def available_encodings() -> List[str]:
+    """Codificaciones que este proceso puede generar (según dependencias instaladas)"""
+    encodings = ["gzip"]
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    return encodings
+
+
+def _check_level(encoding: str, level: int) -> None:
+    if encoding not in LEVEL_RANGES:
+        raise ValueError(f"Codificación no soportada: {encoding}")
+    low, high = LEVEL_RANGES[encoding]
+    if not low <= level <= high:
+        raise ValueError(f"El nivel de {encoding} debe estar entre {low} y {high}")
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Convertir "gzip=6,br=4" en niveles por codificación"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        encoding, _, level = item.partition("=")
+        levels[encoding.strip()] = int(level)
+        _check_level(encoding.strip(), levels[encoding.strip()])
+    return levels
+
+
+@dataclass
+class CompressionRule:
+    """Ajustes de un prefijo de ruta; lo que no se indica usa la configuración global"""
+    enabled: bool = True
+    min_size: Optional[int] = None
+    levels: Dict[str, int] = field(default_factory=dict)
+
+
+def parse_route_rules(spec: str) -> Dict[str, CompressionRule]:
+    """Convertir "/api/v1/geometry/calculations=512/br:5,/api/v1/geometry/mesh=off" en reglas.
+
+    Cada regla es ``prefijo=ajustes``, con los ajustes separados por ``/``:
+    un número es el umbral en bytes, ``codificación:nivel`` un nivel y ``off``
+    desactiva la compresión.
+    """
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        prefix, _, values = item.partition("=")
+        rule = CompressionRule()
+        for value in filter(None, (part.strip() for part in values.split("/"))):
+            if value == "off":
+                rule.enabled = False
+            elif ":" in value:
+                encoding, _, level = value.partition(":")
+                _check_level(encoding, int(level))
+                rule.levels[encoding] = int(level)
+            else:
+                rule.min_size = int(value)
+        rules[prefix.strip()] = rule
+    return rules
+
+
+def negotiate_encoding(accept_encoding: Optional[str], preference: List[str]) -> Optional[str]:
+    """Codificación preferida aceptable para el cliente, o None para enviar sin comprimir.
+
+    Respeta los valores ``q`` y el comodín ``*``; a igualdad de ``q`` decide el
+    orden de ``preference``.
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(","):
+        name, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        name = name.lower()
+        qualities["gzip" if name == "x-gzip" else name] = q
+
+    best, best_q = None, 0.0
+    for encoding in preference:
+        q = qualities.get(encoding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Encoder:
+    """Compresor incremental; cada bloque sale vaciado para no retener datos del stream"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        self.level = level
+        self.cpu = 0.0
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        start = time.thread_time()
+        compressor = self._compressor
+        if self.encoding == "gzip":
+            output = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        elif self.encoding == "br":
+            output = compressor.process(data) + (compressor.finish() if final else compressor.flush())
+        else:
+            output = compressor.compress(data) + compressor.flush(
+                zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            )
+        self.cpu += time.thread_time() - start
+        return output
+
+    async def compress_async(self, data: bytes, final: bool) -> bytes:
+        if len(data) >= THREAD_MIN_CHUNK:
+            return await anyio.to_thread.run_sync(self.compress, data, final)
+        return self.compress(data, final)
+
+
+@dataclass
+class CompressionTotals:
+    responses: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    cpu_seconds: float = 0.0
+
+    def add(self, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+        self.responses += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.cpu_seconds += cpu_seconds
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "responses": self.responses,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "saved_bytes": self.bytes_in - self.bytes_out,
+            "ratio": self.bytes_out / self.bytes_in if self.bytes_in else None,
+            "cpu_ms": self.cpu_seconds * 1000,
+            "cpu_ms_per_mb": self.cpu_seconds * 1000 / (self.bytes_in / 1e6) if self.bytes_in else None,
+        }
+
+
+class EncodingStats(CompressionTotals):
+    """Totales de una codificación y nivel, también por tramos de tamaño"""
+
+    def __init__(self):
+        super().__init__()
+        self.sizes: Dict[Optional[int], CompressionTotals] = {}
+
+    def add(self, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+        super().add(bytes_in, bytes_out, cpu_seconds)
+        bucket = next((limit for limit in SIZE_BUCKETS if bytes_in <= limit), None)
+        self.sizes.setdefault(bucket, CompressionTotals()).add(bytes_in, bytes_out, cpu_seconds)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            **super().report(),
+            "sizes": [
+                {"max_bytes": limit, **self.sizes[limit].report()}
+                for limit in SIZE_BUCKETS + (None,) if limit in self.sizes
+            ],
+        }
+
+
+class RouteStats:
+    def __init__(self):
+        self.responses = 0
+        self.skipped: Counter = Counter()
+        self.encodings: Dict[Tuple[str, int], EncodingStats] = {}
+
+    def report(self, route: str) -> Dict[str, Any]:
+        return {
+            "route": route,
+            "responses": self.responses,
+            "skipped": dict(self.skipped),
+            "compressed": [
+                {"encoding": encoding, "level": level, **stats.report()}
+                for (encoding, level), stats in sorted(self.encodings.items())
+            ],
+        }
+
+
+class Compressor:
+    """Configuración de la compresión de este worker y sus estadísticas por ruta"""
+
+    def __init__(self, enabled: bool, min_size: int, encodings: List[str], levels: Dict[str, int],
+                 routes: Dict[str, CompressionRule]):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.encodings = [encoding for encoding in encodings if encoding in available_encodings()]
+        self.levels = {"gzip": 6, "br": 4, "zstd": 3, **levels}
+        self.routes = routes
+        self.stats: Dict[str, RouteStats] = {}
+
+    def rule_for(self, path: str) -> CompressionRule:
+        """Regla del prefijo más largo que coincide con la ruta"""
+        best = None
+        for prefix in self.routes:
+            if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.routes[best] if best is not None else CompressionRule()
+
+    def configure(self, enabled: Optional[bool] = None, min_size: Optional[int] = None,
+                  levels: Optional[Dict[str, int]] = None,
+                  routes: Optional[Dict[str, CompressionRule]] = None) -> None:
+        """Cambiar la configuración en caliente; valida todo antes de aplicar nada"""
+        for encoding, level in (levels or {}).items():
+            _check_level(encoding, level)
+        for rule in (routes or {}).values():
+            for encoding, level in rule.levels.items():
+                _check_level(encoding, level)
+        if enabled is not None:
+            self.enabled = enabled
+        if min_size is not None:
+            self.min_size = min_size
+        if levels:
+            self.levels.update(levels)
+        if routes is not None:
+            self.routes = routes
+
+    def record_skip(self, route: str, reason: str) -> None:
+        stats = self.stats.setdefault(route, RouteStats())
+        stats.responses += 1
+        stats.skipped[reason] += 1
+
+    def record(self, route: str, encoder: Encoder, bytes_in: int, bytes_out: int) -> None:
+        stats = self.stats.setdefault(route, RouteStats())
+        stats.responses += 1
+        key = (encoder.encoding, encoder.level)
+        stats.encodings.setdefault(key, EncodingStats()).add(bytes_in, bytes_out, encoder.cpu)
+
+    def get_stats(self, route: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [
+            stats.report(name) for name, stats in sorted(self.stats.items())
+            if route is None or name == route
+        ]
+
+    def reset_stats(self) -> None:
+        self.stats.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "available_encodings": available_encodings(),
+            "encodings": self.encodings,
+            "min_size": self.min_size,
+            "levels": self.levels,
+            "routes": {
+                prefix: {"enabled": rule.enabled, "min_size": rule.min_size, "levels": rule.levels}
+                for prefix, rule in self.routes.items()
+            },
+            "pid": os.getpid(),
+        }
+
+
+def _compressible(headers: Headers) -> bool:
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type.endswith("+json") or media_type in COMPRESSIBLE_TYPES
+
+
+class _CompressedResponse:
+    """Envoltorio de ``send`` de una respuesta: decide al primer bloque y comprime los demás"""
+
+    def __init__(self, compressor: Compressor, scope: Scope, encoding: Optional[str], send: Send):
+        self.compressor = compressor
+        self.scope = scope
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self.encoder: Optional[Encoder] = None
+        self.decided = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', '(sin ruta)')}"
+
+    def _skip_reason(self, headers: Headers, rule: CompressionRule) -> Optional[str]:
+        if not rule.enabled:
+            return "disabled"
+        if "content-encoding" in headers:
+            return "encoded"
+        if not _compressible(headers):
+            return "media_type"
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return "status"
+        if "no-transform" in headers.get("cache-control", ""):
+            return "no_transform"
+        if self.encoding is None:
+            return "identity"
+        return None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.decided and self.encoder is None:
+            await self._flush_start()
+            await self.send(message)
+            return
+        if self.encoder is not None:
+            await self._send_compressed(message.get("body", b""), message.get("more_body", False))
+            return
+        await self._decide(message)
+
+    async def _flush_start(self) -> None:
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self.send(start)
+
+    async def _decide(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+        rule = self.compressor.rule_for(self.scope["path"])
+        min_size = self.compressor.min_size if rule.min_size is None else rule.min_size
+
+        reason = self._skip_reason(headers, rule)
+        if reason is None and "content-length" in headers and int(headers["content-length"]) < min_size:
+            reason = "small"
+        if reason is not None:
+            if reason in ("identity", "small"):
+                headers.add_vary_header("Accept-Encoding")
+            await self._passthrough(reason, message)
+            return
+
+        # Retener como mucho min_size bytes hasta saber si merece la pena
+        self.pending.append(body)
+        self.pending_size += len(body)
+        if more_body and self.pending_size < min_size:
+            return
+        data = b"".join(self.pending)
+        self.pending, self.pending_size = [], 0
+        headers.add_vary_header("Accept-Encoding")
+        if len(data) < min_size:
+            await self._passthrough("small", {"type": "http.response.body", "body": data})
+            return
+
+        level = rule.levels.get(self.encoding, self.compressor.levels[self.encoding])
+        self.encoder = Encoder(self.encoding, level)
+        self.decided = True
+        if not more_body:
+            compressed = await self.encoder.compress_async(data, final=True)
+            if len(compressed) >= len(data):
+                self.encoder = None
+                await self._passthrough("incompressible", {"type": "http.response.body", "body": data})
+                return
+            self._set_encoding_headers(headers)
+            headers["content-length"] = str(len(compressed))
+            await self._flush_start()
+            await self.send({"type": "http.response.body", "body": compressed})
+            self.compressor.record(self.route, self.encoder, len(data), len(compressed))
+            return
+
+        self._set_encoding_headers(headers)
+        del headers["content-length"]
+        await self._flush_start()
+        await self._send_compressed(data, more_body=True)
+
+    def _set_encoding_headers(self, headers: MutableHeaders) -> None:
+        headers["content-encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+
+    async def _passthrough(self, reason: str, message: Message) -> None:
+        self.decided = True
+        self.compressor.record_skip(self.route, reason)
+        await self._flush_start()
+        await self.send(message)
+
+    async def _send_compressed(self, body: bytes, more_body: bool) -> None:
+        compressed = await self.encoder.compress_async(body, final=not more_body)
+        self.bytes_in += len(body)
+        self.bytes_out += len(compressed)
+        if compressed or not more_body:
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+        if not more_body:
+            self.compressor.record(self.route, self.encoder, self.bytes_in, self.bytes_out)
+
+
+class CompressionMiddleware:
+    """Comprime las respuestas HTTP según ``Accept-Encoding`` y la configuración del ``Compressor``"""
+
+    def __init__(self, app: ASGIApp, compressor: Compressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.compressor.enabled or scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), self.compressor.encodings)
+        await self.app(scope, receive, _CompressedResponse(self.compressor, scope, encoding, send))
+
+
+compressor = Compressor(
+    enabled=settings.COMPRESSION_ENABLED,
+    min_size=settings.COMPRESSION_MIN_SIZE,
+    encodings=[encoding.strip() for encoding in settings.COMPRESSION_ENCODINGS.split(",") if encoding.strip()],
+    levels=parse_levels(settings.COMPRESSION_LEVELS),
+    routes=parse_route_rules(settings.COMPRESSION_ROUTES),
+)
@@ -14,7 +14,92 @@ class Settings:
     
     # Configuración de base de datos
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
-    
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+    # Configuración del servidor de producción (gunicorn)
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = automático según CPUs
+    BIND: str = os.getenv("BIND", "0.0.0.0:8000")
+    WORKER_MAX_REQUESTS: int = int(os.getenv("WORKER_MAX_REQUESTS", "10000"))
+    WORKER_MAX_REQUESTS_JITTER: int = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "1000"))
+    WORKER_MAX_MEMORY_MB: int = int(os.getenv("WORKER_MAX_MEMORY_MB", "0"))  # 0 = sin límite
+    WORKER_MEMORY_CHECK_INTERVAL: int = int(os.getenv("WORKER_MEMORY_CHECK_INTERVAL", "30"))
+    GRACEFUL_TIMEOUT: int = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+    WORKER_TIMEOUT: int = int(os.getenv("WORKER_TIMEOUT", "60"))
+    KEEPALIVE: int = int(os.getenv("KEEPALIVE", "5"))
+
+    # Almacén compartido opcional (Redis) para estado entre workers
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+
+    # Caché de lectura de cálculos por ID (por worker)
+    CALCULATION_CACHE_SIZE: int = int(os.getenv("CALCULATION_CACHE_SIZE", "10000"))  # 0 = desactivada
+    CALCULATION_CACHE_TTL: float = float(os.getenv("CALCULATION_CACHE_TTL", "300"))
+    CALCULATION_CACHE_NEGATIVE_TTL: float = float(os.getenv("CALCULATION_CACHE_NEGATIVE_TTL", "5"))
+    # Caducidad máxima si REDIS_URL está definido pero no se pudo conectar
+    CALCULATION_CACHE_FALLBACK_TTL: float = float(os.getenv("CALCULATION_CACHE_FALLBACK_TTL", "5"))
+    CALCULATION_BATCH_MAX_IDS: int = int(os.getenv("CALCULATION_BATCH_MAX_IDS", "1000"))
+
+    # Borrado masivo de cálculos
+    BULK_DELETE_CHUNK_SIZE: int = int(os.getenv("BULK_DELETE_CHUNK_SIZE", "5000"))
+    BULK_DELETE_CHUNK_PAUSE: float = float(os.getenv("BULK_DELETE_CHUNK_PAUSE", "0"))  # segundos entre lotes
+    BULK_DELETE_MAX_IDS: int = int(os.getenv("BULK_DELETE_MAX_IDS", "100000"))
+    # Segundos sin progreso tras los que un borrado en curso se puede reanudar
+    BULK_DELETE_STALE_AFTER: float = float(os.getenv("BULK_DELETE_STALE_AFTER", "600"))
+
+    # Perfilado de peticiones bajo demanda (por worker)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))  # fracción de peticiones
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")  # vacío = token aleatorio por proceso
+    PROFILING_INTERVAL: float = float(os.getenv("PROFILING_INTERVAL", "0.005"))  # segundos entre muestras
+    PROFILING_BUFFER_SIZE: int = int(os.getenv("PROFILING_BUFFER_SIZE", "50"))
+    PROFILING_MAX_SQL: int = int(os.getenv("PROFILING_MAX_SQL", "500"))  # sentencias guardadas por perfil
+
+    # Compresión de respuestas (gzip; br y zstd si están instalados brotli y zstandard)
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+    COMPRESSION_ENCODINGS: str = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")  # preferencia
+    COMPRESSION_LEVELS: str = os.getenv("COMPRESSION_LEVELS", "gzip=6,br=4,zstd=3")
+    # Ajustes por prefijo de ruta: "prefijo=umbral/codificación:nivel" u "prefijo=off", separados por comas
+    COMPRESSION_ROUTES: str = os.getenv("COMPRESSION_ROUTES", "")
+
+    # Límites de carga
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    # Cubetas por ruta: "nombre=capacidad/recarga_por_segundo", separadas por comas
+    RATE_LIMIT_RULES: str = os.getenv(
+        "RATE_LIMIT_RULES", "calculate=20/5,compute=50/20,read=100/50,stream=500/200,default=60/30"
+    )
+    MAX_IN_FLIGHT_REQUESTS: int = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", "200"))
+    MAX_IN_FLIGHT_PER_USER: int = int(os.getenv("MAX_IN_FLIGHT_PER_USER", "10"))
+
+    # Canal de cálculos por WebSocket
+    STREAM_MAX_IN_FLIGHT: int = int(os.getenv("STREAM_MAX_IN_FLIGHT", "64"))
+    # Como mucho STREAM_MAX_IN_FLIGHT: los mensajes de un lote ocupan hueco hasta guardarse
+    STREAM_BATCH_SIZE: int = int(os.getenv("STREAM_BATCH_SIZE", "32"))
+    STREAM_FLUSH_INTERVAL: float = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.5"))
+
+    # Agregados para analítica
+    ROLLUP_REFRESH_INTERVAL: int = int(os.getenv("ROLLUP_REFRESH_INTERVAL", "60"))  # 0 = desactivado
+    ROLLUP_BATCH_SIZE: int = int(os.getenv("ROLLUP_BATCH_SIZE", "50000"))
+
+    # Resúmenes de distribuciones (t-digest / HyperLogLog)
+    SKETCH_PERSIST_INTERVAL: int = int(os.getenv("SKETCH_PERSIST_INTERVAL", "30"))  # 0 = desactivado
+    SKETCH_COMPRESSION: float = float(os.getenv("SKETCH_COMPRESSION", "100"))
+    SKETCH_HLL_PRECISION: int = int(os.getenv("SKETCH_HLL_PRECISION", "14"))
+    # Solo con un único worker en marcha (ver DistributionController.rebuild)
+    SKETCH_REBUILD_ENABLED: bool = os.getenv("SKETCH_REBUILD_ENABLED", "false").lower() == "true"
+
+    # Mallas de triángulos (STL/OBJ)
+    MESH_MAX_UPLOAD_MB: int = int(os.getenv("MESH_MAX_UPLOAD_MB", "2048"))
+    MESH_CHUNK_TRIANGLES: int = int(os.getenv("MESH_CHUNK_TRIANGLES", "262144"))
+    MESH_PARALLEL_THRESHOLD: int = int(os.getenv("MESH_PARALLEL_THRESHOLD", "5000000"))
+    MESH_WORKERS: int = int(os.getenv("MESH_WORKERS", "0"))  # 0 = sin pool de procesos
+
+    # Barridos de parámetros
+    SWEEP_MAX_POINTS: int = int(os.getenv("SWEEP_MAX_POINTS", "1000000"))  # rejilla devuelta completa
+    SWEEP_MAX_REDUCE_POINTS: int = int(os.getenv("SWEEP_MAX_REDUCE_POINTS", "100000000"))
+    SWEEP_CHUNK_POINTS: int = int(os.getenv("SWEEP_CHUNK_POINTS", "65536"))
+
     # Configuración de la aplicación
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
     
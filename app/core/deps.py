@@ -1,13 +1,28 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import get_db, SessionLocal
 from app.models.user import User
 from app.core.security import verify_token
 from app.schemas.auth import TokenData
 
 security = HTTPBearer()
 
+def get_user_from_token(token: str, db: Session) -> Optional[User]:
+    """Obtiene el usuario de un token JWT, o None si no es válido"""
+    payload = verify_token(token)
+    if payload is None:
+        return None
+    
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    
+    token_data = TokenData(username=username)
+    
+    return db.query(User).filter(User.username == token_data.username).first()
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -19,18 +34,7 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    token = credentials.credentials
-    payload = verify_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    username: str = payload.get("sub")
-    if username is None:
-        raise credentials_exception
-    
-    token_data = TokenData(username=username)
-    
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = get_user_from_token(credentials.credentials, db)
     if user is None:
         raise credentials_exception
     
@@ -49,4 +53,28 @@ def get_current_superuser(current_user: User = Depends(get_current_user)) -> Use
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="No tienes permisos suficientes"
         )
-    return current_user 
\ No newline at end of file
+    return current_user 
+
+def get_websocket_user(websocket: WebSocket) -> Optional[User]:
+    """Autentica una conexión WebSocket una sola vez al conectar.
+
+    El token se toma del parámetro ``token`` de la URL o de la cabecera
+    ``Authorization: Bearer``. Devuelve None si no es válido o el usuario
+    está inactivo.
+    """
+    token = websocket.query_params.get("token")
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            token = credentials
+    if not token:
+        return None
+
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(token, db)
+    finally:
+        db.close()
+    if user is None or not user.is_active:
+        return None
+    return user
@@ -0,0 +1,163 @@
+"""
+Negociación de contenido para respuestas binarias.
+
+Según la cabecera ``Accept`` las rutas pueden responder en JSON (por defecto),
+MessagePack o Apache Arrow (formato IPC de streaming). Arrow se construye por
+columnas directamente a partir de las filas de la consulta, sin pasar por
+objetos Pydantic por fila.
+
+Todas las respuestas de una ruta negociada, también las JSON, llevan
+``Vary: Accept`` para que ninguna caché HTTP sirva un formato a quien pidió otro.
+"""
+
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - dependencia opcional
+    pa = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+NDJSON = "application/x-ndjson"
+
+_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+def available_media_types() -> List[str]:
+    """Formatos que este proceso puede generar (según dependencias instaladas)"""
+    types = [JSON]
+    if msgpack is not None:
+        types.append(MSGPACK)
+    if pa is not None:
+        types.append(ARROW)
+    return types
+
+
+def negotiate_media_type(request: Request, allowed: Optional[Sequence[str]] = None) -> str:
+    """Elegir el formato de respuesta a partir de la cabecera Accept.
+
+    Respeta los valores ``q``; si ningún formato soportado es aceptable se
+    responde en JSON.
+    """
+    accept = request.headers.get("accept")
+    if not accept:
+        return JSON
+
+    supported = [t for t in available_media_types() if allowed is None or t in allowed or t == JSON]
+    best, best_q = JSON, 0.0
+    for item in accept.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        media_type = _ALIASES.get(media_type.lower(), media_type.lower())
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in supported and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def vary_on_accept(response: Response) -> Response:
+    """Marcar que el cuerpo de la respuesta depende de la cabecera Accept"""
+    response.headers.add_vary_header("Accept")
+    return response
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+# Tipos Arrow de las columnas conocidas; el resto se infiere
+_ARROW_TYPES = {
+    "id": "int64",
+    "shape_type": "string",
+    "dimensions": "string",
+    "area": "float64",
+    "volume": "float64",
+    "perimeter": "float64",
+    "centroid_x": "float64",
+    "centroid_y": "float64",
+    "vertices": "int64",
+    "calculation_type": "string",
+    "created_at": "timestamp",
+    "updated_at": "timestamp",
+}
+
+
+def _arrow_type(name: str):
+    type_name = _ARROW_TYPES.get(name)
+    if type_name == "timestamp":
+        return pa.timestamp("us", tz="UTC")
+    if type_name is not None:
+        return getattr(pa, type_name)()
+    return None
+
+
+def encode_arrow(columns: Dict[str, List[Any]]) -> bytes:
+    """Serializar columnas como un stream IPC de Arrow con un único lote"""
+    arrays = [pa.array(values, type=_arrow_type(name)) for name, values in columns.items()]
+    batch = pa.RecordBatch.from_arrays(arrays, names=list(columns))
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue()
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    """Serializar con MessagePack; las fechas usan la extensión timestamp"""
+    return msgpack.packb(payload, datetime=True, default=_msgpack_default)
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return _utc(value)
+    raise TypeError(f"Tipo no serializable en MessagePack: {type(value).__name__}")
+
+
+def columns_to_records(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def columns_response(columns: Dict[str, List[Any]], media_type: str) -> Response:
+    """Respuesta binaria para un conjunto de filas ya organizado por columnas"""
+    for name in ("created_at", "updated_at"):
+        if name in columns:
+            columns[name] = [_utc(value) for value in columns[name]]
+
+    if media_type == ARROW:
+        return vary_on_accept(Response(content=encode_arrow(columns), media_type=ARROW))
+    return vary_on_accept(Response(content=encode_msgpack(columns_to_records(columns)), media_type=MSGPACK))
+
+
+def record_response(record: Dict[str, Any], media_type: str) -> Response:
+    """Respuesta binaria para un único objeto (Arrow lo envía como tabla de una fila)"""
+    if media_type == ARROW:
+        columns = {
+            name: [json.dumps(value) if isinstance(value, dict) else value]
+            for name, value in record.items()
+        }
+        return columns_response(columns, ARROW)
+    return vary_on_accept(Response(content=encode_msgpack(record), media_type=MSGPACK))
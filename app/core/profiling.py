@@ -0,0 +1,327 @@
+"""
+Perfilado de peticiones bajo demanda.
+
+Con el perfilado activado, se perfila una fracción ``sample_rate`` de las
+peticiones HTTP y toda petición que traiga la cabecera ``X-Profile-Token``
+con el token del proceso. De cada petición perfilada se guarda:
+
+- su árbol de llamadas, muestreando las pilas cada ``interval`` segundos
+  desde un hilo aparte, en formato plegado (``pila;de;llamadas cuenta``),
+  compatible con flamegraph.pl y speedscope;
+- sus sentencias SQL con su duración.
+
+Los perfiles se guardan en un búfer circular de tamaño fijo en memoria del
+worker. El hilo de muestreo y los eventos de SQLAlchemy solo existen
+mientras hay alguna petición perfilándose; sin perfilado, el middleware se
+limita a comprobar un booleano.
+
+Las muestras se atribuyen a su petición por la pila: en el hilo del bucle de
+eventos, por el marco del middleware que la atiende; en los hilos del
+threadpool, por el contexto con el que anyio ejecuta la función, que es una
+copia del de la petición. Esto último usa un detalle interno de anyio; si no
+está disponible se avisa en el log y en ``Profiler.status()``.
+
+Los IDs de perfil llevan el pid del worker (``<pid>-<n>``): con varios workers
+identifican también el proceso que guarda el perfil.
+"""
+
+import itertools
+import logging
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import Context, ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from anyio._backends._asyncio import WorkerThread
+except ImportError:  # pragma: no cover - otra versión de anyio
+    WorkerThread = None
+    logger.warning("Versión de anyio no reconocida: los perfiles no incluirán muestras del threadpool")
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+def _frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+class RequestProfile:
+    """Perfil de una petición: muestras de pila agregadas y sentencias SQL"""
+
+    def __init__(self, profile_id: str, method: str, path: str, trigger: str,
+                 interval: float, max_sql: int):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.interval = interval
+        self.max_sql = max_sql
+        self.started_at = datetime.now(timezone.utc)
+        self.status_code: Optional[int] = None
+        self.duration: Optional[float] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sql: List[Dict[str, Any]] = []
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self._start = time.perf_counter()
+
+    def add_sample(self, stack: str) -> None:
+        self.stacks[stack] += 1
+        self.samples += 1
+
+    def add_sql(self, statement: str, duration: float, executemany: bool) -> None:
+        self.sql_count += 1
+        self.sql_time += duration
+        if len(self.sql) < self.max_sql:
+            self.sql.append({
+                "statement": statement,
+                "duration_ms": duration * 1000,
+                "executemany": executemany
+            })
+
+    def finish(self, status_code: Optional[int]) -> None:
+        self.status_code = status_code
+        self.duration = time.perf_counter() - self._start
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": None if self.duration is None else self.duration * 1000,
+            "samples": self.samples,
+            "sample_interval_ms": self.interval * 1000,
+            "sql_count": self.sql_count,
+            "sql_time_ms": self.sql_time * 1000,
+        }
+
+    def detail(self) -> Dict[str, Any]:
+        return {
+            **self.summary(),
+            "stacks": [{"stack": stack, "count": count} for stack, count in self.stacks.most_common()],
+            "sql": self.sql,
+        }
+
+
+def fold_stacks(profiles: List[RequestProfile]) -> str:
+    """Pilas plegadas de uno o varios perfiles (una línea ``pila cuenta`` por pila)"""
+    merged: Counter = Counter()
+    for profile in profiles:
+        merged.update(profile.stacks)
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(merged.items()))
+
+
+class Profiler:
+    """Estado del perfilado de este worker y hilo de muestreo de pilas"""
+
+    def __init__(self, enabled: bool, sample_rate: float, token: str,
+                 interval: float, buffer_size: int, max_sql: int):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.token = token or secrets.token_urlsafe(16)
+        self.interval = interval
+        self.max_sql = max_sql
+        self.excluded_prefix = f"{settings.API_V1_STR}/admin"
+        self.profiles: "deque[RequestProfile]" = deque(maxlen=buffer_size)
+        self._active: Dict[str, RequestProfile] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def trigger(self, scope: Scope) -> Optional[str]:
+        """Motivo para perfilar la petición (``header`` o ``sample``), o None"""
+        if scope["path"].startswith(self.excluded_prefix):
+            return None
+        token = self.token.encode()
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return "header" if secrets.compare_digest(value, token) else None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def start(self, method: str, path: str, trigger: str) -> RequestProfile:
+        with self._lock:
+            # El contador se hereda del proceso maestro (preload); el pid distingue a cada worker
+            profile_id = f"{os.getpid()}-{next(self._ids)}"
+            profile = RequestProfile(profile_id, method, path, trigger, self.interval, self.max_sql)
+            if not self._active:
+                _listen_sql()
+            self._active[profile.id] = profile
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._sampler.start()
+        return profile
+
+    def finish(self, profile: RequestProfile, status_code: Optional[int]) -> None:
+        with self._lock:
+            profile.finish(status_code)
+            del self._active[profile.id]
+            if not self._active:
+                _unlisten_sql()
+            self.profiles.append(profile)
+
+    def get_profile(self, profile_id: str) -> Optional[RequestProfile]:
+        for profile in list(self.profiles):
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def get_profiles(self, path: Optional[str] = None) -> List[RequestProfile]:
+        profiles = list(self.profiles)
+        if path is not None:
+            profiles = [profile for profile in profiles if profile.path == path]
+        return profiles
+
+    def clear(self) -> None:
+        self.profiles.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "header": PROFILE_HEADER.decode(),
+            "token": self.token,
+            "sample_interval_ms": self.interval * 1000,
+            "buffer_size": self.profiles.maxlen,
+            "stored_profiles": len(self.profiles),
+            "active_profiles": len(self._active),
+            "pid": os.getpid(),
+            "threadpool_sampling": _WORKER_CODE is not None,
+        }
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own:
+                        continue
+                    profile, stack = _attribute(frame)
+                    if profile is not None and profile.id in self._active:
+                        profile.add_sample(f"{profile.method} {profile.path};{stack}")
+            time.sleep(self.interval)
+
+
+def _attribute(frame) -> Tuple[Optional[RequestProfile], str]:
+    """Petición a la que pertenece una pila y la pila plegada desde su entrada"""
+    labels = []
+    above = None
+    while frame is not None:
+        code = frame.f_code
+        if code is _PROFILED_CODE:
+            return frame.f_locals.get("profile"), ";".join(reversed(labels))
+        if code is _WORKER_CODE:
+            # Un hilo ocioso espera en la cola con el contexto de su última tarea
+            context = frame.f_locals.get("context")
+            if above is None or above.f_code is _QUEUE_GET_CODE or not isinstance(context, Context):
+                return None, ""
+            labels.append("<threadpool>")
+            return context.get(_current_profile), ";".join(reversed(labels))
+        labels.append(_frame_label(frame))
+        above = frame
+        frame = frame.f_back
+    return None, ""
+
+
+_QUERY_START = "profiling_query_start"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault(_QUERY_START, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    starts = conn.info.get(_QUERY_START)
+    if profile is None or not starts:
+        return
+    profile.add_sql(statement, time.perf_counter() - starts.pop(), executemany)
+
+
+def _listen_sql() -> None:
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _unlisten_sql() -> None:
+    event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ProfilingMiddleware:
+    """Perfila las peticiones HTTP que indique el ``Profiler``"""
+
+    def __init__(self, app: ASGIApp, profiler: "Profiler"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.profiler.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self.profiler.trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        await self._profiled(scope, receive, send, trigger)
+
+    async def _profiled(self, scope: Scope, receive: Receive, send: Send, trigger: str) -> None:
+        profile = self.profiler.start(scope["method"], scope["path"], trigger)
+        status_code = None
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, str(profile.id).encode())
+                ]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current_profile.reset(token)
+            self.profiler.finish(profile, status_code)
+
+
+_PROFILED_CODE = ProfilingMiddleware._profiled.__code__
+_WORKER_CODE = WorkerThread.run.__code__ if WorkerThread is not None else None
+_QUEUE_GET_CODE = queue.Queue.get.__code__
+
+profiler = Profiler(
+    enabled=settings.PROFILING_ENABLED,
+    sample_rate=settings.PROFILING_SAMPLE_RATE,
+    token=settings.PROFILING_TOKEN,
+    interval=settings.PROFILING_INTERVAL,
+    buffer_size=settings.PROFILING_BUFFER_SIZE,
+    max_sql=settings.PROFILING_MAX_SQL,
+)
@@ -0,0 +1,317 @@
+"""
+Control de admisión: cubetas de tokens por usuario y ruta, límite de peticiones
+concurrentes por usuario y límite global de peticiones en curso.
+
+El estado vive en memoria del proceso. Si se configura ``REDIS_URL`` las
+cubetas y los contadores por usuario se comparten entre workers; si Redis
+falla, cada worker sigue aplicando los límites con su estado en memoria.
+"""
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+from fastapi import Depends, HTTPException, status
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.deps import get_current_active_user
+from app.models.user import User
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependencia opcional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TokenBucketRule:
+    capacity: float
+    refill_rate: float  # tokens por segundo
+
+    def __post_init__(self):
+        if self.capacity <= 0 or self.refill_rate <= 0:
+            raise ValueError(
+                f"La capacidad y la recarga de una cubeta deben ser positivas "
+                f"({self.capacity}/{self.refill_rate})"
+            )
+
+
+def parse_rules(spec: str) -> Dict[str, TokenBucketRule]:
+    """Convertir "calculate=20/5,read=100/50" en reglas por nombre de ruta"""
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, values = item.partition("=")
+        capacity, _, rate = values.partition("/")
+        rules[name.strip()] = TokenBucketRule(float(capacity), float(rate))
+    return rules
+
+
+class InMemoryRateLimitStore:
+    """Estado de las cubetas y contadores en memoria del proceso"""
+
+    PRUNE_EVERY = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}
+        self._slots: Dict[str, int] = {}
+        self._operations = 0
+
+    def consume(self, key: str, rule: TokenBucketRule, tokens: float = 1) -> float:
+        """Consumir tokens; devuelve 0 si se admite o los segundos de espera"""
+        now = time.monotonic()
+        with self._lock:
+            self._operations += 1
+            if self._operations % self.PRUNE_EVERY == 0:
+                self._prune(now)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [rule.capacity, now, rule]
+            available = min(rule.capacity, bucket[0] + (now - bucket[1]) * rule.refill_rate)
+            bucket[1] = now
+            if available >= tokens:
+                bucket[0] = available - tokens
+                return 0.0
+            bucket[0] = available
+            return (tokens - available) / rule.refill_rate
+
+    def acquire_slot(self, key: str, limit: int) -> bool:
+        with self._lock:
+            current = self._slots.get(key, 0)
+            if current >= limit:
+                return False
+            self._slots[key] = current + 1
+            return True
+
+    def release_slot(self, key: str) -> bool:
+        """Liberar un hueco; devuelve False si la clave no tenía ninguno ocupado"""
+        with self._lock:
+            current = self._slots.get(key, 0)
+            if current > 1:
+                self._slots[key] = current - 1
+            else:
+                self._slots.pop(key, None)
+            return current > 0
+
+    def _prune(self, now: float) -> None:
+        """Eliminar cubetas que ya estarían llenas (equivalen a no tener estado)"""
+        full = [
+            key for key, (tokens, updated, rule) in self._buckets.items()
+            if tokens + (now - updated) * rule.refill_rate >= rule.capacity
+        ]
+        for key in full:
+            del self._buckets[key]
+
+
+class RedisRateLimitStore:
+    """Estado compartido entre workers en Redis.
+
+    Si una operación falla, se registra y se resuelve con un almacén en
+    memoria del proceso: los límites pasan a ser por worker en lugar de caer
+    todas las rutas protegidas con un 500.
+    """
+
+    TOKEN_BUCKET_SCRIPT = """
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local requested = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= requested then
+        tokens = tokens - requested
+    else
+        wait = (requested - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    ACQUIRE_SLOT_SCRIPT = """
+    local rejected = 0
+    if redis.call('INCR', KEYS[1]) > tonumber(ARGV[1]) then
+        redis.call('DECR', KEYS[1])
+        rejected = 1
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return rejected
+    """
+
+    # Solo decrementa una clave existente y nunca por debajo de 0: si la
+    # clave caducó durante una petición larga no se crea con valor negativo
+    RELEASE_SLOT_SCRIPT = """
+    local current = tonumber(redis.call('GET', KEYS[1]))
+    if not current then
+        return 0
+    end
+    if current <= 1 then
+        redis.call('DEL', KEYS[1])
+        return 0
+    end
+    redis.call('DECR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    return current - 1
+    """
+
+    SLOT_TTL = 300  # evita contadores huérfanos si un worker muere
+
+    def __init__(self, url: str, prefix: str = "ratelimit"):
+        if redis is None:
+            raise RuntimeError("REDIS_URL configurado pero el paquete 'redis' no está instalado")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._token_bucket = self.client.register_script(self.TOKEN_BUCKET_SCRIPT)
+        self._acquire_slot = self.client.register_script(self.ACQUIRE_SLOT_SCRIPT)
+        self._release_slot = self.client.register_script(self.RELEASE_SLOT_SCRIPT)
+        self.fallback = InMemoryRateLimitStore()
+
+    def consume(self, key: str, rule: TokenBucketRule, tokens: float = 1) -> float:
+        try:
+            wait = self._token_bucket(
+                keys=[f"{self.prefix}:bucket:{key}"],
+                args=[rule.capacity, rule.refill_rate, tokens]
+            )
+        except redis.RedisError as e:
+            logger.warning("Redis no disponible para el límite de peticiones; se usa memoria local: %s", e)
+            return self.fallback.consume(key, rule, tokens)
+        return float(wait)
+
+    def acquire_slot(self, key: str, limit: int) -> bool:
+        try:
+            rejected = self._acquire_slot(keys=[f"{self.prefix}:slots:{key}"], args=[limit, self.SLOT_TTL])
+        except redis.RedisError as e:
+            logger.warning("Redis no disponible para el límite de concurrencia; se usa memoria local: %s", e)
+            return self.fallback.acquire_slot(key, limit)
+        return not rejected
+
+    def release_slot(self, key: str) -> None:
+        # Los huecos tomados en memoria mientras Redis fallaba se devuelven allí
+        if self.fallback.release_slot(key):
+            return
+        try:
+            self._release_slot(keys=[f"{self.prefix}:slots:{key}"], args=[self.SLOT_TTL])
+        except redis.RedisError as e:
+            # Sin liberar, el contador caduca con SLOT_TTL
+            logger.warning("No se pudo liberar el hueco de concurrencia en Redis: %s", e)
+
+
+_store = None
+_store_lock = threading.Lock()
+_rules = parse_rules(settings.RATE_LIMIT_RULES)
+
+
+def get_rule(route: str) -> Optional[TokenBucketRule]:
+    """Regla de la ruta, o la de ``default`` si no tiene una propia"""
+    return _rules.get(route, _rules.get("default"))
+
+
+def get_rate_limit_store():
+    """Obtener el almacén configurado (Redis si hay REDIS_URL, memoria si no)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.REDIS_URL:
+                    _store = RedisRateLimitStore(settings.REDIS_URL)
+                else:
+                    _store = InMemoryRateLimitStore()
+    return _store
+
+
+def set_rate_limit_store(store) -> None:
+    """Reemplazar el almacén (por ejemplo, uno en memoria para pruebas)"""
+    global _store
+    _store = store
+
+
+def _retry_after(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class RateLimiter:
+    """Dependencia que admite o rechaza la petición del usuario autenticado.
+
+    Aplica la cubeta de tokens configurada para ``route`` y limita las
+    peticiones simultáneas del usuario. Devuelve el usuario actual, por lo
+    que sustituye a ``get_current_active_user`` en las rutas protegidas.
+    """
+
+    def __init__(self, route: str):
+        self.route = route
+        self.rule: Optional[TokenBucketRule] = get_rule(route)
+
+    def __call__(self, current_user: User = Depends(get_current_active_user)) -> Iterator[User]:
+        if not settings.RATE_LIMIT_ENABLED:
+            yield current_user
+            return
+
+        store = get_rate_limit_store()
+        if self.rule is not None:
+            wait = store.consume(f"{current_user.id}:{self.route}", self.rule)
+            if wait > 0:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiadas peticiones, inténtalo más tarde",
+                    headers=_retry_after(wait)
+                )
+
+        slot_key = str(current_user.id)
+        if not store.acquire_slot(slot_key, settings.MAX_IN_FLIGHT_PER_USER):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiadas peticiones simultáneas",
+                headers=_retry_after(1)
+            )
+        try:
+            yield current_user
+        finally:
+            store.release_slot(slot_key)
+
+
+class ConcurrencyLimitMiddleware:
+    """Rechaza con 503 las peticiones HTTP que superen el límite de peticiones
+    en curso del proceso, en lugar de encolarlas"""
+
+    def __init__(self, app: ASGIApp, max_in_flight: int, retry_after: int = 1):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.in_flight = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.max_in_flight <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        if self.in_flight >= self.max_in_flight:
+            await send({
+                "type": "http.response.start",
+                "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(self.retry_after).encode()),
+                ],
+            })
+            await send({
+                "type": "http.response.body",
+                "body": b'{"detail":"Servidor saturado, int\\u00e9ntalo m\\u00e1s tarde"}',
+            })
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,70 @@
+"""
+Tareas periódicas en segundo plano.
+
+Cada worker arranca sus tareas al iniciar la aplicación; las funciones se
+ejecutan en el pool de hilos para no bloquear el bucle de eventos. Si una
+tarea no debe ejecutarse en varios workers a la vez, la propia función debe
+coordinarse (por ejemplo, con un advisory lock de PostgreSQL).
+"""
+
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Ejecuta ``func`` cada ``interval`` segundos"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], object]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> None:
+        try:
+            await run_in_threadpool(self.func)
+        except Exception:
+            logger.exception("Error en la tarea periódica %s", self.name)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+
+_tasks: List[PeriodicTask] = []
+
+
+def register_periodic_task(name: str, interval: float, func: Callable[[], object]) -> PeriodicTask:
+    """Registrar una tarea que se arrancará con la aplicación"""
+    task = PeriodicTask(name, interval, func)
+    _tasks.append(task)
+    return task
+
+
+def start_periodic_tasks() -> None:
+    for task in _tasks:
+        task.start()
+
+
+async def stop_periodic_tasks() -> None:
+    for task in _tasks:
+        await task.stop()
@@ -0,0 +1,98 @@
+"""
+Subidas de ficheros grandes directamente a disco.
+
+Con parámetros ``File``/``Form``, FastAPI lee el formulario entero (a un
+SpooledTemporaryFile) antes de llamar al endpoint: el límite de tamaño solo se
+puede comprobar cuando ya se ha recibido todo y, para tener una ruta que mapear
+en memoria, hay que copiar el fichero otra vez. ``parse_upload`` rechaza por
+Content-Length antes de leer el cuerpo, aplica el límite mientras lo recibe y
+escribe cada fichero una sola vez en un temporal con nombre.
+
+``DiskMultiPartParser`` depende de atributos internos del parser de Starlette,
+por eso la versión de ``starlette`` está fijada en dependencias.txt.
+"""
+
+import os
+import tempfile
+from typing import IO, AsyncIterator, List
+
+from fastapi import HTTPException, Request, status
+from starlette.datastructures import FormData, UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+TOO_LARGE = "El fichero es demasiado grande"
+
+
+class DiskMultiPartParser(MultiPartParser):
+    """Parser multipart de Starlette que escribe cada fichero en un temporal con nombre"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handles: List[IO[bytes]] = []
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is None:
+            return
+        # Sustituir el SpooledTemporaryFile recién creado por un fichero en disco
+        spooled = upload.file
+        self._files_to_close_on_error.remove(spooled)
+        spooled.close()
+        suffix = os.path.splitext(upload.filename or "")[1]
+        handle = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        self.handles.append(handle)
+        self._files_to_close_on_error.append(handle)
+        upload.file = handle
+
+
+async def _limited(stream: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=TOO_LARGE)
+        yield chunk
+
+
+def remove_uploads(form: FormData) -> None:
+    """Borrar los temporales de los ficheros de un formulario de ``parse_upload``"""
+    for _, value in form.multi_items():
+        if isinstance(value, UploadFile):
+            value.file.close()
+            _unlink(value.file.name)
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def parse_upload(request: Request, max_bytes: int) -> FormData:
+    """Leer un formulario multipart limitando el tamaño total del cuerpo a ``max_bytes``.
+
+    Los ficheros quedan cerrados en disco (``upload.file.name``); quien llama
+    debe borrarlos con ``remove_uploads``.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=TOO_LARGE)
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Se esperaba multipart/form-data")
+
+    parser = DiskMultiPartParser(request.headers, _limited(request.stream(), max_bytes), max_files=1)
+    try:
+        form = await parser.parse()
+    except BaseException as e:
+        for handle in parser.handles:
+            handle.close()
+            _unlink(handle.name)
+        if isinstance(e, MultiPartException):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+        raise
+    for _, value in form.multi_items():
+        if isinstance(value, UploadFile):
+            value.file.close()
+    return form
@@ -4,7 +4,13 @@ from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
 # Crear engine de SQLAlchemy
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True
+)
 
 # Crear sesión
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -19,3 +25,16 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def reset_engine_after_fork():
+    """Descartar el pool heredado del proceso padre tras un fork.
+
+    Con ``preload_app`` el engine se crea en el proceso maestro; cada worker
+    debe abrir sus propias conexiones. ``close=False`` evita cerrar los sockets
+    que aún pertenecen al padre, y el engine crea un pool nuevo en el worker.
+    """
+    engine.dispose(close=False)
+
+def close_engine():
+    """Cerrar todas las conexiones del pool (apagado del proceso)"""
+    engine.dispose()
@@ -1,9 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.routers import geometry_routes, auth
-from app.db.database import engine
-from app.models import geometric_shape, user
+from app.core.rate_limit import ConcurrencyLimitMiddleware
+from app.core.profiling import ProfilingMiddleware, profiler
+from app.core.compression import CompressionMiddleware, compressor
+from app.routers import geometry_routes, assembly_routes, admin_routes, auth
+from app.db.database import engine, close_engine
+from app.models import geometric_shape, user, analytics, assembly, jobs
+from app.core.tasks import register_periodic_task, start_periodic_tasks, stop_periodic_tasks
+from app.controllers.analytics_controller import refresh_rollups_job, persist_sketches_job
+from app.services.mesh_service import shutdown_process_pool
 
 # Crear las tablas en la base de datos
 geometric_shape.Base.metadata.create_all(bind=engine)
@@ -43,18 +49,54 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# Configurar CORS
+# Los middlewares se listan del más interno al más externo (el último añadido
+# recibe la petición primero)
+
+# Compresión negociada con Accept-Encoding (dentro del perfilado, que mide su coste)
+app.add_middleware(CompressionMiddleware, compressor=compressor)
+
+# Perfilado bajo demanda (solo un booleano por petición si está desactivado)
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Rechazar peticiones cuando el proceso ya tiene demasiadas en curso
+app.add_middleware(ConcurrencyLimitMiddleware, max_in_flight=settings.MAX_IN_FLIGHT_REQUESTS)
+
+# Configurar CORS (el más externo, para que también los 503 lleven sus cabeceras)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
 
 # Incluir las rutas
 app.include_router(auth.router, prefix=settings.API_V1_STR)
 app.include_router(geometry_routes.router, prefix=settings.API_V1_STR)
+app.include_router(assembly_routes.router, prefix=settings.API_V1_STR)
+app.include_router(admin_routes.router, prefix=settings.API_V1_STR)
+
+# Tareas periódicas de cada worker
+if engine.dialect.name == "postgresql":
+    # Los agregados usan funciones de PostgreSQL (advisory locks, snapshots, upserts)
+    register_periodic_task("refresh-rollups", settings.ROLLUP_REFRESH_INTERVAL, refresh_rollups_job)
+persist_sketches = register_periodic_task(
+    "persist-sketches", settings.SKETCH_PERSIST_INTERVAL, persist_sketches_job
+)
+
+@app.on_event("startup")
+async def startup():
+    """Arrancar las tareas periódicas"""
+    start_periodic_tasks()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Detener las tareas y cerrar las conexiones a la base de datos"""
+    await stop_periodic_tasks()
+    await persist_sketches.run_once()
+    shutdown_process_pool()
+    # Único cierre del engine: con gunicorn, el worker de uvicorn también pasa por aquí
+    close_engine()
 
 @app.get("/", tags=["Información"])
 async def root():
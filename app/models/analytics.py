@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Text
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class CalculationRollup(Base):
+    """Agregados de cálculos por intervalo de tiempo y tipo de forma"""
+    __tablename__ = "calculation_rollups"
+
+    granularity = Column(String(10), primary_key=True)  # "minute", "hour", "day"
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    shape_type = Column(String(50), primary_key=True)
+    calculation_count = Column(BigInteger, nullable=False, default=0)
+    area_count = Column(BigInteger, nullable=False, default=0)
+    area_sum = Column(Float, nullable=False, default=0.0)
+    volume_count = Column(BigInteger, nullable=False, default=0)
+    volume_sum = Column(Float, nullable=False, default=0.0)
+
+class RollupWatermark(Base):
+    """Último cálculo incorporado a los agregados"""
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String(50), primary_key=True)
+    # Posición (created_xid, id) del último cálculo incorporado
+    last_xid = Column(BigInteger, nullable=False, default=0)
+    last_calculation_id = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime(timezone=True), nullable=True)
+
+class CalculationSketch(Base):
+    """Resumen combinable (t-digest o HyperLogLog) de una métrica por forma"""
+    __tablename__ = "calculation_sketches"
+
+    shape_type = Column(String(50), primary_key=True)
+    metric = Column(String(20), primary_key=True)  # "area", "volume", "dimensions"
+    payload = Column(Text, nullable=False)  # JSON del resumen
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class Assembly(Base):
+    """Ensamblaje de primitivas organizado como árbol de nodos"""
+    __tablename__ = "assemblies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String(200), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class AssemblyNode(Base):
+    """Nodo de un ensamblaje: grupo o primitiva.
+
+    ``area``/``volume`` son los de la propia primitiva (0 en los grupos) y
+    ``total_area``/``total_volume`` los acumulados de su subárbol, que se
+    mantienen al editar propagando solo la diferencia hasta la raíz.
+    """
+    __tablename__ = "assembly_nodes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    assembly_id = Column(Integer, ForeignKey("assemblies.id", ondelete="CASCADE"), nullable=False, index=True)
+    parent_id = Column(Integer, ForeignKey("assembly_nodes.id", ondelete="CASCADE"), nullable=True, index=True)
+    name = Column(String(200), nullable=True)
+    operation = Column(String(10), nullable=False, default="union")  # "union", "subtract"
+    shape_type = Column(String(50), nullable=True)  # None en los grupos
+    dimensions = Column(Text, nullable=True)  # JSON string con las dimensiones
+    area = Column(Float, nullable=False, default=0.0)
+    volume = Column(Float, nullable=False, default=0.0)
+    total_area = Column(Float, nullable=False, default=0.0)
+    total_volume = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    parent = relationship("AssemblyNode", remote_side=[id])
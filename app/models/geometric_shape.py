@@ -1,15 +1,54 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Text, ForeignKey, Index, DDL, event
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql import func
+from sqlalchemy.sql.expression import FunctionElement
 from app.db.database import Base
 
+class current_xact_id(FunctionElement):
+    """ID de la transacción actual (xid8) como entero; 0 fuera de PostgreSQL"""
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(current_xact_id)
+def _compile_current_xact_id(element, compiler, **kw):
+    return "0"
+
+@compiles(current_xact_id, "postgresql")
+def _compile_current_xact_id_postgresql(element, compiler, **kw):
+    return "(pg_current_xact_id()::text::bigint)"
+
 class GeometricCalculation(Base):
     __tablename__ = "geometric_calculations"
+    __table_args__ = (
+        # Consultas por usuario: listados por fecha y recuentos/listados por forma
+        Index("ix_geometric_calculations_user_created", "user_id", "created_at"),
+        Index("ix_geometric_calculations_user_shape", "user_id", "shape_type", "created_at"),
+        # Refresco incremental de los agregados por transacción de origen
+        Index("ix_geometric_calculations_created_xid", "created_xid", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     shape_type = Column(String(50), nullable=False, index=True)
     dimensions = Column(Text, nullable=False)  # JSON string con las dimensiones
     area = Column(Float, nullable=True)
     volume = Column(Float, nullable=True)
     calculation_type = Column(String(20), nullable=False)  # "area", "volume", "both"
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Transacción que insertó la fila (ver AnalyticsRepository.refresh_rollups)
+    created_xid = Column(BigInteger, nullable=False, server_default=current_xact_id())
+
+# Convierte el texto a JSONB o devuelve NULL si no es JSON válido (filas antiguas).
+# Se (re)crea en cada create_all, así que también llega a bases de datos existentes.
+TRY_JSONB = DDL("""
+CREATE OR REPLACE FUNCTION try_jsonb(value text) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    RETURN value::jsonb;
+EXCEPTION WHEN invalid_text_representation THEN
+    RETURN NULL;
+END;
+$$
+""")
+event.listen(Base.metadata, "after_create", TRY_JSONB.execute_if(dialect="postgresql"))
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, ForeignKey
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class BulkDeleteJob(Base):
+    """Borrado masivo de cálculos y su progreso"""
+    __tablename__ = "bulk_delete_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    criteria = Column(Text, nullable=False)  # JSON con los IDs o el filtro
+    deleted_count = Column(BigInteger, nullable=False, default=0)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    last_deleted_id = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Se actualiza con cada lote: sin cambios durante un tiempo, el trabajo se da por abandonado
+    updated_at = Column(DateTime(timezone=True), nullable=True, onupdate=func.now())
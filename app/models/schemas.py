@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Union, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Union, Dict, Any, List
 from datetime import datetime
 
 # Esquemas base para dimensiones
@@ -19,10 +19,57 @@ class SquareDimensions(BaseModel):
 class CircleDimensions(BaseModel):
     radius: float = Field(..., gt=0, description="Radio del círculo")
 
+class PolygonDimensions(BaseModel):
+    """Polígono o multipolígono con huecos, como listas anidadas o empaquetado"""
+    polygons: Optional[List[List[List[List[float]]]]] = Field(
+        None, description="Lista de polígonos; cada uno es una lista de anillos [[x, y], ...], "
+                          "el primero exterior y el resto huecos"
+    )
+    coordinates: Optional[str] = Field(
+        None, description="Pares x, y en float64 little-endian codificados en base64"
+    )
+    ring_offsets: Optional[List[int]] = Field(
+        None, description="Vértice inicial de cada anillo seguido del número total de vértices"
+    )
+    polygon_offsets: Optional[List[int]] = Field(
+        None, description="Anillo inicial de cada polígono seguido del número total de anillos"
+    )
+
+    class Config:
+        extra = "forbid"
+
+    @model_validator(mode="after")
+    def check_representation(self):
+        if (self.polygons is None) == (self.coordinates is None):
+            raise ValueError("Indica 'polygons' o 'coordinates', pero no ambos")
+        return self
+
+class PolylineDimensions(BaseModel):
+    """Una o varias polilíneas abiertas, como listas anidadas o empaquetadas"""
+    paths: Optional[List[List[List[float]]]] = Field(
+        None, description="Lista de trazos, cada uno una lista de vértices [x, y]"
+    )
+    coordinates: Optional[str] = Field(
+        None, description="Pares x, y en float64 little-endian codificados en base64"
+    )
+    path_offsets: Optional[List[int]] = Field(
+        None, description="Vértice inicial de cada trazo seguido del número total de vértices"
+    )
+
+    class Config:
+        extra = "forbid"
+
+    @model_validator(mode="after")
+    def check_representation(self):
+        if (self.paths is None) == (self.coordinates is None):
+            raise ValueError("Indica 'paths' o 'coordinates', pero no ambos")
+        return self
+
 # Esquemas para cálculos
 class GeometricCalculationRequest(BaseModel):
-    shape_type: str = Field(..., description="Tipo de forma: cube, sphere, cylinder, square, circle")
-    dimensions: Union[CubeDimensions, SphereDimensions, CylinderDimensions, SquareDimensions, CircleDimensions]
+    shape_type: str = Field(..., description="Tipo de forma: cube, sphere, cylinder, square, circle, polygon, polyline")
+    dimensions: Union[CubeDimensions, SphereDimensions, CylinderDimensions, SquareDimensions, CircleDimensions,
+                      PolygonDimensions, PolylineDimensions]
     calculation_type: str = Field(..., description="Tipo de cálculo: area, volume, both")
 
 class GeometricCalculationResponse(BaseModel):
@@ -38,9 +85,296 @@ class GeometricCalculationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CalculationBatchResponse(BaseModel):
+    calculations: List[GeometricCalculationResponse]
+    missing_ids: List[int] = Field(default_factory=list, description="IDs solicitados que no existen")
+
 class CalculationResult(BaseModel):
     shape_type: str
     dimensions: Dict[str, Any]
     area: Optional[float] = None
     volume: Optional[float] = None
-    calculation_type: str 
\ No newline at end of file
+    perimeter: Optional[float] = None
+    centroid: Optional[List[float]] = None
+    calculation_type: str 
+
+class PolygonBatchRequest(BaseModel):
+    geometries: List[PolygonDimensions] = Field(..., min_length=1, description="Polígonos a calcular")
+    calculation_type: str = Field("area", description="Tipo de cálculo: area, both")
+    save: bool = Field(False, description="Guardar cada resultado en la base de datos")
+
+class PolygonBatchResponse(BaseModel):
+    ids: Optional[List[int]] = Field(None, description="IDs de los cálculos guardados, en el mismo orden")
+    results: List[CalculationResult]
+
+# Esquemas de borrado masivo
+class DimensionPredicate(BaseModel):
+    key: str = Field(..., min_length=1, max_length=50, description="Nombre de la dimensión, p. ej. radius")
+    op: str = Field("eq", pattern="^(eq|ne|lt|lte|gt|gte)$", description="eq, ne, lt, lte, gt, gte")
+    value: Union[float, str] = Field(..., description="Número, o texto solo con eq/ne")
+
+    @model_validator(mode="after")
+    def check_value(self):
+        if isinstance(self.value, str) and self.op not in ("eq", "ne"):
+            raise ValueError("Los valores de texto solo admiten eq y ne")
+        return self
+
+class BulkDeleteRequest(BaseModel):
+    """IDs concretos o un filtro; sin ningún criterio se rechaza para no borrar todo por error"""
+    ids: Optional[List[int]] = Field(None, min_length=1, description="IDs a eliminar")
+    shape_type: Optional[str] = Field(None, description="Filtrar por tipo de forma")
+    created_after: Optional[datetime] = Field(None, description="Creados en o después de esta fecha")
+    created_before: Optional[datetime] = Field(None, description="Creados antes de esta fecha")
+    dimensions: List[DimensionPredicate] = Field(default_factory=list, description="Condiciones sobre las dimensiones")
+    background: bool = Field(False, description="Ejecutar en segundo plano y consultar el progreso después")
+
+    @model_validator(mode="after")
+    def check_criteria(self):
+        has_filter = any([self.shape_type, self.created_after, self.created_before, self.dimensions])
+        if self.ids is None and not has_filter:
+            raise ValueError("Indica 'ids' o al menos un filtro")
+        if self.ids is not None and has_filter:
+            raise ValueError("Indica 'ids' o un filtro, pero no ambos")
+        return self
+
+class BulkDeleteJobResponse(BaseModel):
+    id: int
+    status: str
+    criteria: str
+    deleted_count: int
+    chunk_count: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Esquemas de barridos de parámetros
+class SweepAxis(BaseModel):
+    """Valores de una dimensión: lista explícita o rango equiespaciado"""
+    values: Optional[List[float]] = Field(None, min_length=1, description="Valores explícitos")
+    start: Optional[float] = Field(None, description="Primer valor del rango")
+    stop: Optional[float] = Field(None, description="Último valor del rango (incluido)")
+    num: Optional[int] = Field(None, ge=1, description="Número de valores del rango")
+
+    @model_validator(mode="after")
+    def check_representation(self):
+        has_range = None not in (self.start, self.stop, self.num)
+        if (self.values is None) == (not has_range):
+            raise ValueError("Indica 'values' o bien 'start', 'stop' y 'num'")
+        return self
+
+class SweepReduction(BaseModel):
+    op: str = Field(..., pattern="^(min|max|closest)$",
+                    description="min, max o closest (punto más cercano a 'target')")
+    metric: str = Field(..., pattern="^(area|volume)$", description="Métrica a reducir: area, volume")
+    target: Optional[float] = Field(None, description="Valor objetivo para 'closest'")
+
+class SweepRequest(BaseModel):
+    shape_type: str = Field(..., description="Tipo de forma: cube, sphere, cylinder, square, circle")
+    dimensions: Dict[str, SweepAxis] = Field(..., description="Valores de cada dimensión de la forma")
+    calculation_type: str = Field("both", description="Tipo de cálculo: area, volume, both")
+    reductions: Optional[List[SweepReduction]] = Field(
+        None, min_length=1, description="Si se indica, solo se devuelven las reducciones y no la rejilla"
+    )
+
+class SweepReductionResult(BaseModel):
+    op: str
+    metric: str
+    target: Optional[float] = None
+    index: int = Field(..., description="Índice lineal del punto en la rejilla (orden C)")
+    value: Optional[float] = Field(..., description="Valor de la métrica; null si desborda")
+    dimensions: Dict[str, float]
+    area: Optional[float] = Field(..., description="null si desborda")
+    volume: Optional[float] = None
+
+class SweepResponse(BaseModel):
+    shape_type: str
+    points: int
+    reductions: List[SweepReductionResult]
+
+# Esquemas de ensamblajes
+class AssemblyPart(BaseModel):
+    """Primitiva (con ``shape_type``) o grupo de piezas (con ``children``)"""
+    name: Optional[str] = Field(None, max_length=200)
+    operation: str = Field("union", pattern="^(union|subtract)$",
+                           description="Cómo se combina con su grupo: union, subtract")
+    shape_type: Optional[str] = Field(None, description="Tipo de forma de la primitiva; vacío en los grupos")
+    dimensions: Optional[Dict[str, Any]] = None
+    children: List["AssemblyPart"] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def check_kind(self):
+        if self.shape_type is not None and self.children:
+            raise ValueError("Una primitiva no puede tener piezas hijas")
+        if self.shape_type is not None and self.dimensions is None:
+            raise ValueError("Una primitiva necesita 'dimensions'")
+        return self
+
+class AssemblyCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=200)
+    parts: List[AssemblyPart] = Field(default_factory=list)
+
+class AssemblyNodeCreate(AssemblyPart):
+    parent_id: Optional[int] = Field(None, description="Grupo donde se añade; por defecto la raíz")
+
+class AssemblyNodeUpdate(BaseModel):
+    name: Optional[str] = Field(None, max_length=200)
+    operation: Optional[str] = Field(None, pattern="^(union|subtract)$")
+    dimensions: Optional[Dict[str, Any]] = None
+
+class AssemblyNodeResponse(BaseModel):
+    id: int
+    parent_id: Optional[int] = None
+    name: Optional[str] = None
+    operation: str
+    shape_type: Optional[str] = None
+    dimensions: Optional[str] = None
+    area: float
+    volume: float
+    total_area: float
+    total_volume: float
+
+    class Config:
+        from_attributes = True
+
+class AssemblyResponse(BaseModel):
+    id: int
+    name: str
+    area: float = Field(..., description="Cota superior del área: suma de las superficies de todas las primitivas")
+    volume: float = Field(..., description="Volumen de las uniones menos el de las sustracciones")
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    nodes: Optional[List[AssemblyNodeResponse]] = None
+
+# Esquemas de analítica
+class AnalyticsBucket(BaseModel):
+    bucket_start: datetime
+    shape_type: str
+    calculation_count: int
+    rate_per_second: float
+    total_area: float
+    mean_area: Optional[float] = None
+    total_volume: float
+    mean_volume: Optional[float] = None
+
+class AnalyticsResponse(BaseModel):
+    granularity: str
+    source: str = Field(..., description="rollup: agregados precalculados; live: consulta directa")
+    start: datetime
+    end: datetime
+    refreshed_at: Optional[datetime] = None
+    buckets: List[AnalyticsBucket]
+
+# Esquemas de distribuciones
+class QuantileSummary(BaseModel):
+    count: int
+    min: float
+    max: float
+    p50: float
+    p95: float
+    p99: float
+
+class ShapeDistribution(BaseModel):
+    shape_type: str
+    area: Optional[QuantileSummary] = None
+    volume: Optional[QuantileSummary] = None
+    distinct_dimensions: int
+
+class DistributionsResponse(BaseModel):
+    quantile_rank_error: float = Field(..., description="Error en rango de los cuantiles en la mediana (1/SKETCH_COMPRESSION)")
+    distinct_relative_error: float = Field(..., description="Error relativo típico del conteo de distintos")
+    shapes: List[ShapeDistribution]
+
+# Esquemas de perfilado
+class ProfilingStatus(BaseModel):
+    enabled: bool
+    sample_rate: float
+    header: str = Field(..., description="Cabecera que perfila una petición concreta")
+    token: str = Field(..., description="Valor de la cabecera")
+    sample_interval_ms: float
+    buffer_size: int
+    stored_profiles: int
+    active_profiles: int
+    pid: int = Field(..., description="Proceso (worker) al que se refiere el estado")
+    threadpool_sampling: bool = Field(
+        ..., description="Si se atribuyen al perfil las muestras de los hilos del threadpool"
+    )
+
+class ProfilingUpdate(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(None, ge=0, le=1, description="Fracción de peticiones a perfilar")
+
+class ProfileSummary(BaseModel):
+    id: str = Field(..., description="<pid del worker>-<número>")
+    method: str
+    path: str
+    trigger: str = Field(..., description="header: pedido con la cabecera; sample: muestreo aleatorio")
+    status_code: Optional[int] = None
+    started_at: datetime
+    duration_ms: Optional[float] = None
+    samples: int
+    sample_interval_ms: float
+    sql_count: int
+    sql_time_ms: float
+
+class ProfileStack(BaseModel):
+    stack: str = Field(..., description="Llamadas de la más externa a la más interna, separadas por ';'")
+    count: int
+
+class ProfileStatement(BaseModel):
+    statement: str
+    duration_ms: float
+    executemany: bool
+
+class ProfileDetail(ProfileSummary):
+    stacks: List[ProfileStack]
+    sql: List[ProfileStatement]
+
+class CompressionRouteRule(BaseModel):
+    enabled: bool = True
+    min_size: Optional[int] = Field(None, ge=0, description="Umbral en bytes; vacío = el global")
+    levels: Dict[str, int] = Field(default_factory=dict, description="Nivel por codificación; el resto usa el global")
+
+class CompressionStatus(BaseModel):
+    enabled: bool
+    available_encodings: List[str] = Field(..., description="Codificaciones con dependencias instaladas")
+    encodings: List[str] = Field(..., description="Codificaciones ofrecidas, en orden de preferencia")
+    min_size: int
+    levels: Dict[str, int]
+    routes: Dict[str, CompressionRouteRule] = Field(..., description="Ajustes por prefijo de ruta")
+    pid: int = Field(..., description="Proceso (worker) al que se refiere el estado")
+
+class CompressionUpdate(BaseModel):
+    enabled: Optional[bool] = None
+    min_size: Optional[int] = Field(None, ge=0)
+    levels: Optional[Dict[str, int]] = None
+    routes: Optional[Dict[str, CompressionRouteRule]] = Field(
+        None, description="Sustituye todas las reglas por ruta"
+    )
+
+class CompressionTotals(BaseModel):
+    responses: int
+    bytes_in: int
+    bytes_out: int
+    saved_bytes: int
+    ratio: Optional[float] = Field(None, description="Bytes comprimidos / bytes originales")
+    cpu_ms: float
+    cpu_ms_per_mb: Optional[float] = None
+
+class CompressionSizeBucket(CompressionTotals):
+    max_bytes: Optional[int] = Field(None, description="Tamaño original máximo del tramo; vacío = sin límite")
+
+class CompressionEncodingStats(CompressionTotals):
+    encoding: str
+    level: int
+    sizes: List[CompressionSizeBucket]
+
+class CompressionRouteStats(BaseModel):
+    route: str = Field(..., description="Método y plantilla de la ruta")
+    responses: int
+    skipped: Dict[str, int] = Field(..., description="Respuestas sin comprimir por motivo")
+    compressed: List[CompressionEncodingStats]
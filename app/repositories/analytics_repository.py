@@ -0,0 +1,191 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import func, select, literal, literal_column, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.geometric_shape import GeometricCalculation
+from app.models.analytics import CalculationRollup, RollupWatermark, CalculationSketch
+from app.services.sketches import ShapeSketches
+
+# Duración en segundos de cada intervalo soportado
+GRANULARITIES = {"minute": 60, "hour": 3600, "day": 86400}
+
+WATERMARK_NAME = "calculation_rollups"
+ADVISORY_LOCK_KEY = 7301  # evita que varios workers refresquen a la vez
+
+# Transacciones con ID menor han terminado: sus filas ya no pueden aparecer
+SNAPSHOT_XMIN = text("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+class AnalyticsRepository:
+    """Repositorio para los agregados temporales y los resúmenes de distribuciones"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def bucket_expression(granularity: str):
+        """date_trunc en UTC; el intervalo va como literal para que SELECT y
+        GROUP BY usen exactamente la misma expresión"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Intervalo no soportado: {granularity}")
+        return func.date_trunc(
+            literal_column(f"'{granularity}'"), GeometricCalculation.created_at, literal_column("'UTC'")
+        )
+
+    def _bucket_select(self, granularity: str, *filters):
+        bucket = self.bucket_expression(granularity)
+        return select(
+            bucket.label("bucket_start"),
+            GeometricCalculation.shape_type,
+            func.count().label("calculation_count"),
+            func.count(GeometricCalculation.area).label("area_count"),
+            func.coalesce(func.sum(GeometricCalculation.area), 0.0).label("area_sum"),
+            func.count(GeometricCalculation.volume).label("volume_count"),
+            func.coalesce(func.sum(GeometricCalculation.volume), 0.0).label("volume_sum"),
+        ).where(*filters).group_by(bucket, GeometricCalculation.shape_type)
+
+    def refresh_rollups(self, batch_size: int) -> int:
+        """Incorporar a los agregados los cálculos nuevos desde la última marca.
+
+        La marca es la posición ``(created_xid, id)`` del último cálculo
+        incorporado. Solo se avanza sobre filas de transacciones anteriores a
+        la más antigua aún en curso (``pg_snapshot_xmin``): una transacción
+        abierta puede tener IDs menores que otros ya confirmados, y avanzar por
+        ID o por fecha los perdería. Sus filas entran en un refresco posterior.
+
+        Procesa lotes de hasta ``batch_size`` cálculos, cada uno en su propia
+        transacción. Devuelve el número de cálculos añadidos, o 0 si otro
+        proceso está refrescando.
+        """
+        processed = 0
+        while True:
+            batch = self._refresh_batch(batch_size)
+            processed += max(batch, 0)
+            if batch < batch_size:
+                return processed
+
+    def _refresh_batch(self, batch_size: int) -> int:
+        acquired = self.db.execute(select(func.pg_try_advisory_xact_lock(ADVISORY_LOCK_KEY))).scalar()
+        if not acquired:
+            self.db.rollback()
+            return -1
+
+        watermark = self.db.get(RollupWatermark, WATERMARK_NAME, with_for_update=True)
+        if watermark is None:
+            watermark = RollupWatermark(name=WATERMARK_NAME, last_xid=0, last_calculation_id=0)
+            self.db.add(watermark)
+            self.db.flush()
+        horizon = self.db.execute(select(SNAPSHOT_XMIN)).scalar()
+        position = tuple_(GeometricCalculation.created_xid, GeometricCalculation.id)
+        lower = tuple_(watermark.last_xid, watermark.last_calculation_id)
+
+        window = select(GeometricCalculation.created_xid, GeometricCalculation.id).where(
+            position > lower,
+            GeometricCalculation.created_xid < horizon
+        ).order_by(GeometricCalculation.created_xid, GeometricCalculation.id).limit(batch_size).subquery()
+        last = self.db.execute(
+            select(window.c.created_xid, window.c.id).order_by(window.c.created_xid.desc(), window.c.id.desc()).limit(1)
+        ).first()
+        count = 0
+
+        if last is not None:
+            # Todas las filas del rango son de transacciones terminadas: el rango es exactamente el lote
+            in_batch = (position > lower, position <= tuple_(last.created_xid, last.id))
+            count = self.db.execute(select(func.count()).select_from(GeometricCalculation).where(*in_batch)).scalar()
+            for granularity in GRANULARITIES:
+                rows = self._bucket_select(granularity, *in_batch).subquery()
+                stmt = pg_insert(CalculationRollup).from_select(
+                    ["granularity", "bucket_start", "shape_type", "calculation_count",
+                     "area_count", "area_sum", "volume_count", "volume_sum"],
+                    select(literal(granularity), rows.c.bucket_start, rows.c.shape_type,
+                           rows.c.calculation_count, rows.c.area_count, rows.c.area_sum,
+                           rows.c.volume_count, rows.c.volume_sum)
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["granularity", "bucket_start", "shape_type"],
+                    set_={
+                        name: getattr(CalculationRollup, name) + getattr(stmt.excluded, name)
+                        for name in ("calculation_count", "area_count", "area_sum",
+                                     "volume_count", "volume_sum")
+                    }
+                )
+                self.db.execute(stmt)
+            watermark.last_xid, watermark.last_calculation_id = last.created_xid, last.id
+
+        watermark.refreshed_at = func.now()
+        self.db.commit()
+        return count
+
+    def get_rollups(self, granularity: str, start: datetime, end: datetime,
+                    shape_type: Optional[str] = None) -> List[CalculationRollup]:
+        """Obtener agregados precalculados en un rango [start, end)"""
+        query = self.db.query(CalculationRollup).filter(
+            CalculationRollup.granularity == granularity,
+            CalculationRollup.bucket_start >= start,
+            CalculationRollup.bucket_start < end
+        )
+        if shape_type is not None:
+            query = query.filter(CalculationRollup.shape_type == shape_type)
+        return query.order_by(CalculationRollup.bucket_start, CalculationRollup.shape_type).all()
+
+    def get_live_buckets(self, granularity: str, start: datetime, end: datetime,
+                         shape_type: Optional[str] = None) -> list:
+        """Agregar directamente sobre geometric_calculations (sin agregados)"""
+        filters = [GeometricCalculation.created_at >= start, GeometricCalculation.created_at < end]
+        if shape_type is not None:
+            filters.append(GeometricCalculation.shape_type == shape_type)
+        stmt = self._bucket_select(granularity, *filters).order_by("bucket_start", GeometricCalculation.shape_type)
+        return self.db.execute(stmt).all()
+
+    def get_watermark(self) -> Optional[RollupWatermark]:
+        """Obtener la marca del último refresco"""
+        return self.db.get(RollupWatermark, WATERMARK_NAME)
+
+    def get_sketch_payloads(self, shape_type: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+        """Obtener los resúmenes persistidos agrupados por forma y métrica"""
+        query = self.db.query(CalculationSketch)
+        if shape_type is not None:
+            query = query.filter(CalculationSketch.shape_type == shape_type)
+        payloads: Dict[str, Dict[str, str]] = {}
+        for row in query.all():
+            payloads.setdefault(row.shape_type, {})[row.metric] = row.payload
+        return payloads
+
+    def merge_sketches(self, pending: Dict[str, ShapeSketches], compression: float,
+                       precision: int, replace: bool = False) -> None:
+        """Combinar resúmenes con los persistidos (o sustituirlos) en una transacción"""
+        for shape_type, sketches in pending.items():
+            # Crear las filas si no existen para poder bloquearlas sin carreras
+            self.db.execute(
+                pg_insert(CalculationSketch).values([
+                    {"shape_type": shape_type, "metric": metric, "payload": "{}"}
+                    for metric in ShapeSketches.METRICS
+                ]).on_conflict_do_nothing()
+            )
+            rows = self.db.query(CalculationSketch).filter(
+                CalculationSketch.shape_type == shape_type
+            ).with_for_update().all()
+
+            if not replace:
+                stored = {row.metric: row.payload for row in rows if row.payload != "{}"}
+                merged = ShapeSketches.from_payloads(stored, compression, precision)
+                merged.merge(sketches)
+                sketches = merged
+            payloads = sketches.to_payloads()
+            for row in rows:
+                row.payload = payloads[row.metric]
+        self.db.commit()
+
+    def delete_sketches(self) -> None:
+        """Eliminar todos los resúmenes persistidos"""
+        self.db.query(CalculationSketch).delete()
+        self.db.flush()
+
+    def iter_calculation_values(self, chunk_size: int = 10000):
+        """Recorrer forma, dimensiones, área y volumen de todos los cálculos por bloques"""
+        return self.db.query(
+            GeometricCalculation.shape_type,
+            GeometricCalculation.dimensions,
+            GeometricCalculation.area,
+            GeometricCalculation.volume
+        ).execution_options(yield_per=chunk_size)
@@ -0,0 +1,111 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, delete, literal, select, update
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import func
+from app.models.assembly import Assembly, AssemblyNode
+
+class AssemblyRepository:
+    """Repositorio para ensamblajes y sus nodos"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_assembly(self, user_id: int, name: str) -> Tuple[Assembly, AssemblyNode]:
+        """Crear un ensamblaje con su grupo raíz (sin confirmar)"""
+        assembly = Assembly(user_id=user_id, name=name)
+        self.db.add(assembly)
+        self.db.flush()
+        root = AssemblyNode(assembly_id=assembly.id, operation="union")
+        self.db.add(root)
+        self.db.flush()
+        return assembly, root
+
+    def get_assembly(self, user_id: int, assembly_id: int, for_update: bool = False) -> Optional[Assembly]:
+        """Obtener un ensamblaje del usuario; con ``for_update`` se serializan las ediciones concurrentes"""
+        query = self.db.query(Assembly).filter(Assembly.id == assembly_id, Assembly.user_id == user_id)
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
+
+    def get_assemblies(self, user_id: int, skip: int = 0, limit: int = 100) -> List[Tuple[Assembly, AssemblyNode]]:
+        """Listar los ensamblajes del usuario con su nodo raíz"""
+        return self.db.query(Assembly, AssemblyNode).join(
+            AssemblyNode, (AssemblyNode.assembly_id == Assembly.id) & AssemblyNode.parent_id.is_(None)
+        ).filter(Assembly.user_id == user_id).order_by(Assembly.id).offset(skip).limit(limit).all()
+
+    def get_root(self, assembly_id: int) -> Optional[AssemblyNode]:
+        return self.db.query(AssemblyNode).filter(
+            AssemblyNode.assembly_id == assembly_id, AssemblyNode.parent_id.is_(None)
+        ).first()
+
+    def get_node(self, assembly_id: int, node_id: int) -> Optional[AssemblyNode]:
+        return self.db.query(AssemblyNode).filter(
+            AssemblyNode.assembly_id == assembly_id, AssemblyNode.id == node_id
+        ).first()
+
+    def get_nodes(self, assembly_id: int) -> List[AssemblyNode]:
+        """Todos los nodos de un ensamblaje ordenados por ID"""
+        return self.db.query(AssemblyNode).filter(
+            AssemblyNode.assembly_id == assembly_id
+        ).order_by(AssemblyNode.id).all()
+
+    def add_nodes(self, nodes: List[AssemblyNode]) -> None:
+        """Insertar nodos nuevos; los padres se resuelven por la relación ``parent``"""
+        self.db.add_all(nodes)
+        self.db.flush()
+
+    def get_ancestors(self, node_id: int) -> List[Tuple[int, str]]:
+        """ID y operación de un nodo y sus ancestros, desde él hasta la raíz"""
+        path = select(
+            AssemblyNode.id, AssemblyNode.parent_id, AssemblyNode.operation, literal(0).label("depth")
+        ).where(AssemblyNode.id == node_id).cte("ancestors", recursive=True)
+        parent = aliased(AssemblyNode)
+        path = path.union_all(
+            select(parent.id, parent.parent_id, parent.operation, path.c.depth + 1)
+            .where(parent.id == path.c.parent_id)
+        )
+        return [tuple(row) for row in self.db.execute(
+            select(path.c.id, path.c.operation).order_by(path.c.depth)
+        )]
+
+    def get_subtree_ids(self, node_id: int) -> List[int]:
+        """IDs de un nodo y todos sus descendientes"""
+        subtree = select(AssemblyNode.id).where(AssemblyNode.id == node_id).cte("subtree", recursive=True)
+        child = aliased(AssemblyNode)
+        subtree = subtree.union_all(select(child.id).where(child.parent_id == subtree.c.id))
+        return list(self.db.execute(select(subtree.c.id)).scalars())
+
+    def add_to_totals(self, deltas: Dict[int, Tuple[float, float]]) -> None:
+        """Sumar (área, volumen) a los totales de varios nodos en una sola sentencia.
+
+        La suma se hace en SQL para no depender de los valores leídos.
+        """
+        if not deltas:
+            return
+        self.db.execute(
+            update(AssemblyNode)
+            .where(AssemblyNode.id.in_(list(deltas)))
+            .values(
+                total_area=AssemblyNode.total_area + case(
+                    {node_id: area for node_id, (area, _) in deltas.items()}, value=AssemblyNode.id
+                ),
+                total_volume=AssemblyNode.total_volume + case(
+                    {node_id: volume for node_id, (_, volume) in deltas.items()}, value=AssemblyNode.id
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def delete_nodes(self, node_ids: List[int]) -> None:
+        self.db.execute(
+            delete(AssemblyNode).where(AssemblyNode.id.in_(node_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+    def delete_assembly(self, assembly: Assembly) -> None:
+        self.db.execute(delete(AssemblyNode).where(AssemblyNode.assembly_id == assembly.id))
+        self.db.delete(assembly)
+        self.db.commit()
+
+    def touch(self, assembly: Assembly) -> None:
+        assembly.updated_at = func.now()
@@ -1,20 +1,41 @@
 import json
+import operator
+from datetime import datetime
+from sqlalchemy import Float, case, delete, func, select
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional, Any, Sequence, Union
 from app.models.geometric_shape import GeometricCalculation
-from app.models.schemas import GeometricCalculationResponse
+from app.models.schemas import GeometricCalculationResponse, CalculationResult
 
 class CalculationRepository:
-    """Repositorio para manejar operaciones de base de datos de cálculos geométricos"""
+    """Repositorio para manejar operaciones de base de datos de cálculos geométricos.
+
+    Todas las consultas se limitan a los cálculos de un usuario (``user_id``),
+    apoyándose en los índices (user_id, created_at) y (user_id, shape_type).
+    """
+    
+    # Columnas expuestas en los listados, en el orden de la respuesta
+    LIST_COLUMNS = (
+        GeometricCalculation.id,
+        GeometricCalculation.shape_type,
+        GeometricCalculation.dimensions,
+        GeometricCalculation.area,
+        GeometricCalculation.volume,
+        GeometricCalculation.calculation_type,
+        GeometricCalculation.created_at,
+        GeometricCalculation.updated_at,
+    )
     
     def __init__(self, db: Session):
         self.db = db
     
-    def create_calculation(self, shape_type: str, dimensions: dict, 
+    def create_calculation(self, user_id: int, shape_type: str, dimensions: dict, 
                           area: Optional[float], volume: Optional[float], 
                           calculation_type: str) -> GeometricCalculation:
         """Crear un nuevo cálculo en la base de datos"""
         db_calculation = GeometricCalculation(
+            user_id=user_id,
             shape_type=shape_type,
             dimensions=json.dumps(dimensions),
             area=area,
@@ -26,32 +47,142 @@ class CalculationRepository:
         self.db.refresh(db_calculation)
         return db_calculation
     
+    def create_calculations_bulk(self, user_id: int, results: List[CalculationResult]) -> List[int]:
+        """Guardar varios cálculos en una sola transacción y devolver sus IDs"""
+        db_calculations = [
+            GeometricCalculation(
+                user_id=user_id,
+                shape_type=result.shape_type,
+                dimensions=json.dumps(result.dimensions),
+                area=result.area,
+                volume=result.volume,
+                calculation_type=result.calculation_type
+            )
+            for result in results
+        ]
+        self.db.add_all(db_calculations)
+        self.db.flush()
+        ids = [calculation.id for calculation in db_calculations]
+        self.db.commit()
+        return ids
+    
     def get_calculation_by_id(self, calculation_id: int) -> Optional[GeometricCalculation]:
-        """Obtener un cálculo por ID"""
+        """Obtener un cálculo por ID, sea de quien sea (el llamador comprueba el propietario)"""
         return self.db.query(GeometricCalculation).filter(
             GeometricCalculation.id == calculation_id
         ).first()
     
-    def get_all_calculations(self, skip: int = 0, limit: int = 100) -> List[GeometricCalculation]:
-        """Obtener todos los cálculos con paginación"""
-        return self.db.query(GeometricCalculation).offset(skip).limit(limit).all()
+    def get_calculations_by_ids(self, calculation_ids: List[int]) -> List[GeometricCalculation]:
+        """Obtener varios cálculos por ID en una sola consulta (sin filtrar por propietario)"""
+        if not calculation_ids:
+            return []
+        return self.db.query(GeometricCalculation).filter(
+            GeometricCalculation.id.in_(calculation_ids)
+        ).all()
+    
+    @staticmethod
+    def _user_listing(query, user_id: int, shape_type: Optional[str] = None):
+        # Orden estable por fecha, servido por los índices compuestos del usuario
+        query = query.filter(GeometricCalculation.user_id == user_id)
+        if shape_type is not None:
+            query = query.filter(GeometricCalculation.shape_type == shape_type)
+        return query.order_by(GeometricCalculation.created_at, GeometricCalculation.id)
+    
+    def get_all_calculations(self, user_id: int, skip: int = 0, limit: int = 100) -> List[GeometricCalculation]:
+        """Obtener los cálculos de un usuario con paginación"""
+        query = self._user_listing(self.db.query(GeometricCalculation), user_id)
+        return query.offset(skip).limit(limit).all()
     
-    def get_calculations_by_shape_type(self, shape_type: str, 
+    def get_calculations_by_shape_type(self, user_id: int, shape_type: str, 
                                      skip: int = 0, limit: int = 100) -> List[GeometricCalculation]:
-        """Obtener cálculos por tipo de forma"""
-        return self.db.query(GeometricCalculation).filter(
-            GeometricCalculation.shape_type == shape_type
-        ).offset(skip).limit(limit).all()
-    
-    def delete_calculation(self, calculation_id: int) -> bool:
-        """Eliminar un cálculo por ID"""
-        calculation = self.get_calculation_by_id(calculation_id)
-        if calculation:
-            self.db.delete(calculation)
-            self.db.commit()
-            return True
-        return False
-    
-    def get_calculations_count(self) -> int:
-        """Obtener el total de cálculos"""
-        return self.db.query(GeometricCalculation).count() 
\ No newline at end of file
+        """Obtener los cálculos de un usuario por tipo de forma"""
+        query = self._user_listing(self.db.query(GeometricCalculation), user_id, shape_type)
+        return query.offset(skip).limit(limit).all()
+    
+    def get_calculation_columns(self, user_id: int, skip: int = 0, limit: int = 100,
+                                shape_type: Optional[str] = None) -> Dict[str, List[Any]]:
+        """Obtener cálculos como columnas (sin crear objetos ORM por fila)"""
+        query = self._user_listing(self.db.query(*self.LIST_COLUMNS), user_id, shape_type)
+        rows = query.offset(skip).limit(limit).all()
+        names = [column.key for column in self.LIST_COLUMNS]
+        if not rows:
+            return {name: [] for name in names}
+        return {name: list(values) for name, values in zip(names, zip(*rows))}
+    
+    def delete_calculation(self, user_id: int, calculation_id: int) -> bool:
+        """Eliminar un cálculo del usuario con un único DELETE (sin cargarlo antes)"""
+        deleted = self.db.query(GeometricCalculation).filter(
+            GeometricCalculation.id == calculation_id,
+            GeometricCalculation.user_id == user_id
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted > 0
+    
+    # Operadores admitidos en los predicados sobre dimensiones
+    DIMENSION_OPERATORS = {
+        "eq": operator.eq, "ne": operator.ne,
+        "lt": operator.lt, "lte": operator.le,
+        "gt": operator.gt, "gte": operator.ge,
+    }
+    
+    @classmethod
+    def dimension_condition(cls, key: str, op: str, value: Union[float, str]):
+        """Condición sobre una dimensión del JSON guardado (PostgreSQL JSONB).
+
+        Las filas cuyo texto no es JSON válido no cumplen ninguna condición.
+        """
+        field = func.try_jsonb(GeometricCalculation.dimensions, type_=JSONB)[key]
+        compare = cls.DIMENSION_OPERATORS[op]
+        if isinstance(value, str):
+            return compare(field.astext, value)
+        # CASE garantiza que solo se convierten a número los valores numéricos
+        number = case((func.jsonb_typeof(field) == "number", field.astext.cast(Float)))
+        return compare(number, value)
+    
+    def calculation_filters(self, user_id: int, shape_type: Optional[str] = None,
+                            created_after: Optional[datetime] = None,
+                            created_before: Optional[datetime] = None,
+                            dimensions: Sequence = ()) -> list:
+        """Condiciones de filtrado para borrados masivos"""
+        filters = [GeometricCalculation.user_id == user_id]
+        if shape_type is not None:
+            filters.append(GeometricCalculation.shape_type == shape_type)
+        if created_after is not None:
+            filters.append(GeometricCalculation.created_at >= created_after)
+        if created_before is not None:
+            filters.append(GeometricCalculation.created_at < created_before)
+        for predicate in dimensions:
+            filters.append(self.dimension_condition(predicate.key, predicate.op, predicate.value))
+        return filters
+    
+    def delete_calculations_chunk(self, filters: list, after_id: int, limit: int) -> List[int]:
+        """Eliminar hasta ``limit`` cálculos que cumplan el filtro con ID mayor que ``after_id``.
+
+        Un único DELETE ... WHERE id IN (SELECT ... LIMIT) RETURNING id. Avanzar
+        por ID evita volver a recorrer las filas ya borradas. No confirma la
+        transacción: el llamador la confirma junto con el progreso.
+        """
+        candidates = select(GeometricCalculation.id).where(
+            GeometricCalculation.id > after_id, *filters
+        ).order_by(GeometricCalculation.id).limit(limit).scalar_subquery()
+        stmt = delete(GeometricCalculation).where(
+            GeometricCalculation.id.in_(candidates)
+        ).returning(GeometricCalculation.id)
+        return list(self.db.execute(stmt, execution_options={"synchronize_session": False}).scalars())
+    
+    def delete_calculations_by_ids(self, user_id: int, calculation_ids: List[int]) -> List[int]:
+        """Eliminar varios cálculos del usuario por ID en un único DELETE (sin confirmar)"""
+        stmt = delete(GeometricCalculation).where(
+            GeometricCalculation.id.in_(calculation_ids),
+            GeometricCalculation.user_id == user_id
+        ).returning(GeometricCalculation.id)
+        return list(self.db.execute(stmt, execution_options={"synchronize_session": False}).scalars())
+    
+    def get_counts_by_shape(self, user_id: int) -> Dict[str, int]:
+        """Número de cálculos del usuario por forma, con un único GROUP BY sobre su índice"""
+        rows = self.db.query(
+            GeometricCalculation.shape_type, func.count()
+        ).filter(
+            GeometricCalculation.user_id == user_id
+        ).group_by(GeometricCalculation.shape_type).all()
+        return {shape_type: count for shape_type, count in rows} 
\ No newline at end of file
@@ -0,0 +1,26 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.models.jobs import BulkDeleteJob
+
+class JobRepository:
+    """Repositorio para las operaciones en segundo plano"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_bulk_delete_job(self, user_id: int, criteria: str) -> BulkDeleteJob:
+        """Registrar un borrado masivo pendiente"""
+        job = BulkDeleteJob(user_id=user_id, criteria=criteria, status="pending")
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def get_bulk_delete_job(self, user_id: int, job_id: int, for_update: bool = False) -> Optional[BulkDeleteJob]:
+        """Obtener un borrado masivo del usuario por ID (bloqueado hasta confirmar con ``for_update``)"""
+        query = self.db.query(BulkDeleteJob).filter(
+            BulkDeleteJob.id == job_id, BulkDeleteJob.user_id == user_id
+        )
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
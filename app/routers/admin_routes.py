@@ -0,0 +1,142 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional
+from app.core.deps import get_current_superuser
+from app.core.compression import CompressionRule, compressor
+from app.core.profiling import fold_stacks, profiler
+from app.models.schemas import (
+    CompressionRouteStats, CompressionStatus, CompressionUpdate, ProfileDetail, ProfileSummary,
+    ProfilingStatus, ProfilingUpdate
+)
+from app.models.user import User
+
+router = APIRouter(prefix="/admin", tags=["Administración"])
+
+@router.get("/profiling", response_model=ProfilingStatus,
+            summary="Estado del perfilado",
+            description="Configuración del perfilado de este worker, con el token de la cabecera "
+                        "`X-Profile-Token` (solo superusuarios)")
+async def get_profiling_status(current_user: User = Depends(get_current_superuser)):
+    """Obtener el estado del perfilado"""
+    return profiler.status()
+
+@router.put("/profiling", response_model=ProfilingStatus,
+            summary="Configurar el perfilado",
+            description="Activa o desactiva el perfilado y cambia la fracción de peticiones perfiladas "
+                        "en este worker (solo superusuarios)")
+async def update_profiling(
+    request: ProfilingUpdate,
+    current_user: User = Depends(get_current_superuser)
+):
+    """Configurar el perfilado"""
+    if request.enabled is not None:
+        profiler.enabled = request.enabled
+    if request.sample_rate is not None:
+        profiler.sample_rate = request.sample_rate
+    return profiler.status()
+
+@router.get("/profiles", response_model=List[ProfileSummary],
+            summary="Perfiles guardados",
+            description="Resumen de los últimos perfiles de petición, del más antiguo al más reciente")
+async def get_profiles(
+    path: Optional[str] = Query(None, description="Filtrar por ruta exacta"),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Listar los perfiles guardados"""
+    return [profile.summary() for profile in profiler.get_profiles(path)]
+
+@router.get("/profiles/folded", response_class=PlainTextResponse,
+            summary="Pilas plegadas combinadas",
+            description="Combina las pilas de todos los perfiles guardados (o los de una ruta) en formato "
+                        "plegado para flamegraph.pl o speedscope")
+async def get_folded_profiles(
+    path: Optional[str] = Query(None, description="Filtrar por ruta exacta"),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Obtener las pilas plegadas de varios perfiles"""
+    return fold_stacks(profiler.get_profiles(path))
+
+def _profile_not_found(profile_id: str) -> str:
+    pid = profile_id.partition("-")[0]
+    if pid.isdigit() and int(pid) != os.getpid():
+        return f"El perfil es del worker {pid} y esta petición la atendió el {os.getpid()}; reinténtala"
+    return "Perfil no encontrado"
+
+@router.get("/profiles/{profile_id}", response_model=ProfileDetail,
+            summary="Detalle de un perfil",
+            description="Pilas muestreadas y sentencias SQL de una petición perfilada")
+async def get_profile(
+    profile_id: str,
+    current_user: User = Depends(get_current_superuser)
+):
+    """Obtener un perfil"""
+    profile = profiler.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=_profile_not_found(profile_id))
+    return profile.detail()
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse,
+            summary="Pilas plegadas de un perfil",
+            description="Pilas de una petición en formato plegado para flamegraph.pl o speedscope")
+async def get_profile_folded(
+    profile_id: str,
+    current_user: User = Depends(get_current_superuser)
+):
+    """Obtener las pilas plegadas de un perfil"""
+    profile = profiler.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=_profile_not_found(profile_id))
+    return fold_stacks([profile])
+
+@router.delete("/profiles",
+               summary="Vaciar perfiles",
+               description="Elimina los perfiles guardados en este worker")
+async def clear_profiles(current_user: User = Depends(get_current_superuser)):
+    """Vaciar el búfer de perfiles"""
+    profiler.clear()
+    return {"message": "Perfiles eliminados"}
+
+@router.get("/compression", response_model=CompressionStatus,
+            summary="Configuración de la compresión",
+            description="Codificaciones, umbral y niveles de compresión de este worker (solo superusuarios)")
+async def get_compression_status(current_user: User = Depends(get_current_superuser)):
+    """Obtener la configuración de la compresión"""
+    return compressor.status()
+
+@router.put("/compression", response_model=CompressionStatus,
+            summary="Configurar la compresión",
+            description="Cambia en este worker el umbral, los niveles o las reglas por prefijo de ruta; "
+                        "`routes` sustituye todas las reglas")
+async def update_compression(
+    request: CompressionUpdate,
+    current_user: User = Depends(get_current_superuser)
+):
+    """Configurar la compresión"""
+    routes = None
+    if request.routes is not None:
+        routes = {prefix: CompressionRule(**rule.dict()) for prefix, rule in request.routes.items()}
+    try:
+        compressor.configure(request.enabled, request.min_size, request.levels, routes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return compressor.status()
+
+@router.get("/compression/stats", response_model=List[CompressionRouteStats],
+            summary="Estadísticas de compresión",
+            description="Por ruta: bytes antes y después, CPU por codificación y nivel, por tramos de tamaño, "
+                        "y respuestas sin comprimir por motivo")
+async def get_compression_stats(
+    route: Optional[str] = Query(None, description="Filtrar por método y ruta, p. ej. `GET /api/v1/geometry/calculations`"),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Obtener las estadísticas de compresión"""
+    return compressor.get_stats(route)
+
+@router.delete("/compression/stats",
+               summary="Reiniciar estadísticas de compresión",
+               description="Pone a cero las estadísticas de compresión de este worker")
+async def reset_compression_stats(current_user: User = Depends(get_current_superuser)):
+    """Reiniciar las estadísticas de compresión"""
+    compressor.reset_stats()
+    return {"message": "Estadísticas de compresión reiniciadas"}
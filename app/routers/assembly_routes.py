@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+from app.db.database import get_db
+from app.controllers.assembly_controller import AssemblyController
+from app.models.schemas import (
+    AssemblyCreate, AssemblyNodeCreate, AssemblyNodeUpdate, AssemblyNodeResponse, AssemblyResponse
+)
+from app.core.rate_limit import RateLimiter
+from app.models.user import User
+
+router = APIRouter(prefix="/assemblies", tags=["Ensamblajes"])
+
+@router.post("", response_model=AssemblyResponse,
+             summary="Crear ensamblaje",
+             description="Crea un ensamblaje a partir de un árbol de primitivas y grupos combinados por "
+                         "unión o sustracción y calcula sus totales")
+async def create_assembly(
+    request: AssemblyCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("calculate"))
+):
+    """Crear un ensamblaje"""
+    try:
+        return AssemblyController(db, current_user.id).create_assembly(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("", response_model=List[AssemblyResponse],
+            summary="Obtener ensamblajes",
+            description="Obtiene los ensamblajes con su área y volumen totales")
+async def get_assemblies(
+    skip: int = Query(0, ge=0, description="Número de registros a saltar"),
+    limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a retornar"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("read"))
+):
+    """Listar ensamblajes"""
+    return AssemblyController(db, current_user.id).get_assemblies(skip=skip, limit=limit)
+
+@router.get("/{assembly_id}", response_model=AssemblyResponse,
+            summary="Obtener ensamblaje",
+            description="Obtiene los totales de un ensamblaje y, con `include_nodes=true`, todos sus nodos")
+async def get_assembly(
+    assembly_id: int,
+    include_nodes: bool = Query(False, description="Incluir el árbol de nodos"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("read"))
+):
+    """Obtener un ensamblaje por ID"""
+    assembly = AssemblyController(db, current_user.id).get_assembly(assembly_id, include_nodes=include_nodes)
+    if not assembly:
+        raise HTTPException(status_code=404, detail="Ensamblaje no encontrado")
+    return assembly
+
+@router.delete("/{assembly_id}",
+               summary="Eliminar ensamblaje",
+               description="Elimina un ensamblaje con todos sus nodos")
+async def delete_assembly(
+    assembly_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("default"))
+):
+    """Eliminar un ensamblaje"""
+    if not AssemblyController(db, current_user.id).delete_assembly(assembly_id):
+        raise HTTPException(status_code=404, detail="Ensamblaje no encontrado")
+    return {"message": "Ensamblaje eliminado exitosamente"}
+
+@router.post("/{assembly_id}/nodes", response_model=AssemblyNodeResponse,
+             summary="Añadir pieza",
+             description="Añade una primitiva o un grupo a un grupo del ensamblaje (por defecto la raíz)")
+async def add_assembly_node(
+    assembly_id: int,
+    request: AssemblyNodeCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("calculate"))
+):
+    """Añadir una pieza a un ensamblaje"""
+    try:
+        node = AssemblyController(db, current_user.id).add_node(assembly_id, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not node:
+        raise HTTPException(status_code=404, detail="Ensamblaje o grupo no encontrado")
+    return node
+
+@router.patch("/{assembly_id}/nodes/{node_id}", response_model=AssemblyNodeResponse,
+              summary="Modificar pieza",
+              description="Cambia las dimensiones, la operación o el nombre de una pieza; solo se "
+                          "recalcula el camino hasta la raíz")
+async def update_assembly_node(
+    assembly_id: int,
+    node_id: int,
+    request: AssemblyNodeUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("calculate"))
+):
+    """Modificar una pieza de un ensamblaje"""
+    try:
+        node = AssemblyController(db, current_user.id).update_node(assembly_id, node_id, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not node:
+        raise HTTPException(status_code=404, detail="Pieza no encontrada")
+    return node
+
+@router.delete("/{assembly_id}/nodes/{node_id}",
+               summary="Eliminar pieza",
+               description="Elimina una pieza con todo su subárbol")
+async def delete_assembly_node(
+    assembly_id: int,
+    node_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("default"))
+):
+    """Eliminar una pieza de un ensamblaje"""
+    try:
+        deleted = AssemblyController(db, current_user.id).delete_node(assembly_id, node_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Pieza no encontrada")
+    return {"message": "Pieza eliminada exitosamente"}
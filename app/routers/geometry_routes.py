@@ -1,12 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, WebSocket, status
+)
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
 from typing import List, Optional
+from datetime import datetime
 from app.db.database import get_db
 from app.controllers.geometry_controller import GeometryController
+from app.controllers.stream_controller import StreamController
+from app.controllers.sweep_controller import SweepController
+from app.controllers.bulk_delete_controller import BulkDeleteController, run_bulk_delete_job
+from app.controllers.analytics_controller import AnalyticsController, DistributionController
+from app.services.mesh_service import detect_format
 from app.models.schemas import (
-    GeometricCalculationRequest, GeometricCalculationResponse, CalculationResult
+    GeometricCalculationRequest, GeometricCalculationResponse, CalculationResult,
+    CalculationBatchResponse, BulkDeleteRequest, BulkDeleteJobResponse, PolygonBatchRequest, PolygonBatchResponse, SweepRequest, SweepResponse,
+    AnalyticsResponse, DistributionsResponse
+)
+from app.core.deps import get_websocket_user, get_current_superuser
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter
+from app.core.uploads import parse_upload, remove_uploads
+from app.core.negotiation import (
+    JSON, ARROW, NDJSON, negotiate_media_type, columns_response, record_response, vary_on_accept
 )
-from app.core.deps import get_current_active_user
 from app.models.user import User
 
 router = APIRouter(prefix="/geometry", tags=["Geometría"])
@@ -16,13 +36,19 @@ router = APIRouter(prefix="/geometry", tags=["Geometría"])
              description="Calcula el área y/o volumen de una forma geométrica y lo guarda en la base de datos")
 async def calculate_and_save_geometry(
     request: GeometricCalculationRequest,
+    http_request: Request,
+    http_response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(RateLimiter("calculate"))
 ):
     """Calcular y guardar un cálculo geométrico"""
     try:
-        controller = GeometryController(db)
+        controller = GeometryController(db, current_user.id)
         result = controller.calculate_and_save(request)
+        media_type = negotiate_media_type(http_request)
+        if media_type != JSON:
+            return record_response(result.dict(), media_type)
+        vary_on_accept(http_response)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -34,42 +60,187 @@ async def calculate_and_save_geometry(
              description="Calcula el área y/o volumen de una forma geométrica sin guardarlo en la base de datos")
 async def calculate_only_geometry(
     request: GeometricCalculationRequest,
+    http_request: Request,
+    http_response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(RateLimiter("compute"))
 ):
     """Calcular sin guardar en la base de datos"""
     try:
-        controller = GeometryController(db)
+        controller = GeometryController(db, current_user.id)
         result = controller.calculate_only(request)
+        media_type = negotiate_media_type(http_request)
+        if media_type != JSON:
+            return record_response(result.dict(), media_type)
+        vary_on_accept(http_response)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
+@router.post("/polygons", response_model=PolygonBatchResponse,
+             summary="Calcular lote de polígonos",
+             description="Calcula área, perímetro y centroide de muchos polígonos en una sola pasada vectorial. "
+                         "Admite `Accept: application/msgpack` y `application/vnd.apache.arrow.stream`")
+async def calculate_polygons(
+    request: PolygonBatchRequest,
+    http_request: Request,
+    http_response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("compute"))
+):
+    """Calcular un lote de polígonos"""
+    try:
+        controller = GeometryController(db, current_user.id)
+        result = await run_in_threadpool(controller.calculate_polygons, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type = negotiate_media_type(http_request)
+    if media_type != JSON:
+        return columns_response(controller.polygon_batch_columns(result), media_type)
+    vary_on_accept(http_response)
+    return result
+
+@router.post("/sweep", response_model=SweepResponse,
+             summary="Barrido de parámetros",
+             description="Evalúa una forma sobre la rejilla cartesiana de los valores de cada dimensión. "
+                         "Sin `reductions` devuelve la rejilla en streaming (NDJSON, o Arrow con "
+                         "`Accept: application/vnd.apache.arrow.stream`); con ellas solo el resultado de "
+                         "cada reducción")
+async def sweep_geometry(
+    request: SweepRequest,
+    http_request: Request,
+    http_response: Response,
+    current_user: User = Depends(RateLimiter("compute"))
+):
+    """Evaluar una rejilla de dimensiones"""
+    try:
+        controller = SweepController(request)
+        if request.reductions:
+            result = await run_in_threadpool(controller.reduce)
+            vary_on_accept(http_response)
+            return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if negotiate_media_type(http_request, allowed=[ARROW]) == ARROW:
+        return vary_on_accept(StreamingResponse(controller.iter_arrow(), media_type=ARROW))
+    return vary_on_accept(StreamingResponse(controller.iter_ndjson(), media_type=NDJSON))
+
+def _calculate_mesh(db: Session, user_id: int, path: str, filename: Optional[str],
+                    calculation_type: str, save: bool):
+    controller = GeometryController(db, user_id)
+    file_format = detect_format(path, filename or "")
+    return controller.calculate_mesh(path, file_format, calculation_type, filename=filename, save=save)
+
+MESH_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "file": {"type": "string", "format": "binary", "description": "Fichero STL binario u OBJ"},
+                "calculation_type": {"type": "string", "default": "both",
+                                     "description": "Tipo de cálculo: area, volume, both"},
+                "save": {"type": "boolean", "default": True, "description": "Guardar el resultado"},
+            },
+        }}},
+    }
+}
+
+@router.post("/mesh",
+             summary="Calcular malla de triángulos",
+             description="Calcula el área superficial y el volumen de una malla subida como STL binario u OBJ "
+                         "y, si `save` es verdadero, lo guarda en la base de datos",
+             openapi_extra=MESH_FORM_SCHEMA)
+async def calculate_mesh(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("calculate"))
+):
+    """Calcular área y volumen de una malla.
+
+    El formulario se lee a mano (``parse_upload``) para rechazar las subidas
+    demasiado grandes antes de recibirlas y escribir el fichero una sola vez.
+    """
+    form = await parse_upload(request, settings.MESH_MAX_UPLOAD_MB * 1024 * 1024)
+    try:
+        upload = form.get("file")
+        if not isinstance(upload, UploadFile):
+            raise HTTPException(status_code=400, detail="Falta el fichero de malla (campo file)")
+        calculation_type = form.get("calculation_type", "both")
+        save = TypeAdapter(bool).validate_python(form.get("save", "true"))
+        return await run_in_threadpool(
+            _calculate_mesh, db, current_user.id, upload.file.name, upload.filename, calculation_type, save
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        remove_uploads(form)
+
+@router.websocket("/stream")
+async def stream_calculations(websocket: WebSocket):
+    """Canal WebSocket para flujos continuos de cálculos.
+
+    Se autentica una sola vez al conectar con ``?token=<jwt>`` o la cabecera
+    ``Authorization``. Ver ``StreamController`` para el formato de mensajes.
+    """
+    user = await run_in_threadpool(get_websocket_user, websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    await StreamController(websocket, user).run()
+
 @router.get("/calculations", response_model=List[GeometricCalculationResponse],
             summary="Obtener todos los cálculos",
-            description="Obtiene todos los cálculos guardados con paginación")
+            description="Obtiene los cálculos del usuario, por fecha de creación y con paginación. "
+                        "Admite `Accept: application/msgpack` y `application/vnd.apache.arrow.stream`")
 async def get_all_calculations(
+    http_request: Request,
+    http_response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a saltar"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a retornar"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(RateLimiter("read"))
 ):
     """Obtener todos los cálculos con paginación"""
-    controller = GeometryController(db)
+    controller = GeometryController(db, current_user.id)
+    media_type = negotiate_media_type(http_request)
+    if media_type != JSON:
+        return columns_response(controller.get_calculation_columns(skip=skip, limit=limit), media_type)
+    vary_on_accept(http_response)
     return controller.get_all_calculations(skip=skip, limit=limit)
 
+@router.get("/calculations/batch", response_model=CalculationBatchResponse,
+            summary="Obtener varios cálculos por ID",
+            description="Obtiene varios cálculos en una petición (`?ids=1&ids=2`); los que no están en "
+                        "caché se leen con una sola consulta")
+async def get_calculations_by_ids(
+    ids: List[int] = Query(..., description="IDs de los cálculos"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("read"))
+):
+    """Obtener varios cálculos por ID"""
+    if len(ids) > settings.CALCULATION_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Se admiten como máximo {settings.CALCULATION_BATCH_MAX_IDS} IDs"
+        )
+    controller = GeometryController(db, current_user.id)
+    return controller.get_calculations_by_ids(ids)
+
 @router.get("/calculations/{calculation_id}", response_model=GeometricCalculationResponse,
             summary="Obtener cálculo por ID",
             description="Obtiene un cálculo específico por su ID")
 async def get_calculation_by_id(
     calculation_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(RateLimiter("read"))
 ):
     """Obtener un cálculo por ID"""
-    controller = GeometryController(db)
+    controller = GeometryController(db, current_user.id)
     calculation = controller.get_calculation_by_id(calculation_id)
     if not calculation:
         raise HTTPException(status_code=404, detail="Cálculo no encontrado")
@@ -77,16 +248,24 @@ async def get_calculation_by_id(
 
 @router.get("/calculations/shape/{shape_type}", response_model=List[GeometricCalculationResponse],
             summary="Obtener cálculos por tipo de forma",
-            description="Obtiene todos los cálculos de un tipo específico de forma geométrica")
+            description="Obtiene los cálculos del usuario de un tipo específico de forma geométrica. "
+                        "Admite `Accept: application/msgpack` y `application/vnd.apache.arrow.stream`")
 async def get_calculations_by_shape_type(
     shape_type: str,
+    http_request: Request,
+    http_response: Response,
     skip: int = Query(0, ge=0, description="Número de registros a saltar"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a retornar"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(RateLimiter("read"))
 ):
     """Obtener cálculos por tipo de forma"""
-    controller = GeometryController(db)
+    controller = GeometryController(db, current_user.id)
+    media_type = negotiate_media_type(http_request)
+    if media_type != JSON:
+        columns = controller.get_calculation_columns(skip=skip, limit=limit, shape_type=shape_type)
+        return columns_response(columns, media_type)
+    vary_on_accept(http_response)
     return controller.get_calculations_by_shape_type(shape_type, skip=skip, limit=limit)
 
 @router.delete("/calculations/{calculation_id}",
@@ -95,26 +274,159 @@ async def get_calculations_by_shape_type(
 async def delete_calculation(
     calculation_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(RateLimiter("default"))
 ):
     """Eliminar un cálculo por ID"""
-    controller = GeometryController(db)
+    controller = GeometryController(db, current_user.id)
     success = controller.delete_calculation(calculation_id)
     if not success:
         raise HTTPException(status_code=404, detail="Cálculo no encontrado")
     return {"message": "Cálculo eliminado exitosamente"}
 
+@router.post("/calculations/bulk-delete", response_model=BulkDeleteJobResponse,
+             summary="Eliminar cálculos en bloque",
+             description="Elimina una lista de IDs o todos los cálculos que cumplan un filtro (tipo de forma, "
+                         "rango de fechas, condiciones sobre dimensiones) con DELETE por lotes. Con "
+                         "`background=true` responde 202 y el progreso se consulta en "
+                         "`/calculations/bulk-delete/{job_id}`")
+async def bulk_delete_calculations(
+    request: BulkDeleteRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("default"))
+):
+    """Eliminar cálculos en bloque"""
+    controller = BulkDeleteController(db, current_user.id)
+    try:
+        job = controller.create_job(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.background:
+        background_tasks.add_task(run_bulk_delete_job, current_user.id, job.id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return BulkDeleteJobResponse.from_orm(job)
+    return await run_in_threadpool(controller.run, job.id)
+
+@router.get("/calculations/bulk-delete/{job_id}", response_model=BulkDeleteJobResponse,
+            summary="Progreso de un borrado en bloque",
+            description="Estado, número de cálculos eliminados y lotes procesados de un borrado en bloque")
+async def get_bulk_delete_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("read"))
+):
+    """Obtener el progreso de un borrado en bloque"""
+    controller = BulkDeleteController(db, current_user.id)
+    job = controller.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Borrado no encontrado")
+    return job
+
+@router.post("/calculations/bulk-delete/{job_id}/resume", response_model=BulkDeleteJobResponse,
+             summary="Reanudar un borrado en bloque",
+             description="Continúa tras el último lote confirmado un borrado fallido o que lleva "
+                         "`BULK_DELETE_STALE_AFTER` segundos sin avanzar (p. ej. porque se detuvo el worker). "
+                         "Con `background=true` responde 202")
+async def resume_bulk_delete_job(
+    job_id: int,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    background: bool = Query(False, description="Ejecutar en segundo plano"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(RateLimiter("default"))
+):
+    """Reanudar un borrado en bloque"""
+    controller = BulkDeleteController(db, current_user.id)
+    try:
+        job = await run_in_threadpool(controller.resume_job, job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Borrado no encontrado")
+    if background:
+        background_tasks.add_task(run_bulk_delete_job, current_user.id, job.id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return BulkDeleteJobResponse.from_orm(job)
+    return await run_in_threadpool(controller.run, job.id)
+
 @router.get("/statistics",
             summary="Obtener estadísticas",
-            description="Obtiene estadísticas de los cálculos guardados")
+            description="Obtiene estadísticas de los cálculos del usuario por forma")
 async def get_statistics(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(RateLimiter("read"))
 ):
     """Obtener estadísticas de los cálculos"""
-    controller = GeometryController(db)
+    controller = GeometryController(db, current_user.id)
     return controller.get_statistics()
 
+@router.get("/analytics", response_model=AnalyticsResponse,
+            summary="Analítica temporal",
+            description="Número, ritmo, total y media de área/volumen por forma y por minuto, hora o día. "
+                        "Usa agregados precalculados salvo que se pida `live=true`. Agrega los cálculos de "
+                        "todos los usuarios (solo superusuarios)")
+async def get_analytics(
+    granularity: str = Query("hour", pattern="^(minute|hour|day)$", description="Intervalo: minute, hour, day"),
+    start: Optional[datetime] = Query(None, description="Inicio del rango (incluido)"),
+    end: Optional[datetime] = Query(None, description="Fin del rango (excluido)"),
+    shape_type: Optional[str] = Query(None, description="Filtrar por tipo de forma"),
+    live: bool = Query(False, description="Agregar directamente sobre los cálculos guardados"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Obtener la serie temporal de cálculos"""
+    try:
+        controller = AnalyticsController(db)
+        return controller.get_time_series(granularity, start=start, end=end,
+                                          shape_type=shape_type, live=live)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/analytics/refresh",
+             summary="Refrescar agregados",
+             description="Incorpora inmediatamente los cálculos nuevos a los agregados (solo superusuarios)")
+async def refresh_analytics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Refrescar los agregados de analítica"""
+    controller = AnalyticsController(db)
+    try:
+        processed = await run_in_threadpool(controller.refresh_rollups)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"processed_calculations": processed}
+
+@router.get("/distributions", response_model=DistributionsResponse,
+            summary="Distribuciones de área y volumen",
+            description="Percentiles p50/p95/p99 de área y volumen y número de dimensiones distintas "
+                        "por forma, calculados con resúmenes t-digest e HyperLogLog sobre los cálculos de todos "
+                        "los usuarios (solo superusuarios)")
+async def get_distributions(
+    shape_type: Optional[str] = Query(None, description="Filtrar por tipo de forma"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Obtener distribuciones aproximadas"""
+    controller = DistributionController(db)
+    return controller.get_distributions(shape_type)
+
+@router.post("/distributions/rebuild",
+             summary="Reconstruir distribuciones",
+             description="Recalcula los resúmenes recorriendo todos los cálculos (solo superusuarios)")
+async def rebuild_distributions(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """Reconstruir los resúmenes de distribuciones"""
+    controller = DistributionController(db)
+    try:
+        processed = await run_in_threadpool(controller.rebuild)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"processed_calculations": processed}
+
 @router.get("/shapes",
             summary="Obtener formas soportadas",
             description="Obtiene la lista de formas geométricas soportadas por la API")
@@ -151,6 +463,24 @@ async def get_supported_shapes():
                 "description": "Círculo",
                 "dimensions": ["radius"],
                 "calculations": ["area"]
+            },
+            {
+                "name": "polygon",
+                "description": "Polígono o multipolígono con huecos (listas anidadas o coordenadas empaquetadas)",
+                "dimensions": ["polygons | coordinates, ring_offsets, polygon_offsets"],
+                "calculations": ["area"]
+            },
+            {
+                "name": "polyline",
+                "description": "Polilínea abierta; devuelve longitud y centroide",
+                "dimensions": ["paths | coordinates, path_offsets"],
+                "calculations": ["area"]
+            },
+            {
+                "name": "mesh",
+                "description": "Malla de triángulos (STL binario u OBJ, vía POST /geometry/mesh)",
+                "dimensions": ["file"],
+                "calculations": ["area", "volume", "both"]
             }
         ]
     } 
\ No newline at end of file
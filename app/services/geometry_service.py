@@ -1,10 +1,14 @@
 import math
 import json
-from typing import Dict, Any, Optional
+import numpy as np
+from typing import Dict, Any, List, Optional
 from app.models.schemas import (
     CubeDimensions, SphereDimensions, CylinderDimensions, 
-    SquareDimensions, CircleDimensions, CalculationResult
+    SquareDimensions, CircleDimensions, PolygonDimensions, PolylineDimensions, CalculationResult
 )
+from app.core.config import settings
+from app.services.mesh_service import analyze_mesh
+from app.services import polygon_service
 
 class GeometryService:
     """Servicio para cálculos geométricos"""
@@ -110,6 +114,105 @@ class GeometryService:
             calculation_type=calculation_type
         )
     
+    @staticmethod
+    def _polygon_set(dimensions: PolygonDimensions) -> polygon_service.PolygonSet:
+        if dimensions.coordinates is not None:
+            coordinates = polygon_service.decode_coordinates(dimensions.coordinates)
+            return polygon_service.from_packed(coordinates, dimensions.ring_offsets, dimensions.polygon_offsets)
+        return polygon_service.from_nested(dimensions.polygons)
+    
+    @staticmethod
+    def _polygon_results(shape_type: str, polygon_set: polygon_service.PolygonSet,
+                         metrics: polygon_service.PolygonMetrics,
+                         calculation_type: str) -> List[CalculationResult]:
+        results = []
+        for index in range(polygon_set.geometry_count):
+            perimeter = float(metrics.perimeter[index])
+            centroid = metrics.centroid[index]
+            centroid = None if np.isnan(centroid).any() else [float(centroid[0]), float(centroid[1])]
+            # Sin columnas propias, perímetro y centroide se guardan con las dimensiones
+            dimensions = polygon_set.summary(index)
+            dimensions.update(perimeter=perimeter, centroid=centroid)
+            area = None
+            if calculation_type in ["area", "both"]:
+                area = float(metrics.area[index])
+            results.append(CalculationResult(
+                shape_type=shape_type,
+                dimensions=dimensions,
+                area=area,
+                volume=None,  # Las figuras planas no tienen volumen
+                perimeter=perimeter,
+                centroid=centroid,
+                calculation_type=calculation_type
+            ))
+        return results
+    
+    @staticmethod
+    def calculate_polygon(dimensions: PolygonDimensions, calculation_type: str) -> CalculationResult:
+        """Calcular área, perímetro y centroide de un polígono o multipolígono con huecos"""
+        polygon_set = GeometryService._polygon_set(dimensions)
+        metrics = polygon_service.polygon_metrics(polygon_set)
+        return GeometryService._polygon_results("polygon", polygon_set, metrics, calculation_type)[0]
+    
+    @staticmethod
+    def calculate_polygons(geometries: List[PolygonDimensions], calculation_type: str) -> List[CalculationResult]:
+        """Calcular un lote de polígonos con una sola pasada vectorial"""
+        polygon_set = polygon_service.concatenate([GeometryService._polygon_set(item) for item in geometries])
+        metrics = polygon_service.polygon_metrics(polygon_set)
+        return GeometryService._polygon_results("polygon", polygon_set, metrics, calculation_type)
+    
+    @staticmethod
+    def calculate_polyline(dimensions: PolylineDimensions, calculation_type: str) -> CalculationResult:
+        """Calcular longitud y centroide de una o varias polilíneas"""
+        if dimensions.coordinates is not None:
+            coordinates = polygon_service.decode_coordinates(dimensions.coordinates)
+            polygon_set = polygon_service.from_packed(coordinates, dimensions.path_offsets, min_ring_size=2)
+        else:
+            polygon_set = polygon_service.from_nested([dimensions.paths], min_ring_size=2)
+        metrics = polygon_service.polyline_metrics(polygon_set)
+        summary = polygon_set.summary(0)
+        length = float(metrics.perimeter[0])
+        centroid = metrics.centroid[0]
+        centroid = None if np.isnan(centroid).any() else [float(centroid[0]), float(centroid[1])]
+        
+        return CalculationResult(
+            shape_type="polyline",
+            dimensions={"paths": summary["rings"], "vertices": summary["vertices"],
+                        "length": length, "centroid": centroid},
+            area=None,  # Las polilíneas abiertas no encierran área
+            volume=None,
+            perimeter=length,
+            centroid=centroid,
+            calculation_type=calculation_type
+        )
+    
+    @staticmethod
+    def calculate_mesh(path: str, file_format: str, calculation_type: str,
+                       filename: Optional[str] = None) -> CalculationResult:
+        """Calcular área superficial y/o volumen de una malla de triángulos"""
+        metrics = analyze_mesh(
+            path, file_format,
+            chunk_size=settings.MESH_CHUNK_TRIANGLES,
+            workers=settings.MESH_WORKERS,
+            parallel_threshold=settings.MESH_PARALLEL_THRESHOLD
+        )
+        area = metrics.surface_area if calculation_type in ["area", "both"] else None
+        volume = metrics.volume if calculation_type in ["volume", "both"] else None
+        
+        dimensions = {"format": file_format, "triangles": metrics.triangles}
+        if metrics.vertices is not None:
+            dimensions["vertices"] = metrics.vertices
+        if filename:
+            dimensions["filename"] = filename
+        
+        return CalculationResult(
+            shape_type="mesh",
+            dimensions=dimensions,
+            area=area,
+            volume=volume,
+            calculation_type=calculation_type
+        )
+    
     @staticmethod
     def calculate_shape(shape_type: str, dimensions: Dict[str, Any], calculation_type: str) -> CalculationResult:
         """Método principal para calcular cualquier forma geométrica"""
@@ -134,5 +237,13 @@ class GeometryService:
             circle_dims = CircleDimensions(**dimensions)
             return GeometryService.calculate_circle(circle_dims, calculation_type)
             
+        elif shape_type == "polygon":
+            polygon_dims = PolygonDimensions(**dimensions)
+            return GeometryService.calculate_polygon(polygon_dims, calculation_type)
+            
+        elif shape_type == "polyline":
+            polyline_dims = PolylineDimensions(**dimensions)
+            return GeometryService.calculate_polyline(polyline_dims, calculation_type)
+            
         else:
             raise ValueError(f"Tipo de forma no soportado: {shape_type}") 
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""
+Área superficial y volumen de mallas de triángulos (STL binario y OBJ).
+
+Los STL binarios se mapean en memoria y se leen como un array estructurado
+sin copiar el fichero; los núcleos procesan bloques de triángulos en float64
+y liberan las páginas ya leídas para acotar la memoria residente. El volumen
+se obtiene con el teorema de la divergencia: la suma de los volúmenes con
+signo de los tetraedros formados por cada triángulo y un punto de referencia. Para mallas muy grandes los
+bloques se reparten entre un pool de procesos, cada uno con su propio mapeo
+del fichero. El pool se crea la primera vez y se reutiliza entre peticiones.
+"""
+
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+STL_HEADER_SIZE = 80
+STL_RECORD = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attribute", "<u2"),
+])  # 50 bytes por triángulo
+
+_OBJ_ELEMENT = re.compile(rb"^([vf])[ \t]+([^\r\n]*)", re.M)
+_OBJ_REFS = re.compile(rb"/\S*")
+_OBJ_BLOCK_LINES = 100000
+
+
+@dataclass
+class MeshMetrics:
+    triangles: int
+    surface_area: float
+    signed_volume: float
+    vertices: Optional[int] = None
+
+    @property
+    def volume(self) -> float:
+        return abs(self.signed_volume)
+
+
+def triangle_metrics(v0: np.ndarray, v1: np.ndarray, v2: np.ndarray) -> Tuple[float, float]:
+    """Suma de áreas y de volúmenes con signo de un bloque de triángulos (N, 3)"""
+    cross = np.cross(v1 - v0, v2 - v0)
+    area = 0.5 * np.sqrt(np.einsum("ij,ij->i", cross, cross)).sum()
+    volume = np.einsum("ij,ij->i", v0, np.cross(v1, v2)).sum() / 6.0
+    return float(area), float(volume)
+
+
+def detect_format(path: str, filename: str = "") -> str:
+    """Distinguir STL binario de OBJ por tamaño y extensión"""
+    size = os.path.getsize(path)
+    if size >= STL_HEADER_SIZE + 4:
+        with open(path, "rb") as handle:
+            handle.seek(STL_HEADER_SIZE)
+            count = int.from_bytes(handle.read(4), "little")
+        if size == STL_HEADER_SIZE + 4 + count * STL_RECORD.itemsize:
+            return "stl"
+    if filename.lower().endswith(".stl"):
+        raise ValueError("Solo se admiten ficheros STL binarios")
+    return "obj"
+
+
+def stl_triangle_count(path: str) -> int:
+    """Número de triángulos declarado en la cabecera de un STL binario"""
+    with open(path, "rb") as handle:
+        handle.seek(STL_HEADER_SIZE)
+        return int.from_bytes(handle.read(4), "little")
+
+
+def _release_pages(mapped: mmap.mmap, start: int, stop: int) -> None:
+    """Descartar de la memoria residente las páginas ya procesadas del mapeo"""
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    start -= start % mmap.PAGESIZE
+    stop -= stop % mmap.PAGESIZE
+    if stop > start:
+        mapped.madvise(mmap.MADV_DONTNEED, start, stop - start)
+
+
+def _stl_range_metrics(path: str, start: int, stop: int, origin: np.ndarray,
+                       chunk_size: int) -> Tuple[float, float]:
+    with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        offset = STL_HEADER_SIZE + 4
+        # Vista sin copia de los registros del fichero
+        records = np.frombuffer(mapped, dtype=STL_RECORD, count=stl_triangle_count(path), offset=offset)
+        area = volume = 0.0
+        try:
+            for begin in range(start, stop, chunk_size):
+                end = min(begin + chunk_size, stop)
+                # Solo el bloque actual se convierte a float64
+                triangles = records["vertices"][begin:end].astype(np.float64)
+                triangles -= origin
+                chunk_area, chunk_volume = triangle_metrics(triangles[:, 0], triangles[:, 1], triangles[:, 2])
+                area += chunk_area
+                volume += chunk_volume
+                _release_pages(mapped, offset + begin * STL_RECORD.itemsize, offset + end * STL_RECORD.itemsize)
+        finally:
+            # El mapeo no se puede cerrar mientras existan vistas sobre él
+            del records
+    return area, volume
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool compartido del proceso; se recrea si cambia el tamaño"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # forkserver evita heredar hilos y conexiones del worker web
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Olvidar un pool roto (p. ej. un proceso murió) para crear otro en la siguiente petición"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def shutdown_process_pool() -> None:
+    """Detener el pool compartido al cerrar la aplicación"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def analyze_stl(path: str, chunk_size: int = 262144, workers: int = 0,
+                parallel_threshold: int = 5000000) -> MeshMetrics:
+    """Área y volumen de un STL binario"""
+    count = stl_triangle_count(path)
+    if count == 0:
+        return MeshMetrics(triangles=0, surface_area=0.0, signed_volume=0.0)
+
+    # Referencia cercana a la malla para reducir la cancelación numérica del volumen
+    origin = np.fromfile(path, dtype="<f4", count=3, offset=STL_HEADER_SIZE + 4 + 12).astype(np.float64)
+
+    if workers > 1 and count >= parallel_threshold:
+        step = -(-count // workers)
+        ranges = [(start, min(start + step, count)) for start in range(0, count, step)]
+        pool = _process_pool(workers)
+        try:
+            results = list(pool.map(
+                _stl_range_metrics,
+                *zip(*[(path, start, stop, origin, chunk_size) for start, stop in ranges])
+            ))
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+    else:
+        results = [_stl_range_metrics(path, 0, count, origin, chunk_size)]
+
+    return MeshMetrics(
+        triangles=count,
+        surface_area=sum(area for area, _ in results),
+        signed_volume=sum(volume for _, volume in results)
+    )
+
+
+def _parse_obj_vertices(rows: List[bytes]) -> np.ndarray:
+    values = np.array(b" ".join(rows).split(), dtype=np.float64)
+    width = len(rows[0].split())
+    if width >= 3 and len(values) == width * len(rows):
+        return values.reshape(-1, width)[:, :3]
+    # Líneas con distinto número de componentes (p. ej. colores opcionales)
+    return np.array([row.split()[:3] for row in rows], dtype=np.float64)
+
+
+def _parse_obj_faces(rows: List[bytes], vertex_counts: List[int]) -> np.ndarray:
+    """Caras con índices en base 0; ``vertex_counts`` son los vértices leídos antes de cada fila"""
+    indices = np.array(_OBJ_REFS.sub(b"", b" ".join(rows)).split(), dtype=np.int64)
+    if len(indices) == 3 * len(rows):
+        faces = indices.reshape(-1, 3)
+        counts = np.array(vertex_counts, dtype=np.int64)
+    else:
+        # Polígonos: triangulación en abanico
+        triangles, counts = [], []
+        for row, vertex_count in zip(rows, vertex_counts):
+            polygon = [int(token.split(b"/")[0]) for token in row.split()]
+            for i in range(1, len(polygon) - 1):
+                triangles.append((polygon[0], polygon[i], polygon[i + 1]))
+                counts.append(vertex_count)
+        faces = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+        counts = np.array(counts, dtype=np.int64)
+    # Índices OBJ: base 1; los negativos son relativos al último vértice leído hasta esa cara
+    return np.where(faces < 0, faces + counts[:, None], faces - 1)
+
+
+def _iter_obj_blocks(data) -> Iterator[Tuple[List[bytes], List[bytes], List[int]]]:
+    """Bloques de filas de vértices y de caras en orden de aparición"""
+    vertex_rows, face_rows, vertex_counts = [], [], []
+    vertex_count = 0
+    for match in _OBJ_ELEMENT.finditer(data):
+        if match.group(1) == b"v":
+            vertex_rows.append(match.group(2))
+            vertex_count += 1
+        else:
+            face_rows.append(match.group(2))
+            vertex_counts.append(vertex_count)
+        if len(vertex_rows) + len(face_rows) >= _OBJ_BLOCK_LINES:
+            yield vertex_rows, face_rows, vertex_counts
+            vertex_rows, face_rows, vertex_counts = [], [], []
+    if vertex_rows or face_rows:
+        yield vertex_rows, face_rows, vertex_counts
+
+
+def analyze_obj(path: str, chunk_size: int = 262144) -> MeshMetrics:
+    """Área y volumen de un OBJ (las caras poligonales se triangulan en abanico)"""
+    with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        vertex_blocks, face_blocks = [], []
+        for vertex_rows, face_rows, vertex_counts in _iter_obj_blocks(data):
+            if vertex_rows:
+                vertex_blocks.append(_parse_obj_vertices(vertex_rows))
+            if face_rows:
+                face_blocks.append(_parse_obj_faces(face_rows, vertex_counts))
+    vertices = np.concatenate(vertex_blocks) if vertex_blocks else np.zeros((0, 3))
+    del vertex_blocks
+    faces = np.concatenate(face_blocks) if face_blocks else np.zeros((0, 3), dtype=np.int64)
+    del face_blocks
+
+    if len(faces) and (faces.min() < 0 or faces.max() >= len(vertices)):
+        raise ValueError("El OBJ contiene caras con índices de vértice fuera de rango")
+
+    origin = vertices[0] if len(vertices) else np.zeros(3)
+    area = volume = 0.0
+    for begin in range(0, len(faces), chunk_size):
+        block = faces[begin:begin + chunk_size]
+        v0 = vertices[block[:, 0]] - origin
+        v1 = vertices[block[:, 1]] - origin
+        v2 = vertices[block[:, 2]] - origin
+        chunk_area, chunk_volume = triangle_metrics(v0, v1, v2)
+        area += chunk_area
+        volume += chunk_volume
+
+    return MeshMetrics(triangles=len(faces), surface_area=area,
+                       signed_volume=volume, vertices=len(vertices))
+
+
+def analyze_mesh(path: str, file_format: str, chunk_size: int = 262144, workers: int = 0,
+                 parallel_threshold: int = 5000000) -> MeshMetrics:
+    """Calcular área y volumen de una malla en disco"""
+    if file_format == "stl":
+        return analyze_stl(path, chunk_size, workers, parallel_threshold)
+    if file_format == "obj":
+        return analyze_obj(path, chunk_size)
+    raise ValueError(f"Formato de malla no soportado: {file_format}")
@@ -0,0 +1,150 @@
+"""
+Barridos de parámetros: evaluación de rejillas cartesianas de dimensiones.
+
+La rejilla nunca se materializa: cada bloque de puntos se obtiene a partir de
+su índice lineal con ``np.unravel_index`` (orden C, la última dimensión varía
+más rápido) y las fórmulas se evalúan sobre arrays completos. Son las mismas
+fórmulas que ``GeometryService``, escritas para operar con numpy.
+"""
+
+import math
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.models.schemas import (
+    CubeDimensions, SphereDimensions, CylinderDimensions, SquareDimensions, CircleDimensions,
+    SweepAxis, SweepReduction
+)
+
+Arrays = Dict[str, np.ndarray]
+
+# Esquema de dimensiones de cada forma admitida en un barrido
+SHAPE_DIMENSIONS = {
+    "cube": CubeDimensions,
+    "sphere": SphereDimensions,
+    "cylinder": CylinderDimensions,
+    "square": SquareDimensions,
+    "circle": CircleDimensions,
+}
+
+# Área y volumen (None si la forma no tiene) a partir de arrays de dimensiones
+FORMULAS: Dict[str, Callable[[Arrays], Tuple[np.ndarray, Optional[np.ndarray]]]] = {
+    "cube": lambda d: (6 * d["side"] ** 2, d["side"] ** 3),
+    "sphere": lambda d: (4 * math.pi * d["radius"] ** 2, (4 / 3) * math.pi * d["radius"] ** 3),
+    "cylinder": lambda d: (
+        2 * math.pi * d["radius"] * d["height"] + 2 * math.pi * d["radius"] ** 2,
+        math.pi * d["radius"] ** 2 * d["height"]
+    ),
+    "square": lambda d: (d["side"] ** 2, None),
+    "circle": lambda d: (math.pi * d["radius"] ** 2, None),
+}
+
+
+def _axis_length(axis: SweepAxis) -> int:
+    return len(axis.values) if axis.values is not None else axis.num
+
+
+def _axis_values(name: str, axis: SweepAxis) -> np.ndarray:
+    if axis.values is not None:
+        values = np.asarray(axis.values, dtype=np.float64)
+    else:
+        values = np.linspace(axis.start, axis.stop, axis.num)
+    if not len(values):
+        raise ValueError(f"La dimensión '{name}' no tiene valores")
+    if not np.all(np.isfinite(values)) or np.any(values <= 0):
+        raise ValueError(f"Los valores de '{name}' deben ser positivos y finitos")
+    return values
+
+
+class SweepGrid:
+    """Rejilla cartesiana perezosa sobre las dimensiones de una forma"""
+
+    def __init__(self, shape_type: str, axes: Dict[str, SweepAxis], max_points: int):
+        if shape_type not in SHAPE_DIMENSIONS:
+            raise ValueError(f"Tipo de forma no soportado en barridos: {shape_type}")
+        fields = list(SHAPE_DIMENSIONS[shape_type].model_fields)
+        if set(axes) != set(fields):
+            raise ValueError(f"Las dimensiones de '{shape_type}' son: {', '.join(fields)}")
+
+        # El tamaño se comprueba antes de crear los ejes: un 'num' enorme no llega a reservar memoria
+        self.shape = tuple(_axis_length(axes[name]) for name in fields)
+        self.size = math.prod(self.shape)
+        if self.size > max_points:
+            raise ValueError(f"La rejilla tiene {self.size} puntos; el máximo es {max_points}")
+
+        self.shape_type = shape_type
+        self.names: List[str] = fields
+        self.axes = [_axis_values(name, axes[name]) for name in fields]
+
+    @property
+    def has_volume(self) -> bool:
+        return self.shape_type in ("cube", "sphere", "cylinder")
+
+    def points(self, begin: int, end: int) -> Arrays:
+        """Dimensiones de los puntos con índice lineal en [begin, end)"""
+        indices = np.unravel_index(np.arange(begin, end), self.shape)
+        return {name: axis[index] for name, axis, index in zip(self.names, self.axes, indices)}
+
+    def point(self, index: int) -> Dict[str, float]:
+        indices = np.unravel_index(index, self.shape)
+        return {name: float(axis[i]) for name, axis, i in zip(self.names, self.axes, indices)}
+
+    def chunks(self, chunk_size: int) -> Iterator[Tuple[int, Arrays, np.ndarray, Optional[np.ndarray]]]:
+        """Recorrer la rejilla por bloques: (inicio, dimensiones, área, volumen)"""
+        formula = FORMULAS[self.shape_type]
+        for begin in range(0, self.size, chunk_size):
+            dimensions = self.points(begin, min(begin + chunk_size, self.size))
+            area, volume = formula(dimensions)
+            yield begin, dimensions, area, volume
+
+
+def _finite(value: Optional[float]) -> Optional[float]:
+    # Los resultados que desbordan no tienen representación en JSON
+    return float(value) if value is not None and math.isfinite(value) else None
+
+
+def reduce_grid(grid: SweepGrid, reductions: List[SweepReduction], chunk_size: int) -> List[dict]:
+    """Calcular todas las reducciones en una sola pasada sobre la rejilla.
+
+    Si la métrica desborda (inf) en todos los puntos se elige el primero de la
+    rejilla; los valores que desbordan se devuelven como None.
+    """
+    for reduction in reductions:
+        if reduction.metric == "volume" and not grid.has_volume:
+            raise ValueError(f"La forma '{grid.shape_type}' no tiene volumen")
+        if reduction.op == "closest" and reduction.target is None:
+            raise ValueError("La reducción 'closest' necesita un valor 'target'")
+
+    best: List[Optional[Tuple[float, int]]] = [None] * len(reductions)
+    for begin, _, area, volume in grid.chunks(chunk_size):
+        metrics = {"area": area, "volume": volume}
+        for position, reduction in enumerate(reductions):
+            values = metrics[reduction.metric]
+            if reduction.op == "min":
+                key = values
+            elif reduction.op == "max":
+                key = -values
+            else:
+                key = np.abs(values - reduction.target)
+            local = int(np.argmin(key))
+            if best[position] is None or key[local] < best[position][0]:
+                best[position] = (float(key[local]), begin + local)
+
+    formula = FORMULAS[grid.shape_type]
+    results = []
+    for reduction, (_, index) in zip(reductions, best):
+        dimensions = grid.point(index)
+        area, volume = formula({name: np.float64(value) for name, value in dimensions.items()})
+        metric = area if reduction.metric == "area" else volume
+        results.append({
+            "op": reduction.op,
+            "metric": reduction.metric,
+            "target": reduction.target,
+            "index": index,
+            "value": _finite(metric),
+            "dimensions": dimensions,
+            "area": _finite(area),
+            "volume": _finite(volume),
+        })
+    return results
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tamaño y coste de CPU de comprimir listados de cálculos por codificación y nivel.
+
+Para cada número de filas de ``--rows`` genera el JSON de un listado (como
+``/calculations``) y lo comprime de una vez con cada codificación disponible
+(gzip y, si están instalados, br y zstd) y cada nivel de ``--levels``. Con
+``--stream-rows`` también lo comprime como NDJSON en bloques de ese número de
+filas, vaciando tras cada bloque como hace el middleware en streaming.
+
+Sirve para elegir ``COMPRESSION_MIN_SIZE`` (a partir de qué tamaño compensa)
+y ``COMPRESSION_LEVELS`` o los niveles por ruta de ``COMPRESSION_ROUTES``.
+
+Uso:
+    python -m benchmarks.bench_compression --rows 1 10 100 1000 10000 --stream-rows 100
+    python -m benchmarks.bench_compression --levels gzip=1,6,9 br=1,4,11 zstd=1,3,19
+"""
+
+import argparse
+import json
+import random
+from typing import Dict, List, Tuple
+
+from app.core.compression import LEVEL_RANGES, Encoder, available_encodings
+from app.core.negotiation import columns_to_records
+from benchmarks.bench_serialization import build_columns, encode_json
+
+DEFAULT_LEVELS = ["gzip=1,6,9", "br=1,4,11", "zstd=1,3,19"]
+
+
+def parse_levels(specs: List[str]) -> Dict[str, List[int]]:
+    levels = {}
+    for spec in specs:
+        encoding, _, values = spec.partition("=")
+        if encoding not in LEVEL_RANGES:
+            raise SystemExit(f"Codificación no soportada: {encoding}")
+        levels[encoding] = [int(value) for value in values.split(",")]
+    return levels
+
+
+def compress(chunks: List[bytes], encoding: str, level: int) -> Tuple[int, float]:
+    """Bytes comprimidos y segundos de CPU, vaciando tras cada bloque"""
+    encoder = Encoder(encoding, level)
+    size = 0
+    for index, chunk in enumerate(chunks):
+        size += len(encoder.compress(chunk, final=index == len(chunks) - 1))
+    return size, encoder.cpu
+
+
+def best(chunks: List[bytes], encoding: str, level: int, repeat: int) -> Tuple[int, float]:
+    results = [compress(chunks, encoding, level) for _ in range(repeat)]
+    return results[0][0], min(cpu for _, cpu in results)
+
+
+def ndjson_chunks(columns: dict, rows_per_chunk: int) -> List[bytes]:
+    lines = [json.dumps(record, default=str) + "\n" for record in columns_to_records(columns)]
+    return [
+        "".join(lines[start:start + rows_per_chunk]).encode()
+        for start in range(0, len(lines), rows_per_chunk)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--levels", nargs="+", default=DEFAULT_LEVELS,
+                        help="Niveles por codificación, p. ej. gzip=1,6,9")
+    parser.add_argument("--stream-rows", type=int, default=0, help="Filas por bloque en streaming (0 = no medir)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    levels = {
+        encoding: values for encoding, values in parse_levels(args.levels).items()
+        if encoding in available_encodings()
+    }
+
+    print(f"{'filas':>7} {'modo':<8}{'codif.':<7}{'nivel':>6}{'original':>11}{'comprimido':>12}"
+          f"{'ratio':>8}{'CPU ms':>9}{'ms/MB':>10}")
+    for rows in args.rows:
+        columns = build_columns(rows)
+        modes = [("json", [encode_json(columns)])]
+        if args.stream_rows:
+            modes.append(("ndjson", ndjson_chunks(columns, args.stream_rows)))
+        for mode, chunks in modes:
+            original = sum(len(chunk) for chunk in chunks)
+            for encoding, values in levels.items():
+                for level in values:
+                    size, cpu = best(chunks, encoding, level, args.repeat)
+                    print(f"{rows:>7} {mode:<8}{encoding:<7}{level:>6}{original:>11,}{size:>12,}"
+                          f"{size / original:>8.3f}{cpu * 1000:>9.2f}{cpu * 1000 / (original / 1e6):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Rendimiento del cálculo de mallas STL: triángulos por segundo y memoria pico.
+
+Genera una esfera triangulada en un STL binario temporal (por bloques, sin
+cargarla entera) y la analiza en un proceso hijo para medir su memoria
+residente máxima frente al tamaño del fichero.
+
+Uso:
+    python -m benchmarks.bench_mesh --triangles 2000000 --workers 0 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.mesh_service import STL_RECORD, analyze_stl
+
+
+def write_sphere_stl(path: str, target_triangles: int, radius: float = 1.0) -> int:
+    """Escribir una esfera UV con aproximadamente ``target_triangles`` triángulos"""
+    stacks = max(2, int(np.sqrt(target_triangles / 4)))
+    slices = max(3, target_triangles // (2 * stacks))
+    count = 2 * stacks * slices
+    theta = np.linspace(0, np.pi, stacks + 1)
+    phi = np.linspace(0, 2 * np.pi, slices + 1)
+
+    with open(path, "wb") as handle:
+        handle.write(b"\0" * 80)
+        handle.write(np.uint32(count).tobytes())
+        for i in range(stacks):
+            t0, t1 = theta[i], theta[i + 1]
+            p0, p1 = phi[:-1], phi[1:]
+
+            def point(t, p):
+                return np.stack([
+                    radius * np.sin(t) * np.cos(p),
+                    radius * np.sin(t) * np.sin(p),
+                    np.broadcast_to(radius * np.cos(t), p.shape),
+                ], axis=-1)
+
+            a, b, c, d = point(t0, p0), point(t1, p0), point(t1, p1), point(t0, p1)
+            records = np.zeros(2 * slices, dtype=STL_RECORD)
+            records["vertices"][0::2] = np.stack([a, b, c], axis=1)
+            records["vertices"][1::2] = np.stack([a, c, d], axis=1)
+            records.tofile(handle)
+    return count
+
+
+def _run(path, workers, result_queue):
+    start = time.perf_counter()
+    metrics = analyze_stl(path, workers=workers, parallel_threshold=0)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result_queue.put((metrics.triangles, metrics.surface_area, metrics.volume, elapsed, peak_kb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--triangles", type=int, default=2000000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sphere.stl")
+        count = write_sphere_stl(path, args.triangles)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"Malla: {count} triángulos, {size_mb:.1f} MB")
+        print(f"Referencia esfera r=1: área {4 * np.pi:.4f}, volumen {4 / 3 * np.pi:.4f}")
+        print(f"{'workers':>8}{'seg':>9}{'Mtri/s':>9}{'área':>10}{'volumen':>10}{'pico MB':>10}{'pico/fichero':>14}")
+
+        context = multiprocessing.get_context("spawn")
+        for workers in args.workers:
+            queue = context.Queue()
+            process = context.Process(target=_run, args=(path, workers, queue))
+            process.start()
+            triangles, area, volume, elapsed, peak_kb = queue.get()
+            process.join()
+            peak_mb = peak_kb / 1024
+            print(f"{workers:>8}{elapsed:>9.3f}{triangles / elapsed / 1e6:>9.2f}{area:>10.4f}"
+                  f"{volume:>10.4f}{peak_mb:>10.1f}{peak_mb / size_mb:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Comparar JSON, MessagePack y Apache Arrow para listados de cálculos.
+
+Mide tamaño de la respuesta y tiempos de codificación y decodificación para
+un conjunto de filas sintético (10.000 por defecto), reproduciendo el camino
+de cada formato en las rutas:
+
+- JSON: un ``GeometricCalculationResponse`` por fila y ``json.dumps``.
+- MessagePack: columnas de la consulta convertidas a registros.
+- Arrow: columnas de la consulta escritas directamente como stream IPC.
+
+Uso:
+    python -m benchmarks.bench_serialization --rows 10000 --repeat 5
+"""
+
+import argparse
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.core.negotiation import (
+    columns_to_records, encode_arrow, encode_msgpack, msgpack, pa
+)
+from app.models.schemas import GeometricCalculationResponse
+
+
+def build_columns(rows: int) -> dict:
+    shapes = ["cube", "sphere", "cylinder", "square", "circle"]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    columns = {name: [] for name in (
+        "id", "shape_type", "dimensions", "area", "volume",
+        "calculation_type", "created_at", "updated_at"
+    )}
+    for i in range(rows):
+        shape = random.choice(shapes)
+        radius = random.uniform(0.1, 100.0)
+        columns["id"].append(i + 1)
+        columns["shape_type"].append(shape)
+        columns["dimensions"].append(json.dumps({"radius": radius, "height": radius * 2}))
+        columns["area"].append(random.uniform(0, 1e5))
+        columns["volume"].append(random.uniform(0, 1e6) if shape in ("cube", "sphere", "cylinder") else None)
+        columns["calculation_type"].append("both")
+        columns["created_at"].append(start + timedelta(seconds=i))
+        columns["updated_at"].append(None)
+    return columns
+
+
+def encode_json(columns: dict) -> bytes:
+    records = [GeometricCalculationResponse(**record) for record in columns_to_records(columns)]
+    return json.dumps([record.model_dump(mode="json") for record in records]).encode()
+
+
+def decode_arrow(payload: bytes):
+    return pa.ipc.open_stream(io.BytesIO(payload)).read_all()
+
+
+def best_time(func, arg, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    columns = build_columns(args.rows)
+
+    formats = [("json", encode_json, json.loads)]
+    if msgpack is not None:
+        formats.append(("msgpack", lambda c: encode_msgpack(columns_to_records(c)),
+                        lambda p: msgpack.unpackb(p, timestamp=3)))
+    if pa is not None:
+        formats.append(("arrow", encode_arrow, decode_arrow))
+
+    print(f"Filas: {args.rows}  (mejor de {args.repeat} repeticiones)")
+    print(f"{'formato':<10}{'bytes':>12}{'vs json':>10}{'codificar ms':>15}{'decodificar ms':>17}")
+    json_size = None
+    for name, encode, decode in formats:
+        payload = encode(columns)
+        json_size = json_size or len(payload)
+        encode_ms = best_time(encode, columns, args.repeat) * 1000
+        decode_ms = best_time(decode, payload, args.repeat) * 1000
+        print(f"{name:<10}{len(payload):>12}{len(payload) / json_size:>10.2f}"
+              f"{encode_ms:>15.1f}{decode_ms:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
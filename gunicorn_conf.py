@@ -0,0 +1,92 @@
+"""
+Configuración de gunicorn para producción.
+
+Ejecuta varios workers de uvicorn (uno por CPU disponible por defecto), precarga
+la aplicación en el proceso maestro antes de hacer fork y recicla los workers
+tras un número de peticiones o al superar un límite de memoria.
+
+Uso:
+    gunicorn -c gunicorn_conf.py app.main:app
+"""
+
+import os
+import signal
+import threading
+import time
+
+from app.core.config import settings
+
+
+def _available_cpus() -> int:
+    """Número de CPUs asignadas al proceso (respeta cgroups/affinity)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _rss_mb() -> float:
+    """Memoria residente actual del proceso en MB"""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss es el pico (en KB en Linux), sirve como aproximación
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Servidor
+bind = settings.BIND
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = settings.WEB_CONCURRENCY or _available_cpus()
+preload_app = True
+
+# Ciclo de vida de los workers
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER
+graceful_timeout = settings.GRACEFUL_TIMEOUT
+timeout = settings.WORKER_TIMEOUT
+keepalive = settings.KEEPALIVE
+
+# Logs
+accesslog = "-"
+errorlog = "-"
+loglevel = "debug" if settings.DEBUG else "info"
+
+
+def when_ready(server):
+    """El maestro ya cargó la app: cerrar las conexiones que abrió al precargar"""
+    from app.db.database import close_engine
+    close_engine()
+    server.log.info("Maestro listo con %s workers", workers)
+
+
+def post_fork(server, worker):
+    """Cada worker descarta el pool heredado y crea el suyo propio"""
+    from app.db.database import reset_engine_after_fork
+    reset_engine_after_fork()
+
+
+def post_worker_init(worker):
+    """Vigilar la memoria del worker y reciclarlo si supera el límite"""
+    limit_mb = settings.WORKER_MAX_MEMORY_MB
+    if limit_mb <= 0:
+        return
+
+    def watch_memory():
+        while True:
+            time.sleep(settings.WORKER_MEMORY_CHECK_INTERVAL)
+            rss = _rss_mb()
+            if rss > limit_mb:
+                worker.log.warning(
+                    "Worker %s usa %.0f MB (límite %s MB); reiniciando de forma ordenada",
+                    worker.pid, rss, limit_mb
+                )
+                # SIGTERM provoca un apagado ordenado: se terminan las peticiones
+                # en curso y el maestro levanta un worker nuevo
+                os.kill(worker.pid, signal.SIGTERM)
+                return
+
+    threading.Thread(target=watch_memory, name="memory-watchdog", daemon=True).start()
@@ -7,9 +7,54 @@ Ejecutar después de iniciar el servidor con: uvicorn app.main:app --reload
 import requests
 import json
 import time
+import os
+import tempfile
+import uuid
+
+import pytest
 
 BASE_URL = "http://localhost:8000/api/v1"
 
+# Las pruebas sin servidor importan la aplicación: sin DATABASE_URL usan un SQLite
+# temporal. Las que necesitan PostgreSQL se saltan salvo que DATABASE_URL apunte a uno.
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test_api.db"))
+
+
+@pytest.fixture(scope="module")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
+
+
+def register_user(client, superuser=False):
+    """Registrar un usuario nuevo y devolver sus cabeceras de autenticación"""
+    username = f"prueba_{uuid.uuid4().hex[:12]}"
+    client.post("/api/v1/auth/register", json={
+        "email": f"{username}@example.com", "username": username, "password": "clave123"
+    })
+    if superuser:
+        from app.db.database import SessionLocal
+        from app.models.user import User
+        db = SessionLocal()
+        db.query(User).filter(User.username == username).update({"is_superuser": True})
+        db.commit()
+        db.close()
+    token = client.post("/api/v1/auth/login", data={"username": username, "password": "clave123"}).json()
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+@pytest.fixture
+def headers(client):
+    return register_user(client)
+
+
+def requires_postgres():
+    from app.db.database import engine
+    if engine.dialect.name != "postgresql":
+        pytest.skip("necesita DATABASE_URL de PostgreSQL")
+    return engine
+
 def test_health_check():
     """Probar el endpoint de salud"""
     print("🔍 Probando health check...")
@@ -168,6 +213,679 @@ def test_statistics():
     except Exception as e:
         print(f"❌ Error: {e}")
 
+@pytest.mark.parametrize("seed", [7, 11])
+def test_sketch_error_bounds(seed):
+    """Comprobar los errores documentados de los resúmenes frente a valores exactos (sin servidor)"""
+    import numpy as np
+    from app.services.sketches import TDigest, HyperLogLog
+
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(0, 2, 50000)  # cola pesada, como áreas y volúmenes
+
+    # Se construye en 4 partes y se combinan, como hacen los workers
+    parts = [TDigest(100) for _ in range(4)]
+    for i, value in enumerate(values.tolist()):
+        parts[i % 4].add(value)
+    digest = parts[0]
+    for part in parts[1:]:
+        digest.merge(part)
+
+    exact = np.sort(values)
+    # Solo se garantiza el error en rango; en valor depende de la forma de la cola
+    for q, bound in [(0.5, 0.01), (0.95, 0.003), (0.99, 0.003)]:
+        rank = np.searchsorted(exact, digest.quantile(q)) / len(exact)
+        assert abs(rank - q) <= bound, f"p{int(q * 100)}: error en rango {abs(rank - q):.4f}"
+
+    keys = rng.integers(0, 10 ** 9, 100000).tolist()
+    sketches = [HyperLogLog(14) for _ in range(2)]
+    for i, key in enumerate(keys):
+        sketches[i % 2].add(str(key))
+    sketches[0].merge(sketches[1])
+    distinct = len(set(keys))
+    bound = 3 * 1.04 / (1 << 7)  # 3 desviaciones típicas con precisión 14
+    assert abs(sketches[0].cardinality() - distinct) / distinct <= bound
+
+def test_sketch_rebuild_is_refused_outside_maintenance(client, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "SKETCH_REBUILD_ENABLED", False)
+    response = client.post("/api/v1/geometry/distributions/rebuild", headers=register_user(client, superuser=True))
+    assert response.status_code == 400
+    assert "SKETCH_REBUILD_ENABLED" in response.json()["detail"]
+
+# --- Límites de carga ---
+
+def test_token_bucket_rule_rejects_zero_refill():
+    from app.core.rate_limit import TokenBucketRule, parse_rules
+    with pytest.raises(ValueError):
+        TokenBucketRule(5, 0)
+    with pytest.raises(ValueError):
+        parse_rules("calculate=0/5")
+
+
+def test_token_bucket_waits_for_refill():
+    from app.core.rate_limit import InMemoryRateLimitStore, TokenBucketRule
+    store = InMemoryRateLimitStore()
+    rule = TokenBucketRule(2, 4)
+    assert store.consume("u:calculate", rule) == 0
+    assert store.consume("u:calculate", rule) == 0
+    wait = store.consume("u:calculate", rule)
+    assert 0 < wait <= 0.25
+
+
+def test_redis_rate_limit_store_falls_back_to_memory():
+    from app.core.rate_limit import RedisRateLimitStore, TokenBucketRule
+    store = RedisRateLimitStore("redis://127.0.0.1:1/0")
+    assert store.consume("u:calculate", TokenBucketRule(1, 1)) == 0
+    assert store.consume("u:calculate", TokenBucketRule(1, 1)) > 0
+    assert store.acquire_slot("u", 1)
+    assert not store.acquire_slot("u", 1)
+    store.release_slot("u")
+    store.release_slot("u")  # sin hueco ocupado no pasa a negativo
+    assert store.acquire_slot("u", 1)
+
+def test_concurrency_limit_response_has_cors_headers(client):
+    from app.core.rate_limit import ConcurrencyLimitMiddleware
+    from app.main import app
+    client.get("/health")  # construye la pila de middlewares
+    layer = app.middleware_stack
+    while not isinstance(layer, ConcurrencyLimitMiddleware):
+        layer = layer.app
+    saved = layer.max_in_flight, layer.in_flight
+    layer.max_in_flight, layer.in_flight = 1, 1
+    try:
+        response = client.get("/health", headers={"Origin": "http://localhost:3000"})
+    finally:
+        layer.max_in_flight, layer.in_flight = saved
+    assert response.status_code == 503
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+
+
+# --- Canal WebSocket ---
+
+class FakeWebSocket:
+    """WebSocket en memoria: entrega los mensajes dados y luego se desconecta"""
+
+    def __init__(self, messages):
+        import asyncio
+        self.incoming = asyncio.Queue()
+        for message in messages:
+            self.incoming.put_nowait(message)
+        self.sent = []
+
+    async def receive_json(self):
+        from fastapi import WebSocketDisconnect
+        if self.incoming.empty():
+            import asyncio
+            await asyncio.sleep(0.05)  # deja actuar al temporizador antes de cerrar
+            raise WebSocketDisconnect()
+        return self.incoming.get_nowait()
+
+    async def send_json(self, payload):
+        self.sent.append(payload)
+
+
+def _stream_controller(messages, **kwargs):
+    from types import SimpleNamespace
+    from app.controllers.stream_controller import StreamController
+    websocket = FakeWebSocket(messages)
+    controller = StreamController(websocket, SimpleNamespace(id=1), **kwargs)
+    controller._save_batch = lambda results: list(range(len(results)))
+    return controller, websocket
+
+
+def test_stream_batch_never_exceeds_in_flight_slots():
+    import asyncio
+    messages = [
+        {"id": i, "shape_type": "cube", "dimensions": {"side": 1}, "persist": True} for i in range(8)
+    ]
+    controller, websocket = _stream_controller(messages, max_in_flight=4, batch_size=100, flush_interval=60)
+    assert controller.batch_size == 4
+    asyncio.run(asyncio.wait_for(controller.run(), 5))
+    batches = [len(m["items"]) for m in websocket.sent if m["type"] == "persisted"]
+    # Lotes completos por tamaño, sin esperar al temporizador de 60 s
+    assert batches == [4, 4]
+
+
+def test_stream_messages_consume_rate_limit_tokens():
+    import asyncio
+    from app.core.rate_limit import InMemoryRateLimitStore, TokenBucketRule, set_rate_limit_store
+    set_rate_limit_store(InMemoryRateLimitStore())
+    try:
+        messages = [{"id": i, "shape_type": "cube", "dimensions": {"side": 1}} for i in range(6)]
+        controller, websocket = _stream_controller(messages)
+        controller._rule = TokenBucketRule(2, 20)
+        start = time.perf_counter()
+        asyncio.run(asyncio.wait_for(controller.run(), 5))
+        elapsed = time.perf_counter() - start
+    finally:
+        set_rate_limit_store(None)
+    assert [m["id"] for m in websocket.sent if m["type"] == "result"] == list(range(6))
+    # Dos mensajes de ráfaga y cuatro más (y el intento de lectura final) a 20 por segundo
+    assert elapsed >= 0.2
+
+
+# --- Agregados de analítica ---
+
+def _insert_calculation(connection, user_id, area):
+    from app.models.geometric_shape import GeometricCalculation
+    return connection.execute(GeometricCalculation.__table__.insert().values(
+        user_id=user_id, shape_type="square", dimensions='{"side": 1}', area=area, calculation_type="area"
+    ).returning(GeometricCalculation.id)).scalar()
+
+
+def _rollup_totals(db):
+    from sqlalchemy import func
+    from app.models.analytics import CalculationRollup
+    return db.query(func.sum(CalculationRollup.calculation_count), func.sum(CalculationRollup.area_sum)).filter(
+        CalculationRollup.granularity == "minute", CalculationRollup.shape_type == "square"
+    ).one()
+
+
+def test_rollup_refresh_waits_for_open_transactions(client):
+    engine = requires_postgres()
+    from app.db.database import SessionLocal
+    from app.models.user import User
+    from app.repositories.analytics_repository import AnalyticsRepository
+    register_user(client)
+    db = SessionLocal()
+    user_id = db.query(User.id).order_by(User.id.desc()).limit(1).scalar()
+    repository = AnalyticsRepository(db)
+    repository.refresh_rollups(batch_size=1000)
+    count_before, area_before = _rollup_totals(db)
+    count_before, area_before = count_before or 0, area_before or 0.0
+
+    pending = engine.connect()
+    transaction = pending.begin()
+    try:
+        # La transacción abierta obtiene un ID menor que la que se confirma después
+        open_id = _insert_calculation(pending, user_id, 1000.0)
+        with engine.begin() as other:
+            committed_id = _insert_calculation(other, user_id, 1.0)
+        assert open_id < committed_id
+
+        assert repository.refresh_rollups(batch_size=1000) == 0
+        transaction.commit()
+    finally:
+        pending.close()
+
+    assert repository.refresh_rollups(batch_size=1000) == 2
+    count, area = _rollup_totals(db)
+    db.close()
+    assert count - count_before == 2
+    assert area - area_before == pytest.approx(1001.0)
+
+
+def test_rollups_refresh_requires_postgres(client):
+    from app.db.database import engine
+    from app.core.tasks import _tasks
+    if engine.dialect.name == "postgresql":
+        pytest.skip("comprueba el comportamiento sin PostgreSQL")
+    assert "refresh-rollups" not in [task.name for task in _tasks]
+    response = client.post("/api/v1/geometry/analytics/refresh", headers=register_user(client, superuser=True))
+    assert response.status_code == 400
+
+
+# --- Formatos binarios ---
+
+def _accept(value):
+    from starlette.requests import Request
+    return Request({"type": "http", "headers": [(b"accept", value.encode())]})
+
+
+def test_negotiation_honours_q_values_and_aliases():
+    from app.core.negotiation import ARROW, JSON, MSGPACK, negotiate_media_type
+    assert negotiate_media_type(_accept("application/x-msgpack")) == MSGPACK
+    assert negotiate_media_type(_accept(f"{MSGPACK};q=0.5, {ARROW};q=0.9")) == ARROW
+    assert negotiate_media_type(_accept(ARROW), allowed=[MSGPACK]) == JSON
+    assert negotiate_media_type(_accept("text/html, */*;q=0.1")) == JSON
+
+
+def test_listing_formats_match_json(client, headers):
+    import msgpack
+    import pyarrow as pa
+    from app.core.negotiation import ARROW, MSGPACK
+    _create_calculations(client, headers, [1, 2, 3])
+    url = "/api/v1/geometry/calculations"
+    expected = client.get(url, headers=headers).json()
+
+    response = client.get(url, headers={**headers, "Accept": MSGPACK})
+    assert response.headers["content-type"] == MSGPACK
+    records = msgpack.unpackb(response.content, timestamp=3)
+    assert [(r["id"], r["area"]) for r in records] == [(r["id"], r["area"]) for r in expected]
+
+    response = client.get(url, headers={**headers, "Accept": ARROW})
+    assert response.headers["content-type"] == ARROW
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("id").to_pylist() == [r["id"] for r in expected]
+    assert table.column("area").to_pylist() == [r["area"] for r in expected]
+
+
+def test_negotiated_responses_vary_on_accept(client, headers):
+    from app.core.negotiation import ARROW, MSGPACK
+    body = {"shape_type": "cube", "dimensions": {"side": 2}, "calculation_type": "both"}
+    for accept in (None, MSGPACK, ARROW):
+        extra = {"Accept": accept} if accept else {}
+        for response in (
+            client.get("/api/v1/geometry/calculations", headers={**headers, **extra}),
+            client.post("/api/v1/geometry/calculate-only", json=body, headers={**headers, **extra}),
+        ):
+            vary = [value.strip().lower() for value in response.headers["vary"].split(",")]
+            assert "accept" in vary and "accept-encoding" in vary
+
+# --- Polígonos ---
+
+def test_polygon_metrics_with_hole_and_multipolygon():
+    from app.services.polygon_service import from_nested, polygon_metrics
+    # Exterior en sentido horario y hueco antihorario: el signo no depende de la orientación
+    outer = [[0, 0], [0, 4], [4, 4], [4, 0]]
+    hole = [[1, 1], [2, 1], [2, 2], [1, 2]]
+    metrics = polygon_metrics(from_nested([[outer, hole], [[[10, 0], [12, 0], [12, 2], [10, 2]]]]))
+    assert metrics.area[0] == pytest.approx(16 - 1 + 4)
+    assert metrics.perimeter[0] == pytest.approx(16 + 4 + 8)
+    expected_x = (16 * 2 - 1 * 1.5 + 4 * 11) / 19
+    expected_y = (16 * 2 - 1 * 1.5 + 4 * 1) / 19
+    assert metrics.centroid[0] == pytest.approx([expected_x, expected_y])
+
+
+def test_polygons_endpoint_packed_matches_nested_and_saves(client, headers):
+    import base64
+    import struct
+    square = [[0, 0], [3, 0], [3, 3], [0, 3]]
+    packed = base64.b64encode(struct.pack("<8d", *[c for point in square for c in point])).decode()
+    response = client.post("/api/v1/geometry/polygons", headers=headers, json={
+        "geometries": [
+            {"polygons": [[square]]},
+            {"coordinates": packed, "ring_offsets": [0, 4], "polygon_offsets": [0, 1]},
+        ],
+        "calculation_type": "both",
+        "save": True,
+    })
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [result["area"] for result in body["results"]] == pytest.approx([9.0, 9.0])
+    assert [result["perimeter"] for result in body["results"]] == pytest.approx([12.0, 12.0])
+    assert len(body["ids"]) == 2
+    saved = client.get(f"/api/v1/geometry/calculations/{body['ids'][1]}", headers=headers).json()
+    assert saved["shape_type"] == "polygon" and saved["area"] == pytest.approx(9.0)
+
+
+# --- Ensamblajes ---
+
+def test_assembly_totals_follow_node_changes(client, headers):
+    import math
+    sphere = 4 / 3 * math.pi
+    response = client.post("/api/v1/assemblies", headers=headers, json={
+        "name": "pieza",
+        "parts": [
+            {"shape_type": "cube", "dimensions": {"side": 2}},
+            {"name": "taladros", "operation": "subtract", "children": [
+                {"shape_type": "sphere", "dimensions": {"radius": 1}},
+            ]},
+        ],
+    })
+    assert response.status_code == 200, response.text
+    assembly = response.json()
+    assert assembly["volume"] == pytest.approx(8 - sphere)
+    assert assembly["area"] == pytest.approx(24 + 4 * math.pi)
+
+    url = f"/api/v1/assemblies/{assembly['id']}"
+    nodes = client.get(url, headers=headers, params={"include_nodes": True}).json()["nodes"]
+    group = next(node for node in nodes if node["name"] == "taladros")
+    node = client.post(f"{url}/nodes", headers=headers, json={
+        "parent_id": group["id"], "shape_type": "sphere", "dimensions": {"radius": 1}
+    }).json()
+    assert client.get(url, headers=headers).json()["volume"] == pytest.approx(8 - 2 * sphere)
+
+    response = client.patch(f"{url}/nodes/{node['id']}", headers=headers, json={"dimensions": {"radius": 0.5}})
+    assert response.status_code == 200, response.text
+    assert client.get(url, headers=headers).json()["volume"] == pytest.approx(8 - sphere - sphere / 8)
+
+    assert client.delete(f"{url}/nodes/{node['id']}", headers=headers).status_code == 200
+    assert client.get(url, headers=headers).json()["volume"] == pytest.approx(8 - sphere)
+
+    # Otro usuario no ve el ensamblaje
+    assert client.get(url, headers=register_user(client)).status_code == 404
+
+
+# --- Cálculos por usuario ---
+
+def test_calculations_are_scoped_to_their_owner(client, headers):
+    other = register_user(client)
+    own_id, = _create_calculations(client, headers, [2])
+    other_id, = _create_calculations(client, other, [3])
+
+    # Se lee primero como propietario para que la caché también tenga la entrada
+    assert client.get(f"/api/v1/geometry/calculations/{own_id}", headers=headers).status_code == 200
+    assert client.get(f"/api/v1/geometry/calculations/{own_id}", headers=other).status_code == 404
+    assert [c["id"] for c in client.get("/api/v1/geometry/calculations", headers=other).json()] == [other_id]
+    batch = client.get("/api/v1/geometry/calculations/batch", headers=other,
+                       params={"ids": [own_id, other_id]}).json()
+    assert [c["id"] for c in batch["calculations"]] == [other_id]
+    assert batch["missing_ids"] == [own_id]
+    assert client.get("/api/v1/geometry/statistics", headers=other).json()["total_calculations"] == 1
+
+    assert client.delete(f"/api/v1/geometry/calculations/{own_id}", headers=other).status_code == 404
+    assert client.get(f"/api/v1/geometry/calculations/{own_id}", headers=headers).status_code == 200
+
+
+# --- Perfilado ---
+
+def test_profile_token_captures_request_and_sql(client, headers):
+    admin = register_user(client, superuser=True)
+    status = client.put("/api/v1/admin/profiling", headers=admin,
+                        json={"enabled": True, "sample_rate": 0}).json()
+    try:
+        url = "/api/v1/geometry/calculations"
+        assert "x-profile-id" not in client.get(url, headers=headers).headers
+        response = client.get(url, headers={**headers, status["header"]: status["token"]})
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+        assert profile_id.startswith(f"{os.getpid()}-")
+        assert status["threadpool_sampling"] is True
+
+        detail = client.get(f"/api/v1/admin/profiles/{profile_id}", headers=admin).json()
+        assert detail["path"] == url and detail["trigger"] == "header"
+        assert detail["status_code"] == 200
+        assert any("geometric_calculations" in statement["statement"] for statement in detail["sql"])
+        folded = client.get(f"/api/v1/admin/profiles/{profile_id}/folded", headers=admin)
+        assert folded.status_code == 200
+        other = client.get(f"/api/v1/admin/profiles/{os.getpid() + 1}-1", headers=admin)
+        assert other.status_code == 404 and "worker" in other.json()["detail"]
+    finally:
+        client.put("/api/v1/admin/profiling", headers=admin, json={"enabled": False})
+    assert client.get(url, headers={**headers, status["header"]: status["token"]}).headers.get("x-profile-id") is None
+
+
+# --- Compresión ---
+
+def test_negotiate_encoding_respects_q_and_preference():
+    from app.core.compression import negotiate_encoding
+    assert negotiate_encoding(None, ["gzip"]) is None
+    assert negotiate_encoding("gzip, br", ["br", "gzip"]) == "br"
+    assert negotiate_encoding("gzip;q=1, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("x-gzip", ["gzip"]) == "gzip"
+    assert negotiate_encoding("*;q=0.3, br;q=0", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["gzip"]) is None
+
+
+def _compression_client(compressor):
+    from fastapi.testclient import TestClient
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+    from app.core.compression import CompressionMiddleware
+
+    async def big(request):
+        return JSONResponse({"values": list(range(2000))})
+
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def stream(request):
+        async def lines():
+            for i in range(50):
+                yield (json.dumps({"i": i, "padding": "x" * 50}) + "\n").encode()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app = Starlette(routes=[Route("/big", big), Route("/small", small), Route("/stream", stream)])
+    app.add_middleware(CompressionMiddleware, compressor=compressor)
+    return TestClient(app)
+
+
+def test_compression_middleware_thresholds_streaming_and_stats():
+    from app.core.compression import Compressor
+    compressor = Compressor(True, 256, ["gzip"], {}, {})
+    client = _compression_client(compressor)
+    accept = {"Accept-Encoding": "gzip"}
+
+    response = client.get("/big", headers=accept)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.json() == {"values": list(range(2000))}
+
+    assert "content-encoding" not in client.get("/small", headers=accept).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+
+    response = client.get("/stream", headers=accept)
+    assert response.headers["content-encoding"] == "gzip"
+    assert [json.loads(line)["i"] for line in response.text.splitlines()] == list(range(50))
+
+    [stats] = compressor.get_stats()
+    assert stats["responses"] == 4
+    assert stats["skipped"] == {"small": 1, "identity": 1}
+    [gzip] = stats["compressed"]
+    assert gzip["responses"] == 2 and gzip["bytes_out"] < gzip["bytes_in"]
+
+
+# --- Caché de lectura ---
+
+def test_created_calculation_clears_negative_cache_entry(client, headers):
+    body = {"shape_type": "cube", "dimensions": {"side": 2}, "calculation_type": "both"}
+    first = client.post("/api/v1/geometry/calculate", json=body, headers=headers).json()["id"]
+    next_id = first + 1
+    # El siguiente ID aún no existe y se recuerda como inexistente
+    assert client.get(f"/api/v1/geometry/calculations/{next_id}", headers=headers).status_code == 404
+    created = client.post("/api/v1/geometry/calculate", json=body, headers=headers).json()["id"]
+    assert created == next_id
+    assert client.get(f"/api/v1/geometry/calculations/{next_id}", headers=headers).status_code == 200
+
+
+def test_cache_invalidation_only_blocks_fills_of_the_same_key():
+    from app.core.cache import LRUCache
+    cache = LRUCache(100, 60, 5)
+    generation = cache.generation  # lectura en curso de 1 y 2
+    cache.invalidate([2])
+    cache.set(1, "uno", generation)
+    cache.set(2, "viejo", generation)
+    assert cache.get(1) == "uno"
+    assert cache.get(2) is None
+    cache.set(2, "nuevo", cache.generation)
+    assert cache.get(2) == "nuevo"
+    cache.clear()
+    cache.set(1, "viejo", generation)
+    assert cache.get(1) is None
+
+def test_cache_falls_back_to_local_when_redis_is_unreachable(monkeypatch):
+    from app.core import cache
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+    monkeypatch.setattr(settings, "CALCULATION_CACHE_FALLBACK_TTL", 2.0)
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(cache, "_bus", None)
+    local = cache.get_calculation_cache()
+    assert cache._bus is None
+    assert local.ttl == 2.0 and local.negative_ttl <= 2.0
+    cache.invalidate_calculations([1, 2])
+
+
+# --- Borrado masivo ---
+
+def _create_calculations(client, headers, sides):
+    return [
+        client.post("/api/v1/geometry/calculate", headers=headers, json={
+            "shape_type": "cube", "dimensions": {"side": side}, "calculation_type": "both"
+        }).json()["id"]
+        for side in sides
+    ]
+
+
+def test_bulk_delete_dimension_filter_requires_postgres(client, headers):
+    from app.db.database import engine
+    if engine.dialect.name == "postgresql":
+        pytest.skip("comprueba el comportamiento sin PostgreSQL")
+    response = client.post("/api/v1/geometry/calculations/bulk-delete", headers=headers, json={
+        "shape_type": "cube", "dimensions": [{"key": "side", "op": "gt", "value": 1}]
+    })
+    assert response.status_code == 400
+
+
+def test_bulk_delete_skips_legacy_non_json_dimensions(client, headers):
+    engine = requires_postgres()
+    from app.models.geometric_shape import GeometricCalculation
+    keep = _create_calculations(client, headers, [1])
+    remove = _create_calculations(client, headers, [5, 6])
+    user_id = client.get("/api/v1/auth/me", headers=headers).json()["id"]
+    with engine.begin() as connection:
+        legacy = [
+            connection.execute(GeometricCalculation.__table__.insert().values(
+                user_id=user_id, shape_type="cube", dimensions=text, area=1.0, calculation_type="area"
+            ).returning(GeometricCalculation.id)).scalar()
+            for text in ["{'side': 9}", "lado=9"]
+        ]
+    response = client.post("/api/v1/geometry/calculations/bulk-delete", headers=headers, json={
+        "shape_type": "cube", "dimensions": [{"key": "side", "op": "gt", "value": 2}]
+    })
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert response.json()["deleted_count"] == len(remove)
+    for calculation_id in keep + legacy:
+        assert client.get(f"/api/v1/geometry/calculations/{calculation_id}", headers=headers).status_code == 200
+
+
+def test_bulk_delete_resumes_abandoned_job(client, headers):
+    from datetime import datetime, timedelta, timezone
+    from app.db.database import SessionLocal
+    from app.models.jobs import BulkDeleteJob
+    ids = _create_calculations(client, headers, [1, 2, 3])
+    user_id = client.get("/api/v1/auth/me", headers=headers).json()["id"]
+    db = SessionLocal()
+    # Trabajo que un worker dejó en running tras borrar el primer ID
+    job = BulkDeleteJob(user_id=user_id, criteria=json.dumps({"ids": ids}), status="running",
+                        deleted_count=1, chunk_count=1, last_deleted_id=ids[0],
+                        started_at=datetime.now(timezone.utc))
+    db.add(job)
+    db.commit()
+    job_id = job.id
+
+    url = f"/api/v1/geometry/calculations/bulk-delete/{job_id}/resume"
+    assert client.post(url, headers=headers).status_code == 400  # aún no está abandonado
+
+    an_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    db.query(BulkDeleteJob).filter(BulkDeleteJob.id == job_id).update(
+        {"started_at": an_hour_ago, "updated_at": an_hour_ago}
+    )
+    db.commit()
+    db.close()
+    response = client.post(url, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "completed"
+    assert response.json()["deleted_count"] == 3
+    assert client.get(f"/api/v1/geometry/calculations/{ids[0]}", headers=headers).status_code == 200
+    assert client.get(f"/api/v1/geometry/calculations/{ids[2]}", headers=headers).status_code == 404
+    assert client.post(url, headers=headers).status_code == 400  # ya completado
+
+
+# --- Barridos ---
+
+def test_sweep_rejects_huge_grid_before_building_axes(monkeypatch):
+    from app.models.schemas import SweepAxis
+    from app.services import sweep_service
+
+    def fail(*args):
+        raise AssertionError("no se deben crear los ejes")
+
+    monkeypatch.setattr(sweep_service, "_axis_values", fail)
+    axis = SweepAxis(start=1, stop=2, num=10 ** 12)
+    with pytest.raises(ValueError, match="máximo"):
+        sweep_service.SweepGrid("cylinder", {"radius": axis, "height": axis}, max_points=10 ** 6)
+
+
+def test_sweep_ndjson_writes_overflow_as_null():
+    from app.controllers.sweep_controller import SweepController
+    from app.models.schemas import SweepRequest
+    request = SweepRequest(shape_type="cube", dimensions={"side": {"values": [2, 1e200]}})
+    lines = b"".join(SweepController(request).iter_ndjson()).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert rows[0] == {"side": 2.0, "area": 24.0, "volume": 8.0}
+    assert rows[1]["side"] == 1e200 and rows[1]["area"] is None and rows[1]["volume"] is None
+
+
+def test_sweep_reductions_when_every_point_overflows(client, headers):
+    body = {"shape_type": "cube", "dimensions": {"side": {"values": [1e200, 1e201]}}}
+    for reduction in ({"op": "min", "metric": "volume"}, {"op": "closest", "metric": "volume", "target": 5}):
+        response = client.post("/api/v1/geometry/sweep", headers=headers, json={**body, "reductions": [reduction]})
+        assert response.status_code == 200
+        [result] = response.json()["reductions"]
+        assert result["index"] == 0 and result["dimensions"] == {"side": 1e200}
+        assert result["value"] is None and result["volume"] is None
+
+
+# --- Mallas ---
+
+def test_obj_negative_indices_use_running_vertex_count(tmp_path):
+    from app.services.mesh_service import analyze_obj
+    # Dos objetos: cada cara referencia con -1..-3 los tres vértices anteriores a ella
+    path = tmp_path / "dos.obj"
+    path.write_text(
+        "o primero\nv 0 0 0\nv 1 0 0\nv 0 1 0\nf -3 -2 -1\n"
+        "o segundo\nv 0 0 0\nv 2 0 0\nv 0 2 0\nf -3/1 -2/2 -1/3\n"
+    )
+    metrics = analyze_obj(str(path))
+    assert metrics.triangles == 2
+    assert metrics.surface_area == pytest.approx(0.5 + 2.0)
+
+
+def test_stl_reuses_process_pool(tmp_path):
+    import numpy as np
+    from app.services import mesh_service
+    records = np.zeros(4, dtype=mesh_service.STL_RECORD)
+    records["vertices"] = [[0, 0, 0], [1, 0, 0], [0, 1, 0]]
+    path = tmp_path / "malla.stl"
+    with open(path, "wb") as handle:
+        handle.write(b"\0" * mesh_service.STL_HEADER_SIZE + len(records).to_bytes(4, "little"))
+        records.tofile(handle)
+    try:
+        first = mesh_service.analyze_stl(str(path), workers=2, parallel_threshold=0)
+        pool = mesh_service._pool
+        second = mesh_service.analyze_stl(str(path), workers=2, parallel_threshold=0)
+        assert mesh_service._pool is pool
+    finally:
+        mesh_service.shutdown_process_pool()
+    assert first.surface_area == second.surface_area == pytest.approx(2.0)
+
+
+def test_mesh_upload_rejected_by_content_length(client, headers, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "MESH_MAX_UPLOAD_MB", 1)
+    response = client.post(
+        "/api/v1/geometry/mesh",
+        headers={**headers, "Content-Type": "multipart/form-data; boundary=x",
+                 "Content-Length": str(2 * 1024 * 1024)},
+        content=b"",
+    )
+    assert response.status_code == 413
+
+
+def test_mesh_upload_limit_applies_while_streaming(client, headers, monkeypatch):
+    import glob
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "MESH_MAX_UPLOAD_MB", 1)
+    before = set(glob.glob(os.path.join(tempfile.gettempdir(), "*.obj")))
+
+    def body():
+        yield b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"m.obj\"\r\n\r\n"
+        for _ in range(3):
+            yield b"v 0 0 0\n" * 65536
+
+    response = client.post(
+        "/api/v1/geometry/mesh",
+        headers={**headers, "Content-Type": "multipart/form-data; boundary=x"},
+        content=body(),
+    )
+    assert response.status_code == 413
+    assert set(glob.glob(os.path.join(tempfile.gettempdir(), "*.obj"))) == before
+
+
+def test_mesh_upload_computes_metrics(client, headers):
+    obj = b"v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n"
+    response = client.post(
+        "/api/v1/geometry/mesh", headers=headers,
+        files={"file": ("t.obj", obj)}, data={"save": "false", "calculation_type": "area"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["area"] == pytest.approx(0.5)
+
+
 def main():
     """Función principal de pruebas"""
     print("🚀 Iniciando pruebas de la API de Geometría")
@@ -184,6 +902,7 @@ def main():
     test_calculations()
     test_database_operations()
     test_statistics()
+    test_sketch_error_bounds(7)
     
     print("\n" + "=" * 50)
     print("✅ Todas las pruebas completadas")